@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+LazaiTrader Chart Renderer
+
+Self-hosted replacement for the quickchart.io round trip of lt-tg-chart. Renders
+the Chart.js line config built by generateChartConfig (lt_tg_chart/worker.js)
+to PNG with matplotlib and keeps the images on disk, keyed by the cache key the
+worker sends (an HMAC of the user and the watermark of their chart data), so a
+repeated /chart with unchanged data is served without rendering.
+
+Endpoints:
+    POST /render             {key, chart, width, height, meta} -> {url, cached}   (Bearer auth)
+    GET  /chart/<key>.json   meta stored with the image, 404 if not cached        (Bearer auth)
+    GET  /chart/<key>.png    the image (public, Telegram downloads it from here)
+    GET  /health
+
+Usage:
+    1. Install dependencies: pip install matplotlib
+    2. Run: RENDERER_SECRET=... python renderer.py --port 8080 --public-url https://charts.example.com
+       Options: --cache-dir ./chart_cache --max-images 5000
+    3. Set CHART_RENDERER_URL (and the RENDERER_SECRET secret) on lt-tg-chart
+"""
+
+import argparse
+import hmac
+import io
+import json
+import math
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The object-oriented Figure API (no pyplot state) renders on the Agg canvas and
+# is safe to use from the server's request threads
+from matplotlib.figure import Figure
+
+# Default image size (same as the quickchart.io request)
+DEFAULT_WIDTH = 800
+DEFAULT_HEIGHT = 400
+DPI = 100
+
+# Largest accepted request body
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+# Cache keys are hex digests from the worker
+KEY_PATTERN = re.compile(r"^[0-9a-f]{16,128}$")
+
+# Chart.js pointStyle -> matplotlib marker
+POINT_STYLES = {
+    "circle": "o",
+    "triangle": "^",
+    "rect": "s",
+    "rectRot": "D",
+    "cross": "+",
+    "crossRot": "x",
+    "star": "*",
+}
+
+# Datasets shown in the legend (token price lines are hidden, as in the worker's legend filter)
+LEGEND_LABELS = {"Portfolio Value (USD)", "Buy", "Sell", "Deposit", "Withdrawal"}
+
+
+# =============================================================================
+# RENDERING
+# =============================================================================
+
+def parse_color(value, default=(0.5, 0.5, 0.5, 1.0)):
+    """Convert a Chart.js color ('#rgb', '#rrggbb', '#rrggbbaa', 'rgba(...)', 'transparent') to RGBA."""
+    if not isinstance(value, str):
+        return default
+    value = value.strip()
+
+    if value == "transparent":
+        return (0.0, 0.0, 0.0, 0.0)
+
+    if value.startswith("#"):
+        digits = value[1:]
+        if len(digits) in (3, 4):
+            digits = "".join(c * 2 for c in digits)
+        if len(digits) in (6, 8) and re.fullmatch(r"[0-9a-fA-F]+", digits):
+            channels = [int(digits[i:i + 2], 16) / 255 for i in range(0, len(digits), 2)]
+            return tuple(channels) if len(channels) == 4 else (*channels, 1.0)
+        return default
+
+    match = re.fullmatch(r"rgba?\(\s*([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)\s*(?:,\s*([\d.]+)\s*)?\)", value)
+    if match:
+        r, g, b = (float(match.group(i)) / 255 for i in (1, 2, 3))
+        alpha = float(match.group(4)) if match.group(4) is not None else 1.0
+        return (r, g, b, alpha)
+
+    return default
+
+
+def axis_label(axes_config):
+    scale_label = (axes_config or {}).get("scaleLabel") or {}
+    return scale_label.get("labelString") if scale_label.get("display") else None
+
+
+def draw_dataset(ax, dataset, x_positions):
+    """Draw one Chart.js line dataset on ax."""
+    values = dataset.get("data") or []
+    points = [(x, v) for x, v in zip(x_positions, values) if isinstance(v, (int, float))]
+    if not points:
+        return None
+
+    xs, ys = zip(*points)
+    color = parse_color(dataset.get("borderColor"))
+    label = dataset.get("label")
+    marker = POINT_STYLES.get(dataset.get("pointStyle"), "o")
+    point_radius = dataset.get("pointRadius", 3)
+
+    if dataset.get("showLine") is False:
+        # Markers only (buy / sell / deposit / withdrawal)
+        size = (point_radius * 1.5) ** 2
+        return ax.scatter(xs, ys, s=size, marker=marker, label=label, zorder=4,
+                          color=parse_color(dataset.get("backgroundColor"), color))
+
+    if not dataset.get("spanGaps"):
+        # Break the line at missing values, as Chart.js does without spanGaps
+        xs, ys = x_positions[:len(values)], [v if isinstance(v, (int, float)) else float("nan") for v in values]
+
+    (line,) = ax.plot(
+        xs, ys,
+        color=color,
+        linewidth=dataset.get("borderWidth", 2),
+        marker=marker if point_radius else None,
+        markersize=point_radius * 1.5,
+        label=label,
+        zorder=3,
+    )
+    if dataset.get("fill"):
+        ax.fill_between(xs, ys, color=parse_color(dataset.get("backgroundColor"), (*color[:3], 0.1)), zorder=2)
+    return line
+
+
+def render_chart(chart, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+    """Render a Chart.js 2 line config (as built by generateChartConfig) to PNG bytes."""
+    data = chart.get("data") or {}
+    options = chart.get("options") or {}
+    labels = data.get("labels") or []
+    datasets = data.get("datasets") or []
+    scales = options.get("scales") or {}
+    y_axes = {axis.get("id", "y"): axis for axis in scales.get("yAxes") or []}
+    x_axis = (scales.get("xAxes") or [{}])[0]
+
+    fig = Figure(figsize=(width / DPI, height / DPI), dpi=DPI, facecolor="white")
+    ax = fig.subplots()
+    secondary = ax.twinx() if "y1" in y_axes else None
+    x_positions = list(range(len(labels)))
+
+    handles = []
+    for dataset in datasets:
+        target = secondary if dataset.get("yAxisID") == "y1" and secondary is not None else ax
+        handle = draw_dataset(target, dataset, x_positions)
+        if handle is not None and dataset.get("label") in LEGEND_LABELS:
+            handles.append(handle)
+
+    # Portfolio (left axis) drawn over the faded token price lines
+    if secondary is not None:
+        ax.set_zorder(secondary.get_zorder() + 1)
+        ax.patch.set_visible(False)
+        secondary.set_ylabel(axis_label(y_axes["y1"]) or "")
+
+    ax.set_ylabel(axis_label(y_axes.get("y")) or "")
+    ax.set_xlabel(axis_label(x_axis) or "")
+    ax.grid(True, color=(0, 0, 0, 0.1))
+
+    # At most ~12 date labels
+    if labels:
+        ticks = list(range(0, len(labels), max(1, math.ceil(len(labels) / 12))))
+        ax.set_xticks(ticks)
+        ax.set_xticklabels([labels[tick] for tick in ticks], rotation=45, ha="right", fontsize=8)
+        ax.set_xlim(-0.5, len(labels) - 0.5)
+
+    title = options.get("title") or {}
+    if title.get("display") and title.get("text"):
+        ax.set_title(title["text"], fontsize=title.get("fontSize", 14),
+                     fontweight="bold" if title.get("fontStyle") == "bold" else "normal")
+
+    if handles:
+        fig.legend(handles=handles, loc="lower center", ncol=len(handles), frameon=False, fontsize=9)
+        fig.tight_layout(rect=(0, 0.07, 1, 1))
+    else:
+        fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", facecolor="white")
+    return buffer.getvalue()
+
+
+# =============================================================================
+# IMAGE CACHE
+# =============================================================================
+
+class ChartCache:
+    """PNG + meta JSON per cache key on disk, trimmed to the newest max_images."""
+
+    def __init__(self, directory, max_images):
+        self.directory = directory
+        self.max_images = max_images
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def key_lock(self, key):
+        """Lock per key, so concurrent requests for one chart render it once."""
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def has(self, key):
+        return os.path.exists(self.path(key, "json"))
+
+    def read(self, key, extension):
+        try:
+            with open(self.path(key, extension), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, png, meta):
+        # Meta last: a key counts as cached once its JSON exists
+        for extension, content in (("png", png), ("json", json.dumps(meta).encode())):
+            temp = self.path(key, f"{extension}.tmp")
+            with open(temp, "wb") as f:
+                f.write(content)
+            os.replace(temp, self.path(key, extension))
+        self.trim()
+
+    def trim(self):
+        with self.lock:
+            images = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".png")]
+            if len(images) <= self.max_images:
+                return
+            images.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in images[:len(images) - self.max_images]:
+                key = entry.name[:-len(".png")]
+                # Meta first: once the JSON is gone has() no longer reports the key
+                for extension in ("json", "png"):
+                    try:
+                        os.remove(self.path(key, extension))
+                    except FileNotFoundError:
+                        pass
+                self.key_locks.pop(key, None)
+
+
+# =============================================================================
+# HTTP SERVICE
+# =============================================================================
+
+def make_handler(cache, secret, public_url):
+    """Build the request handler bound to a cache and configuration."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            print(f"[renderer] {self.address_string()} {fmt % args}")
+
+        def send_body(self, status, body, content_type="application/json", cache_control=None):
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if cache_control:
+                self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def authorized(self):
+            expected = f"Bearer {secret}"
+            return bool(secret) and hmac.compare_digest(self.headers.get("Authorization", ""), expected)
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_body(200, {"status": "ok", "worker": "lt-chart-renderer"})
+                return
+
+            match = re.fullmatch(r"/chart/([0-9a-f]+)\.(png|json)", self.path)
+            if not match or not KEY_PATTERN.match(match.group(1)):
+                self.send_body(404, {"error": "Not found"})
+                return
+
+            key, extension = match.groups()
+            if extension == "json" and not self.authorized():
+                self.send_body(401, {"error": "Unauthorized"})
+                return
+
+            content = cache.read(key, extension)
+            if content is None:
+                self.send_body(404, {"error": "Not cached"})
+            elif extension == "png":
+                # Keys change whenever the data changes, so images never go stale
+                self.send_body(200, content, "image/png", "public, max-age=31536000, immutable")
+            else:
+                self.send_body(200, content)
+
+        def do_POST(self):
+            if self.path != "/render":
+                self.send_body(404, {"error": "Not found"})
+                return
+            if not self.authorized():
+                self.send_body(401, {"error": "Unauthorized"})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self.send_body(413, {"error": "Invalid body size"})
+                return
+
+            try:
+                payload = json.loads(self.rfile.read(length))
+                key = payload["key"]
+                chart = payload["chart"]
+            except (ValueError, KeyError, TypeError):
+                self.send_body(400, {"error": "Expected JSON with key and chart"})
+                return
+
+            if not isinstance(key, str) or not KEY_PATTERN.match(key) or not isinstance(chart, dict):
+                self.send_body(400, {"error": "Invalid key or chart"})
+                return
+
+            url = f"{public_url}/chart/{key}.png"
+            with cache.key_lock(key):
+                if cache.has(key):
+                    self.send_body(200, {"url": url, "cached": True})
+                    return
+
+                started = time.perf_counter()
+                try:
+                    png = render_chart(
+                        chart,
+                        int(payload.get("width") or DEFAULT_WIDTH),
+                        int(payload.get("height") or DEFAULT_HEIGHT),
+                    )
+                except Exception as e:
+                    print(f"[renderer] Render failed for {key}: {e}")
+                    self.send_body(500, {"error": f"Render failed: {e}"})
+                    return
+
+                meta = dict(payload.get("meta") or {})
+                meta["chartUrl"] = url
+                cache.write(key, png, meta)
+
+            print(f"[renderer] Rendered {key} ({len(png)} bytes) in {(time.perf_counter() - started) * 1000:.0f} ms")
+            self.send_body(200, {"url": url, "cached": False})
+
+    return Handler
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Render lt-tg-chart Chart.js configs to PNG")
+    parser.add_argument("--host", default="0.0.0.0", help="Listen address (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8080, help="Listen port (default: 8080)")
+    parser.add_argument("--public-url", default=os.environ.get("RENDERER_PUBLIC_URL"),
+                        help="Base URL Telegram downloads images from (default: $RENDERER_PUBLIC_URL)")
+    parser.add_argument("--cache-dir", default="chart_cache", help="Image cache directory (default: chart_cache)")
+    parser.add_argument("--max-images", type=int, default=5000, help="Images kept in the cache (default: 5000)")
+    return parser.parse_args()
+
+
+def main():
+    """Start the renderer service."""
+    args = parse_args()
+    secret = os.environ.get("RENDERER_SECRET")
+    if not secret:
+        raise SystemExit("RENDERER_SECRET must be set")
+
+    public_url = (args.public_url or f"http://{args.host}:{args.port}").rstrip("/")
+    cache = ChartCache(args.cache_dir, args.max_images)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cache, secret, public_url))
+    server.daemon_threads = True
+
+    print(f"[renderer] Listening on {args.host}:{args.port}, images at {public_url}/chart/<key>.png")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
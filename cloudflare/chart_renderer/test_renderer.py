@@ -0,0 +1,52 @@
+"""
+Smoke tests for the chart renderer
+
+sample_chart.json is a config built by generateChartConfig (lt_tg_chart/worker.js)
+for a user with deposits, withdrawals, trades on ETH-USDC and eight days of
+balances, so it uses every dataset kind the worker sends.
+
+Run with: python -m unittest test_renderer (skipped if matplotlib is not installed)
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+try:
+    import renderer
+except ImportError:
+    renderer = None
+
+SAMPLE_CHART = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_chart.json")
+
+
+@unittest.skipIf(renderer is None, "matplotlib is not installed")
+class RenderChartTest(unittest.TestCase):
+    def test_renders_worker_config(self):
+        with open(SAMPLE_CHART) as f:
+            chart = json.load(f)
+
+        png = renderer.render_chart(chart, 400, 200)
+
+        self.assertTrue(png.startswith(b"\x89PNG\r\n\x1a\n"))
+
+
+@unittest.skipIf(renderer is None, "matplotlib is not installed")
+class ChartCacheTest(unittest.TestCase):
+    def test_trim_keeps_newest_images(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = renderer.ChartCache(directory, max_images=2)
+            for index, key in enumerate(("a" * 16, "b" * 16, "c" * 16)):
+                cache.write(key, b"png", {"index": index})
+                os.utime(cache.path(key, "png"), (index, index))
+            cache.trim()
+
+            self.assertFalse(cache.has("a" * 16))
+            self.assertFalse(os.path.exists(cache.path("a" * 16, "png")))
+            self.assertTrue(cache.has("b" * 16))
+            self.assertTrue(cache.has("c" * 16))
+
+
+if __name__ == "__main__":
+    unittest.main()
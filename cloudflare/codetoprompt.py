@@ -1,19 +1,49 @@
+import argparse
+import codecs
+import hashlib
+import json
+import mmap
 import os
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 EXCLUDE_DIRS = {'archive', 'node_modules', 'venv', '__pycache__', '.git', 'archive', 'evm_env'}
 EXCLUDE_FILES = {'.DS_Store', 'codetoprompt.py', 'repo_structure_and_scripts.txt'}
 BINARY_EXTS = {'.png', '.jpg', '.jpeg', '.ico', '.gif', '.webp', '.svg', '.json', '.txt', '.csv'}
 
+OUTPUT_FILE = 'repo_structure_and_scripts.txt'
+# Rough token estimate used for --max-tokens (no tokenizer dependency)
+CHARS_PER_TOKEN = 4
+# Files read ahead of the writer per worker; bounds memory on large repos
+READ_AHEAD = 4
+# Bytes inspected for NUL bytes when deciding whether a file is binary
+SNIFF_BYTES = 8192
+INDEX_VERSION = 2
+
 def is_binary(filename):
     ext = os.path.splitext(filename)[1].lower()
     return ext in BINARY_EXTS
 
+def looks_binary(f, size):
+    """Sniff the first bytes of an open file for NUL bytes (mmap, no decoding)."""
+    if size == 0:
+        return False
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm.find(b'\0', 0, SNIFF_BYTES) != -1
+
+def is_excluded(rel):
+    parts = rel.split(os.sep)
+    if any(d in EXCLUDE_DIRS or d.startswith('.') for d in parts[:-1]):
+        return True
+    return parts[-1] in EXCLUDE_FILES or parts[-1].startswith('.')
+
 def list_files(startpath):
     structure = []
     filepaths = []
     for root, dirs, files in os.walk(startpath):
         # Filter out excluded dirs
-        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS and not d.startswith('.')]
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDE_DIRS and not d.startswith('.'))
         level = root.replace(startpath, '').count(os.sep)
         indent = '│   ' * level
         folder = os.path.basename(root)
@@ -29,29 +59,272 @@ def list_files(startpath):
             filepaths.append(relpath)
     return structure, filepaths
 
-def main():
-    root = os.path.dirname(os.path.abspath(__file__))
+def format_header(structure):
+    return "Repository Structure\n\n" + ''.join(line + '\n' for line in structure) + "\n\nFile Contents\n\n"
+
+def read_chunk(path, root, limit=None):
+    """
+    Output chunk for one file plus its fingerprint (mtime, size, sha256 of the bytes).
+    Reads at most limit characters (+1 to detect truncation); sha256 stays None unless
+    the whole file was read, so a cut-off prefix is never deduped against a full file.
+    """
+    rel = os.path.relpath(path, root)
+    st = os.stat(path)
+    fingerprint = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': None}
+    if is_binary(path):
+        return f"// filepath: {rel}\n(BINARY FILE SKIPPED)\n\n", fingerprint
+    try:
+        with open(path, 'rb') as f:
+            if looks_binary(f, st.st_size):
+                return f"// filepath: {rel}\n(BINARY FILE SKIPPED)\n\n", fingerprint
+            # utf-8 is at most 4 bytes per character
+            data = f.read() if limit is None else f.read((limit + 1) * 4)
+        content = codecs.getincrementaldecoder('utf-8')().decode(data, final=limit is None)
+    except Exception as e:
+        return f"// filepath: {rel}\n(COULD NOT READ FILE: {e})\n\n", fingerprint
+    if len(data) == st.st_size:
+        fingerprint['sha256'] = hashlib.sha256(data).hexdigest()
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    if limit is not None:
+        content = content[:limit + 1]
+    if not content.endswith('\n'):
+        content += '\n'
+    return f"// filepath: {rel}\n{content}\n", fingerprint
+
+def dedupe(rel, chunk, fingerprint, seen):
+    """Replace a byte-identical copy of an earlier file with a reference to it."""
+    sha = fingerprint.get('sha256')
+    if not sha:
+        return chunk, fingerprint
+    if sha in seen:
+        return f"// filepath: {rel}\n(DUPLICATE OF {seen[sha]})\n\n", dict(fingerprint, duplicate_of=seen[sha])
+    seen[sha] = rel
+    fingerprint = dict(fingerprint)
+    fingerprint.pop('duplicate_of', None)
+    return chunk, fingerprint
+
+def read_in_order(paths, root, workers, remaining=None):
+    """
+    Read files on a thread pool, yielding (chunk, fingerprint) in path order with a bounded read-ahead.
+    remaining() returns the characters left in the token budget; each read is capped at it when submitted.
+    """
+    def submit(path):
+        return pool.submit(read_chunk, path, root, remaining() if remaining else None)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        paths = iter(paths)
+        try:
+            for path in paths:
+                pending.append(submit(path))
+                if len(pending) >= workers * READ_AHEAD:
+                    break
+            while pending:
+                result = pending.popleft().result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(submit(next_path))
+                yield result
+        finally:
+            # Consumer stopped early (token budget) - drop reads that have not started
+            for future in pending:
+                future.cancel()
+
+# =============================================================================
+# FINGERPRINT INDEX
+# =============================================================================
+
+def index_path(output):
+    """Index lives next to the output as a hidden file, so the tree walk skips it."""
+    directory, name = os.path.split(os.path.abspath(output))
+    return os.path.join(directory, f".{name}.index.json")
+
+def load_index(output, root):
+    """Index of the previous run, or None if it is missing or no longer matches the output file."""
+    try:
+        with open(index_path(output), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        st = os.stat(output)
+    except (OSError, ValueError):
+        return None
+    if (index.get('version') != INDEX_VERSION or index.get('root') != root
+            or index.get('output') != {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}):
+        return None
+    return index
+
+def save_index(output, root, files):
+    st = os.stat(output)
+    index = {
+        'version': INDEX_VERSION,
+        'root': root,
+        'output': {'mtime_ns': st.st_mtime_ns, 'size': st.st_size},
+        'files': files,
+    }
+    with open(index_path(output), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+
+def remove_index(output):
+    try:
+        os.remove(index_path(output))
+    except FileNotFoundError:
+        pass
+
+# =============================================================================
+# OUTPUT MODES
+# =============================================================================
+
+def write_prompt(out, root, max_tokens=None, workers=8):
+    """
+    Write the full prompt. Returns the per-file index entries (fingerprint plus
+    section offset/length), or None when the output was cut by the token budget.
+    """
+    structure, filepaths = list_files(root)
+    header = format_header(structure)
+    out.write(header)
+
+    budget = max_tokens * CHARS_PER_TOKEN - len(header) if max_tokens else None
+    chunks = read_in_order(filepaths, root, workers, (lambda: max(budget, 0)) if budget is not None else None)
+    files = {}
+    seen = {}
+    offset = len(header)
+    for written, (chunk, fingerprint) in enumerate(chunks):
+        rel = os.path.relpath(filepaths[written], root)
+        chunk, fingerprint = dedupe(rel, chunk, fingerprint, seen)
+        if budget is not None and len(chunk) > budget:
+            if budget > 0:
+                out.write(chunk[:budget])
+                out.write("\n(TRUNCATED: token budget reached)\n\n")
+                written += 1
+            if written < len(filepaths):
+                out.write(f"({len(filepaths) - written} more files omitted: token budget reached)\n")
+            chunks.close()
+            return None
+        out.write(chunk)
+        files[rel] = dict(fingerprint, offset=offset, length=len(chunk))
+        offset += len(chunk)
+        if budget is not None:
+            budget -= len(chunk)
+    return files
+
+def update_prompt(output, root, workers=8):
+    """
+    Incrementally refresh an existing output: files whose mtime and size match the
+    index are copied from the previous output, only the rest are re-read.
+    Falls back to a full rebuild when there is no usable index.
+    """
+    index = load_index(output, root)
+    if index is None:
+        print("No usable index, writing full prompt")
+        with open(output, 'w', encoding='utf-8') as out:
+            files = write_prompt(out, root, workers=workers)
+        save_index(output, root, files)
+        return
+
+    with open(output, 'r', encoding='utf-8') as f:
+        previous = f.read()
+    old_files = index['files']
+
     structure, filepaths = list_files(root)
-    with open('repo_structure_and_scripts.txt', 'w', encoding='utf-8') as out:
-        out.write("Repository Structure\n\n")
-        for line in structure:
-            out.write(line + '\n')
-        out.write("\n\nFile Contents\n\n")
+    stale = []
+    for path in filepaths:
+        entry = old_files.get(os.path.relpath(path, root))
+        st = os.stat(path)
+        if not entry or entry['mtime_ns'] != st.st_mtime_ns or entry['size'] != st.st_size:
+            stale.append(path)
+    fresh = dict(zip(stale, read_in_order(stale, root, workers)))
+
+    header = format_header(structure)
+    files = {}
+    seen = {}
+    offset = len(header)
+    reread = 0
+    tmp_output = f"{output}.tmp"
+    with open(tmp_output, 'w', encoding='utf-8') as out:
+        out.write(header)
         for path in filepaths:
             rel = os.path.relpath(path, root)
-            if is_binary(path):
-                out.write(f"// filepath: {rel}\n(BINARY FILE SKIPPED)\n\n")
-                continue
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                out.write(f"// filepath: {rel}\n")
-                out.write(content)
-                if not content.endswith('\n'):
-                    out.write('\n')
-                out.write('\n')
-            except Exception as e:
-                out.write(f"// filepath: {rel}\n(COULD NOT READ FILE: {e})\n\n")
+            entry = old_files.get(rel)
+            if path in fresh:
+                chunk, fingerprint = fresh[path]
+                # Written from the fresh read; a touched file with identical bytes is not counted as changed
+                if not (entry and fingerprint['sha256'] and fingerprint['sha256'] == entry['sha256']):
+                    reread += 1
+            elif entry.get('duplicate_of') and entry['sha256'] not in seen:
+                # Was a reference, but the first copy changed or is gone - content needed now
+                chunk, fingerprint = read_chunk(path, root)
+            else:
+                chunk = previous[entry['offset']:entry['offset'] + entry['length']]
+                fingerprint = {k: entry[k] for k in ('mtime_ns', 'size', 'sha256', 'duplicate_of') if k in entry}
+            chunk, fingerprint = dedupe(rel, chunk, fingerprint, seen)
+            out.write(chunk)
+            files[rel] = dict(fingerprint, offset=offset, length=len(chunk))
+            offset += len(chunk)
+    os.replace(tmp_output, output)
+    save_index(output, root, files)
+
+    removed = len(set(old_files) - set(files))
+    print(f"Updated {output}: {reread} changed, {len(filepaths) - len(stale)} unchanged, {removed} removed")
+
+def git_lines(root, *args):
+    result = subprocess.run(['git', *args], cwd=root, capture_output=True, text=True, check=True)
+    return [line for line in result.stdout.splitlines() if line]
+
+def write_changes(out, root, rev, workers=8):
+    """Write a diff-only prompt: files changed since rev, the git diff, and new untracked files in full."""
+    changed = []
+    for line in git_lines(root, 'diff', '--name-status', '--relative', rev, '--', '.'):
+        status, *paths = line.split('\t')
+        if not is_excluded(os.path.normpath(paths[-1])):
+            changed.append((status[0], paths[-1]))
+    untracked = [p for p in git_lines(root, 'ls-files', '--others', '--exclude-standard', '.')
+                 if not is_excluded(os.path.normpath(p))]
+
+    out.write(f"Changed Files since {rev}\n\n")
+    for status, rel in changed:
+        out.write(f"{status} {rel}\n")
+    for rel in untracked:
+        out.write(f"? {rel}\n")
+
+    out.write("\n\nDiff\n\n")
+    tracked = [rel for _, rel in changed]
+    if tracked:
+        diff = subprocess.run(['git', 'diff', '--relative', rev, '--', *tracked],
+                              cwd=root, capture_output=True, text=True, check=True).stdout
+        out.write(diff)
+
+    if untracked:
+        out.write("\n\nNew Files\n\n")
+        for chunk, _ in read_in_order([os.path.join(root, p) for p in untracked], root, workers):
+            out.write(chunk)
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump repository structure and file contents into one prompt file")
+    parser.add_argument('--max-tokens', type=int, help="Stop once the output reaches roughly this many tokens")
+    parser.add_argument('--workers', type=int, default=8, help="Threads used to read files (default: 8)")
+    parser.add_argument('--output', default=OUTPUT_FILE, help=f"Output file (default: {OUTPUT_FILE})")
+    parser.add_argument('--incremental', action='store_true', help="Only re-read files changed since the last run")
+    parser.add_argument('--changed-since', metavar='GIT_REV', help="Write only files changed since GIT_REV (diff-only prompt)")
+    args = parser.parse_args()
+    if args.max_tokens and (args.incremental or args.changed_since):
+        parser.error("--max-tokens cannot be combined with --incremental or --changed-since")
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    if args.changed_since:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            write_changes(out, root, args.changed_since, args.workers)
+        # Output no longer matches the full prompt the index describes
+        remove_index(args.output)
+        return
+    if args.incremental:
+        update_prompt(args.output, root, args.workers)
+        return
+
+    with open(args.output, 'w', encoding='utf-8') as out:
+        files = write_prompt(out, root, args.max_tokens, args.workers)
+    if files is None:
+        remove_index(args.output)
+    else:
+        save_index(args.output, root, files)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
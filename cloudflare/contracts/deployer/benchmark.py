@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Local Devnet Benchmark for the Deployment Script
+
+Starts N local EVM instances (py-evm via eth-tester, each behind its own JSON-RPC
+HTTP endpoint and with a distinct chain id) and runs the full deploy_to_chain flow
+from deploy.py against them, serially and in parallel. Reports time per phase
+(compile, preflight, deploy, receipt wait, event parsing), RPC call counts and
+total gas, so deployment latency regressions can be tracked as CHAINS grows.
+
+Usage:
+    1. Install dependencies: pip install web3 py-solc-x "eth-tester[py-evm]"
+    2. Run: python benchmark.py --chains 4
+       Simulate slower RPCs / blocks: python benchmark.py --chains 8 --latency-ms 150 --block-time 2
+       Save a machine-readable report: python benchmark.py --json benchmark_results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+from eth_account import Account
+from web3 import Web3
+
+import deploy
+from devnet import DevnetNode
+
+# First chain id handed out to local devnets (each node gets the next one)
+BASE_CHAIN_ID = 900001
+
+# Funds sent to the deployer account on every devnet
+DEPLOYER_FUNDING = Web3.to_wei(100, "ether")
+
+PHASES = ["preflight", "deploy", "receipt_wait", "event_parsing"]
+
+
+# =============================================================================
+# LOCAL DEVNET
+# =============================================================================
+
+def start_devnets(count, latency, block_time):
+    """Start count devnets with distinct chain ids."""
+    return [
+        DevnetNode(BASE_CHAIN_ID + i, latency, block_time).start()
+        for i in range(count)
+    ]
+
+
+# =============================================================================
+# PHASE TIMING
+# =============================================================================
+
+class PhaseRecorder:
+    """
+    Records time per deployment phase and gas used, per chain.
+
+    Wraps the deploy.py functions that mark phase boundaries. The chain being
+    deployed is tracked per thread, so it works for serial and parallel runs.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.chains = {}
+        self.originals = {}
+
+    def add(self, phase, seconds):
+        chain_id = getattr(self.local, "chain_id", None)
+        if chain_id is None:
+            return
+        with self.lock:
+            entry = self.chains[chain_id]
+            entry[phase] = entry.get(phase, 0.0) + seconds
+
+    def timed(self, phase, func):
+        recorder = self
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.add(phase, time.perf_counter() - started)
+
+        return wrapper
+
+    def install(self):
+        """Patch deploy.py phase boundaries with timing wrappers."""
+        recorder = self
+        self.originals = {
+            "deploy_to_chain": deploy.deploy_to_chain,
+            "preflight_chain": deploy.preflight_chain,
+            "get_deployed_factory_address": deploy.get_deployed_factory_address,
+            "wait_for_receipts": deploy.NonceManager.wait_for_receipts,
+        }
+
+        original_deploy = self.originals["deploy_to_chain"]
+        original_wait = self.originals["wait_for_receipts"]
+
+        def deploy_to_chain(chain_config, compiled_contracts, options=None):
+            recorder.local.chain_id = chain_config["chain_id"]
+            with recorder.lock:
+                recorder.chains[chain_config["chain_id"]] = {"gas_used": 0}
+            started = time.perf_counter()
+            try:
+                return original_deploy(chain_config, compiled_contracts, options)
+            finally:
+                recorder.add("total", time.perf_counter() - started)
+                recorder.local.chain_id = None
+
+        def wait_for_receipts(nonces, *args, **kwargs):
+            started = time.perf_counter()
+            mined = original_wait(nonces, *args, **kwargs)
+            recorder.add("receipt_wait", time.perf_counter() - started)
+            recorder.add("gas_used", sum(p.receipt["gasUsed"] for p in mined.values()))
+            return mined
+
+        deploy.deploy_to_chain = deploy_to_chain
+        deploy.preflight_chain = self.timed("preflight", self.originals["preflight_chain"])
+        deploy.get_deployed_factory_address = self.timed(
+            "event_parsing", self.originals["get_deployed_factory_address"]
+        )
+        deploy.NonceManager.wait_for_receipts = wait_for_receipts
+
+    def uninstall(self):
+        deploy.deploy_to_chain = self.originals["deploy_to_chain"]
+        deploy.preflight_chain = self.originals["preflight_chain"]
+        deploy.get_deployed_factory_address = self.originals["get_deployed_factory_address"]
+        deploy.NonceManager.wait_for_receipts = self.originals["wait_for_receipts"]
+
+    def chain_report(self, chain_id):
+        """Phase durations for one chain; 'deploy' is everything not covered by another phase."""
+        entry = dict(self.chains.get(chain_id, {}))
+        measured = sum(entry.get(phase, 0.0) for phase in ("preflight", "receipt_wait", "event_parsing"))
+        entry["deploy"] = max(entry.get("total", 0.0) - measured, 0.0)
+        for phase in PHASES + ["total"]:
+            entry.setdefault(phase, 0.0)
+        return entry
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def run_mode(mode, compiled, args):
+    """Deploy to fresh devnets in one mode ('serial' or 'parallel') and collect metrics."""
+    nodes = start_devnets(args.chains, args.latency_ms / 1000, args.block_time)
+    deployer = Account.create()
+    for node in nodes:
+        node.fund(deployer.address, DEPLOYER_FUNDING)
+        # Funding is not part of the measured deployment
+        node.reset_counters()
+
+    chains = [
+        {"name": f"Devnet {node.chain_id}", "chain_id": node.chain_id, "rpc_url": node.rpc_url}
+        for node in nodes
+    ]
+
+    workdir = tempfile.mkdtemp(prefix="lazai-bench-")
+    config_id = deploy.journal_config_id(compiled)
+    options = deploy.DeploymentOptions(
+        journal=deploy.DeploymentJournal(os.path.join(workdir, deploy.JOURNAL_FILE), config_id),
+        gas_cache=deploy.GasEstimateCache(os.path.join(workdir, "gas_estimates.json")),
+        config_id=config_id,
+        poll_interval=args.poll_interval,
+    )
+
+    original_key = deploy.PRIVATE_KEY
+    deploy.PRIVATE_KEY = deployer.key.hex()
+    recorder = PhaseRecorder()
+    recorder.install()
+
+    output = None if args.verbose else io.StringIO()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+            if mode == "parallel":
+                results = deploy.deploy_parallel(chains, compiled, len(chains), options)
+            else:
+                # Same as deploy_sequential() minus its fixed 2s pause between chains
+                results = [deploy.deploy_chain_safe(chain, compiled, options) for chain in chains]
+        wall_time = time.perf_counter() - started
+    finally:
+        recorder.uninstall()
+        deploy.PRIVATE_KEY = original_key
+        for node in nodes:
+            node.stop()
+
+    per_chain = []
+    for chain, node, result in zip(chains, nodes, results):
+        phases = recorder.chain_report(chain["chain_id"])
+        per_chain.append({
+            "chain_id": chain["chain_id"],
+            "ok": "error" not in result,
+            "error": result.get("error"),
+            "phases": {phase: round(phases[phase], 4) for phase in PHASES + ["total"]},
+            "gas_used": int(phases.get("gas_used", 0)),
+            "http_requests": node.http_requests,
+            "rpc_calls": node.rpc_calls,
+            "rpc_methods": dict(sorted(node.method_counts.items())),
+        })
+
+    return {
+        "mode": mode,
+        "wall_time": round(wall_time, 4),
+        "chains": per_chain,
+        "http_requests": sum(c["http_requests"] for c in per_chain),
+        "rpc_calls": sum(c["rpc_calls"] for c in per_chain),
+        "gas_used": sum(c["gas_used"] for c in per_chain),
+        "failures": sum(1 for c in per_chain if not c["ok"]),
+    }
+
+
+def print_report(report):
+    """Print a human-readable summary of a benchmark run."""
+    print("\n" + "="*60)
+    print("DEPLOYMENT BENCHMARK")
+    print("="*60)
+    print(f"Chains: {report['chains']}, RPC latency: {report['latency_ms']} ms, "
+          f"block time: {report['block_time']} s")
+    print(f"Compile: {report['compile_time'] * 1000:.0f} ms")
+
+    header = f"  {'chain':>8} " + " ".join(f"{phase:>14}" for phase in PHASES + ["total"]) + f" {'http':>5} {'rpc':>5} {'gas':>9}"
+    for run in report["runs"]:
+        print(f"\n{run['mode'].upper()}: wall time {run['wall_time']:.2f} s, "
+              f"{run['http_requests']} HTTP requests, {run['rpc_calls']} RPC calls, "
+              f"{run['gas_used']} gas, {run['failures']} failed")
+        print(header)
+        for chain in run["chains"]:
+            phases = " ".join(f"{chain['phases'][phase] * 1000:>12.0f}ms" for phase in PHASES + ["total"])
+            print(f"  {chain['chain_id']:>8} {phases} {chain['http_requests']:>5} {chain['rpc_calls']:>5} {chain['gas_used']:>9}")
+            if chain["error"]:
+                print(f"           ERROR: {chain['error']}")
+
+    runs = {run["mode"]: run for run in report["runs"]}
+    if "serial" in runs and "parallel" in runs and runs["parallel"]["wall_time"]:
+        speedup = runs["serial"]["wall_time"] / runs["parallel"]["wall_time"]
+        print(f"\nParallel speedup: {speedup:.2f}x")
+    print("="*60)
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Benchmark deploy.py against local EVM devnets")
+    parser.add_argument("--chains", type=int, default=4, help="Number of local devnets (default: 4)")
+    parser.add_argument(
+        "--mode",
+        choices=["serial", "parallel", "both"],
+        default="both",
+        help="Deployment mode(s) to benchmark (default: both)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=50, help="Artificial RPC latency per HTTP request (default: 50)")
+    parser.add_argument("--block-time", type=float, default=1.0, help="Seconds before a sent transaction's receipt is visible (default: 1.0)")
+    parser.add_argument("--poll-interval", type=float, default=deploy.POLL_INITIAL_INTERVAL, help="Initial receipt polling interval")
+    parser.add_argument("--json", metavar="FILE", help="Also write the report as JSON to FILE")
+    parser.add_argument("--verbose", action="store_true", help="Show deploy.py output")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark."""
+    args = parse_args()
+
+    output = None if args.verbose else io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+        compiled = deploy.compile_contracts()
+    compile_time = time.perf_counter() - started
+
+    modes = ["serial", "parallel"] if args.mode == "both" else [args.mode]
+    report = {
+        "chains": args.chains,
+        "latency_ms": args.latency_ms,
+        "block_time": args.block_time,
+        "compile_time": round(compile_time, 4),
+        "runs": [run_mode(mode, compiled, args) for mode in modes],
+    }
+
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
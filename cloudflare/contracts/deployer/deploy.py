@@ -9,13 +9,39 @@ Usage:
     1. Install dependencies: pip install web3 py-solc-x
     2. Update configuration variables below
     3. Run: python deploy.py
+       Deploy to several chains at once: python deploy.py --parallel 4
+       Verify deployed factories on all chains: python deploy.py --verify
 """
 
+import argparse
+import hashlib
+import io
 import json
+import os
+import sys
+import threading
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from eth_abi import decode as abi_decode
+from eth_abi import encode as abi_encode
+from eth_utils import keccak, to_canonical_address, to_checksum_address
 from web3 import Web3
-from solcx import compile_standard, install_solc
+from web3.exceptions import TransactionNotFound
+
+from gas_strategy import (
+    POLL_INITIAL_INTERVAL,
+    GasEstimateCache,
+    bump_fees,
+    choose_gas_limit,
+    describe_fees,
+    fee_history_params,
+    fee_params,
+    max_fee_per_gas,
+    poll_intervals,
+)
+from solcx import compile_standard, get_installed_solc_versions, install_solc
 
 # =============================================================================
 # CONFIGURATION - UPDATE THESE VALUES BEFORE RUNNING
@@ -59,13 +85,28 @@ CHAINS = [
 # Solidity compiler version
 SOLC_VERSION = "0.8.20"
 
+# Compiler settings - part of the compile cache key
+COMPILER_SETTINGS = {
+    "optimizer": {"enabled": True, "runs": 200},
+    "outputSelection": {
+        "*": {
+            "*": ["abi", "metadata", "evm.bytecode", "evm.deployedBytecode", "evm.sourceMap"]
+        }
+    },
+}
+
+# Compiled artifacts are cached here, keyed by sources + compiler version + settings
+COMPILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".build_cache")
+
+# Gas used per chain/step in previous runs (gas limit source when estimation is not possible)
+GAS_CACHE_FILE = os.path.join(COMPILE_CACHE_DIR, "gas_estimates.json")
+
 # =============================================================================
 # CONTRACT SOURCE CODE
 # =============================================================================
 
 def get_contract_sources():
     """Load contract source files from disk."""
-    import os
     base_path = os.path.dirname(os.path.abspath(__file__))
 
     sources = {}
@@ -95,11 +136,66 @@ def get_contract_sources():
     return sources
 
 
-def compile_contracts():
-    """Compile Solidity contracts."""
+def ensure_solc_installed():
+    """Install the Solidity compiler unless this version is already present."""
+    installed = {str(v) for v in get_installed_solc_versions()}
+    if SOLC_VERSION in installed:
+        print(f"Solidity compiler {SOLC_VERSION} already installed")
+        return
+
     print(f"Installing Solidity compiler {SOLC_VERSION}...")
     install_solc(SOLC_VERSION)
 
+
+def compile_cache_key(sources):
+    """Hash sources, compiler version and settings into a cache key."""
+    digest = hashlib.sha256()
+    digest.update(SOLC_VERSION.encode())
+    digest.update(json.dumps(COMPILER_SETTINGS, sort_keys=True).encode())
+    for filename in sorted(sources):
+        digest.update(filename.encode())
+        digest.update(b"\0")
+        digest.update(sources[filename]["content"].encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_cached_compile(cache_key):
+    """Return cached compiler output for this key, or None on a miss."""
+    cache_file = os.path.join(COMPILE_CACHE_DIR, f"{cache_key}.json")
+    try:
+        with open(cache_file, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"  Warning: Ignoring unreadable compile cache entry: {e}")
+        return None
+
+
+def save_cached_compile(cache_key, compiled):
+    """Store compiler output under this key (atomic write)."""
+    os.makedirs(COMPILE_CACHE_DIR, exist_ok=True)
+    cache_file = os.path.join(COMPILE_CACHE_DIR, f"{cache_key}.json")
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(compiled, f)
+    os.replace(tmp_file, cache_file)
+
+
+def compile_contracts(use_cache=True, rebuild=False):
+    """
+    Compile Solidity contracts.
+
+    Output is cached on disk keyed by a hash of the sources, solc version and
+    compiler settings, so unchanged contracts are loaded without invoking solc.
+
+    Args:
+        use_cache: Read and write the compile cache (--no-cache disables it)
+        rebuild: Ignore any cached output, recompile and refresh the cache (--rebuild)
+    """
+    started = time.perf_counter()
+
     print("Compiling contracts...")
     sources = get_contract_sources()
     
@@ -107,31 +203,55 @@ def compile_contracts():
     for filename in sources.keys():
         print(f"    - {filename}")
 
+    cache_key = compile_cache_key(sources)
+
+    if use_cache and not rebuild:
+        compiled = load_cached_compile(cache_key)
+        if compiled is not None:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"Compile cache: HIT (key {cache_key[:12]}, loaded in {elapsed_ms:.1f} ms)")
+            return compiled
+
+    if not use_cache:
+        print("Compile cache: DISABLED (--no-cache)")
+    elif rebuild:
+        print(f"Compile cache: REBUILD (key {cache_key[:12]})")
+    else:
+        print(f"Compile cache: MISS (key {cache_key[:12]})")
+
+    ensure_solc_installed()
+
     print("Compiling flattened contracts...")
 
     compiled = compile_standard(
         {
             "language": "Solidity",
             "sources": sources,
-            "settings": {
-                "optimizer": {"enabled": True, "runs": 200},
-                "outputSelection": {
-                    "*": {
-                        "*": ["abi", "metadata", "evm.bytecode", "evm.sourceMap"]
-                    }
-                },
-            },
+            "settings": COMPILER_SETTINGS,
         },
         solc_version=SOLC_VERSION,
         allow_paths=["."],
     )
 
+    if use_cache:
+        save_cached_compile(cache_key, compiled)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"  Compiled in {elapsed_ms:.0f} ms")
+
     return compiled
 
 
-def get_contract_data(compiled, contract_name):
-    """Extract ABI and bytecode for a contract."""
-    for source_file, contracts in compiled["contracts"].items():
+def get_contract_data(compiled, contract_name, source_file=None):
+    """
+    Extract ABI and bytecode for a contract.
+
+    Some contracts (LazaiTradingWallet) exist in both flattened files - pass
+    source_file to pick the copy that another contract actually embeds.
+    """
+    for source_name, contracts in compiled["contracts"].items():
+        if source_file and source_name != source_file:
+            continue
         if contract_name in contracts:
             contract = contracts[contract_name]
             return {
@@ -149,20 +269,566 @@ def get_contract_data(compiled, contract_name):
 
 
 # =============================================================================
-# DEPLOYMENT FUNCTIONS
+# OFFLINE ADDRESS PREDICTION
 # =============================================================================
 
-def estimate_gas_with_fallback(w3, tx, default_gas=3000000):
-    """Try to estimate gas, fall back to default if it fails."""
+# Source file whose contracts FactoryDeployer embeds via type(...).creationCode
+FACTORY_SOURCE = "LazaiTradingFactory_flattened.sol"
+
+# Salts - must match the constants in FactoryDeployer.sol / LazaiWalletFactory.sol
+FACTORY_CREATION_SALT = keccak(b"LazaiFactory_Mainnet_v1")
+WALLET_SALT_VERSION = keccak(b"LazaiTrader_v1")
+
+
+def rlp_encode_bytes(data):
+    """RLP-encode a short byte string (enough for addresses and nonces)."""
+    if len(data) == 1 and data[0] < 0x80:
+        return data
+    if len(data) > 55:
+        raise ValueError("rlp_encode_bytes only supports strings up to 55 bytes")
+    return bytes([0x80 + len(data)]) + data
+
+
+def predict_create_address(sender, nonce):
+    """Address of a contract deployed with CREATE: keccak256(rlp([sender, nonce]))[12:]."""
+    nonce_bytes = nonce.to_bytes((nonce.bit_length() + 7) // 8, "big")
+    payload = rlp_encode_bytes(to_canonical_address(sender)) + rlp_encode_bytes(nonce_bytes)
+    return to_checksum_address(keccak(bytes([0xc0 + len(payload)]) + payload)[12:])
+
+
+def predict_create2_address(deployer, salt, init_code_hash):
+    """Address of a contract deployed with CREATE2: keccak256(0xff ++ deployer ++ salt ++ keccak256(init_code))[12:]."""
+    return to_checksum_address(
+        keccak(b"\xff" + to_canonical_address(deployer) + salt + init_code_hash)[12:]
+    )
+
+
+def factory_init_code_hash(compiled):
+    """keccak256 of LazaiWalletFactory creation code + abi.encode(BOT_OPERATOR, WHITELISTED_DEXES)."""
+    factory_data = get_contract_data(compiled, "LazaiWalletFactory", FACTORY_SOURCE)
+    init_code = bytes.fromhex(factory_data["bytecode"]) + abi_encode(
+        ["address", "address[]"],
+        [BOT_OPERATOR, WHITELISTED_DEXES],
+    )
+    return keccak(init_code)
+
+
+def predict_factory_address_offline(deployer_address, init_code_hash):
+    """Predict the LazaiWalletFactory address deployed by a given FactoryDeployer."""
+    return predict_create2_address(deployer_address, FACTORY_CREATION_SALT, init_code_hash)
+
+
+def predict_wallet_addresses(compiled, factory_address, owners):
+    """
+    Batch-predict LazaiTradingWallet addresses for many owners.
+
+    Mirrors LazaiWalletFactory.computeWalletAddress(). Only the owner word of the
+    init code changes between owners, so the creation code and the static
+    (botOperator, factory) words are built once and reused.
+
+    Returns:
+        list of (owner, wallet_address) tuples in input order
+    """
+    wallet_data = get_contract_data(compiled, "LazaiTradingWallet", FACTORY_SOURCE)
+    creation_code = bytes.fromhex(wallet_data["bytecode"])
+    factory_bytes = to_canonical_address(factory_address)
+    prefix = b"\xff" + factory_bytes
+    suffix = (
+        b"\x00" * 12 + to_canonical_address(BOT_OPERATOR)
+        + b"\x00" * 12 + factory_bytes
+    )
+
+    predictions = []
+    for owner in owners:
+        owner_bytes = to_canonical_address(owner)
+        salt = keccak(owner_bytes + WALLET_SALT_VERSION)
+        init_code_hash = keccak(creation_code + b"\x00" * 12 + owner_bytes + suffix)
+        wallet = to_checksum_address(keccak(prefix + salt + init_code_hash)[12:])
+        predictions.append((to_checksum_address(owner), wallet))
+
+    return predictions
+
+
+def plan_chain(chain_config, deployer_account_address, init_code_hash):
+    """Read the deployer nonce on one chain and predict both contract addresses."""
+    w3 = Web3(Web3.HTTPProvider(chain_config["rpc_url"]))
+    nonce = w3.eth.get_transaction_count(deployer_account_address)
+    deployer_address = predict_create_address(deployer_account_address, nonce)
+    return {
+        "chain": chain_config["name"],
+        "chain_id": chain_config["chain_id"],
+        "nonce": nonce,
+        "deployer_address": deployer_address,
+        "factory_address": predict_factory_address_offline(deployer_address, init_code_hash),
+    }
+
+
+def plan_deployment(chains, compiled):
+    """
+    Print predicted FactoryDeployer and factory addresses for all chains.
+
+    Only read-only nonce lookups are made (concurrently); no transaction is sent.
+    The factory address only matches across chains when the deployer account
+    has the same nonce on every chain.
+    """
+    account_address = Web3().eth.account.from_key(PRIVATE_KEY).address
+    init_code_hash = factory_init_code_hash(compiled)
+
+    print("\n" + "="*60)
+    print("DEPLOYMENT PLAN (no transactions sent)")
+    print("="*60)
+    print(f"Deployer account: {account_address}")
+    print(f"Factory init code hash: 0x{init_code_hash.hex()}")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(chains))) as executor:
+        futures = {
+            executor.submit(plan_chain, chain, account_address, init_code_hash): chain
+            for chain in chains
+        }
+        for future in as_completed(futures):
+            chain = futures[future]
+            try:
+                results[chain["chain_id"]] = future.result()
+            except Exception as e:
+                results[chain["chain_id"]] = {
+                    "chain": chain["name"],
+                    "chain_id": chain["chain_id"],
+                    "error": str(e),
+                }
+
+    plan = [results[chain["chain_id"]] for chain in chains]
+
+    factory_addresses = set()
+    for entry in plan:
+        print(f"\n{entry['chain']} (Chain ID: {entry['chain_id']}):")
+        if "error" in entry:
+            print(f"  ERROR: {entry['error']}")
+            continue
+        print(f"  Nonce: {entry['nonce']}")
+        print(f"  FactoryDeployer: {entry['deployer_address']}")
+        print(f"  Factory: {entry['factory_address']}")
+        factory_addresses.add(entry["factory_address"].lower())
+
+    print("\n" + "="*60)
+    if len(factory_addresses) == 1:
+        print("Predicted factory addresses match across chains")
+    elif len(factory_addresses) > 1:
+        print("WARNING: Predicted factory addresses differ across chains!")
+        print("Align the deployer account nonce on every chain before deploying.")
+    print("="*60)
+
+    return plan
+
+
+def save_wallet_predictions(compiled, factory_address, owners_file, output_file="wallet_predictions.csv"):
+    """Predict wallet addresses for every owner listed in owners_file (one per line) and save as CSV."""
+    with open(owners_file, "r") as f:
+        owners = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    started = time.perf_counter()
+    predictions = predict_wallet_addresses(compiled, factory_address, owners)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    with open(output_file, "w") as f:
+        f.write("owner,wallet\n")
+        for owner, wallet in predictions:
+            f.write(f"{owner},{wallet}\n")
+
+    print(f"\nPredicted {len(predictions)} wallet addresses in {elapsed_ms:.1f} ms")
+    print(f"Factory: {to_checksum_address(factory_address)}")
+    print(f"Results saved to {output_file}")
+
+
+# =============================================================================
+# PREFLIGHT (BATCHED JSON-RPC)
+# =============================================================================
+
+# Sequential RPC round-trips the deploy flow used to make before the first transaction
+# (is_connected, chain_id, get_balance x2, gas_price, get_transaction_count x2, estimate_gas)
+SEQUENTIAL_PREFLIGHT_REQUESTS = 8
+
+
+def create_rpc_session():
+    """Create a keep-alive HTTP session shared by all RPC calls to one chain."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def deployer_constructor_data(contract_data):
+    """Creation code + abi-encoded constructor args for FactoryDeployer."""
+    return "0x" + contract_data["bytecode"] + abi_encode(["address"], [BOT_OPERATOR]).hex()
+
+
+def rpc_post(session, rpc_url, payload):
+    """POST one JSON-RPC request or batch and return the decoded body."""
+    response = session.post(rpc_url, json=payload, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def rpc_batch(session, rpc_url, calls):
+    """
+    Send calls as one JSON-RPC batch and return (replies by key, HTTP requests made).
+
+    A reply is {"result": ...} or {"error": ...}. Falls back to one request per
+    call if the RPC does not support batches: it answers the batch with an HTTP
+    error (e.g. 400 or 413), a body that is not JSON, or a single error object.
+    """
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+        for i, (_, method, params) in enumerate(calls)
+    ]
     try:
-        estimated = w3.eth.estimate_gas(tx)
-        # Add 20% buffer
-        return int(estimated * 1.2)
-    except Exception as e:
-        print(f"  Warning: Gas estimation failed: {e}")
-        print(f"  Using default gas: {default_gas}")
-        return default_gas
+        replies = rpc_post(session, rpc_url, payload)
+        rejected = None if isinstance(replies, list) else f"non-batch reply {str(replies)[:120]}"
+    except (requests.HTTPError, ValueError) as e:
+        rejected = str(e)
+    http_requests = 1
+
+    if rejected is None:
+        print(f"  RPC: {len(calls)} calls in 1 batch request")
+    else:
+        print(f"  RPC: batch rejected ({rejected}), sending {len(calls)} calls one by one")
+        replies = []
+        for request in payload:
+            try:
+                replies.append(rpc_post(session, rpc_url, request))
+            except (requests.HTTPError, ValueError) as e:
+                replies.append({"id": request["id"], "error": str(e)})
+        http_requests += len(payload)
+
+    replies = {reply.get("id"): reply for reply in replies if isinstance(reply, dict)}
+    results = {}
+    for i, (key, method, _) in enumerate(calls):
+        reply = replies.get(i)
+        if reply is None:
+            results[key] = {"error": f"batch response is missing {method}"}
+        elif "error" in reply:
+            error = reply["error"]
+            results[key] = {"error": error.get("message", str(error)) if isinstance(error, dict) else str(error)}
+        else:
+            results[key] = {"result": reply["result"]}
+    return results, http_requests
+
+
+def preflight_chain(session, rpc_url, account_address, deploy_data):
+    """
+    Read everything needed before the first transaction in one JSON-RPC batch.
+
+    Sends eth_chainId, eth_getBalance, eth_gasPrice, eth_getTransactionCount,
+    eth_feeHistory and eth_estimateGas (FactoryDeployer creation) as a single HTTP
+    request over the chain's keep-alive session (one request per call if the RPC
+    rejects batches, see rpc_batch).
+
+    Returns:
+        dict with chain_id, balance, gas_price, nonce, fee_history (None if the chain
+        has no EIP-1559 support), estimated_gas (None if the estimate failed),
+        estimate_error, http_requests and elapsed_ms
+    """
+    calls = [
+        ("chain_id", "eth_chainId", []),
+        ("balance", "eth_getBalance", [account_address, "latest"]),
+        ("gas_price", "eth_gasPrice", []),
+        ("nonce", "eth_getTransactionCount", [account_address, "latest"]),
+        ("fee_history", "eth_feeHistory", fee_history_params()),
+        ("estimated_gas", "eth_estimateGas", [{"from": account_address, "data": deploy_data}]),
+    ]
 
+    started = time.perf_counter()
+    replies, http_requests = rpc_batch(session, rpc_url, calls)
+
+    result = {"fee_history": None, "estimated_gas": None, "estimate_error": None, "http_requests": http_requests}
+
+    for key, method, _ in calls:
+        reply = replies[key]
+        if "error" in reply:
+            if key == "estimated_gas":
+                result["estimate_error"] = reply["error"]
+                continue
+            if key == "fee_history":
+                # Pre-London chain - legacy gasPrice is used
+                continue
+            raise Exception(f"{method} failed: {reply['error']}")
+        if key == "fee_history":
+            result[key] = reply["result"]
+        else:
+            result[key] = int(reply["result"], 16)
+
+    result["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+# =============================================================================
+# DEPLOYMENT JOURNAL
+# =============================================================================
+
+# Deployment steps recorded per chain
+STEP_DEPLOYER = "FactoryDeployer"
+STEP_FACTORY = "Factory"
+
+JOURNAL_FILE = "deployment_journal.jsonl"
+
+
+def receipt_summary(receipt):
+    """JSON-serializable subset of a transaction receipt."""
+    return {
+        "transactionHash": Web3.to_hex(receipt["transactionHash"]),
+        "blockNumber": receipt["blockNumber"],
+        "status": receipt["status"],
+        "gasUsed": receipt["gasUsed"],
+        "contractAddress": receipt.get("contractAddress"),
+    }
+
+
+def journal_config_id(compiled):
+    """Identify the deployed code + constructor config, so --resume never mixes configurations."""
+    deployer_data = get_contract_data(compiled, "FactoryDeployer")
+    digest = hashlib.sha256()
+    digest.update(bytes.fromhex(deployer_data["bytecode"]))
+    digest.update(factory_init_code_hash(compiled))
+    return digest.hexdigest()[:16]
+
+
+class DeploymentJournal:
+    """
+    Append-only JSON lines log of every deployment step per chain.
+
+    Each line is one event (sent, replaced, mined, completed) for one step on one
+    chain, written as soon as it happens. --resume folds the events back into the
+    latest state per step to skip finished work and poll transactions that are
+    still pending instead of resending them.
+    """
+
+    def __init__(self, path, config_id):
+        self.path = path
+        self.config_id = config_id
+        self.lock = threading.Lock()
+
+    def record(self, chain_id, step, event, **fields):
+        """Append one event and flush it to disk immediately."""
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": self.config_id,
+            "chain_id": chain_id,
+            "step": step,
+            "event": event,
+            **fields,
+        }
+        line = json.dumps(entry, default=str)
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self):
+        """Read all journal entries for the current configuration."""
+        entries = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A crash mid-write can leave a truncated last line
+                        continue
+                    if entry.get("config") == self.config_id:
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def chain_state(self, chain_id):
+        """
+        Latest state per step for one chain.
+
+        Returns:
+            dict of step -> {"status": "pending" | "failed" | "completed", "tx": ...,
+            "tx_hashes": [...], "predicted_address": ..., "actual_address": ...}
+        """
+        state = {}
+        for entry in self.load():
+            if entry["chain_id"] != chain_id:
+                continue
+
+            step = state.setdefault(entry["step"], {"tx_hashes": []})
+            event = entry["event"]
+
+            if event == "sent":
+                # A fresh broadcast for this step starts a new attempt
+                step.clear()
+                step.update({
+                    "status": "pending",
+                    "tx": entry["tx"],
+                    "tx_hashes": [entry["tx_hash"]],
+                    "predicted_address": entry.get("predicted_address"),
+                })
+            elif event == "replaced":
+                step["tx"] = entry["tx"]
+                step["tx_hashes"].append(entry["tx_hash"])
+            elif event == "mined":
+                if entry["receipt"]["status"] != 1:
+                    step["status"] = "failed"
+            elif event == "completed":
+                step["status"] = "completed"
+                step["actual_address"] = entry["actual_address"]
+
+        return state
+
+
+# =============================================================================
+# NONCE MANAGEMENT
+# =============================================================================
+
+# Fee multiplier for replacement transactions (nodes require at least +10%)
+REPLACEMENT_GAS_BUMP = 1.125
+
+
+class PendingTransaction:
+    """A submitted transaction and every hash broadcast for its nonce."""
+
+    def __init__(self, label, tx, tx_hash):
+        self.label = label
+        self.tx = tx
+        self.tx_hashes = [tx_hash]
+        self.sent_at = time.time()
+        self.receipt = None
+
+    @property
+    def tx_hash(self):
+        """Hash of the mined transaction, or the latest broadcast one while pending."""
+        if self.receipt is not None:
+            return self.receipt["transactionHash"]
+        return self.tx_hashes[-1]
+
+
+class NonceManager:
+    """
+    Hands out nonces locally for one account on one chain.
+
+    Transactions are signed and broadcast back-to-back without waiting for receipts;
+    wait_for_receipts() then collects them all in one polling loop and replaces
+    transactions that stay unmined for too long with a higher gas price.
+    """
+
+    def __init__(self, w3, account, next_nonce, journal=None, chain_id=None):
+        self.w3 = w3
+        self.account = account
+        self.next_nonce = next_nonce
+        self.pending = []
+        self.lock = threading.Lock()
+        self.journal = journal
+        self.chain_id = chain_id
+
+    def record(self, pending, event, **fields):
+        """Append an event for this transaction to the deployment journal."""
+        if self.journal is not None:
+            self.journal.record(self.chain_id, pending.label, event, nonce=pending.tx["nonce"], **fields)
+
+    def reserve(self):
+        """Reserve the next nonce."""
+        with self.lock:
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+    def submit(self, label, tx, **journal_fields):
+        """Sign and broadcast a transaction built with a reserved nonce."""
+        signed_tx = self.account.sign_transaction(tx)
+        tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        pending = PendingTransaction(label, tx, tx_hash)
+        self.pending.append(pending)
+        self.record(pending, "sent", tx_hash=Web3.to_hex(tx_hash), tx=tx, **journal_fields)
+        print(f"  Sent {label} (nonce {tx['nonce']})... TX: {tx_hash.hex()}")
+        return pending
+
+    def track(self, label, tx, tx_hashes):
+        """Resume waiting on a transaction broadcast by a previous run, without resending it."""
+        pending = PendingTransaction(label, tx, bytes.fromhex(tx_hashes[0].removeprefix("0x")))
+        pending.tx_hashes = [bytes.fromhex(h.removeprefix("0x")) for h in tx_hashes]
+        self.pending.append(pending)
+        with self.lock:
+            self.next_nonce = max(self.next_nonce, tx["nonce"] + 1)
+        print(f"  Resuming {label} (nonce {tx['nonce']})... TX: {tx_hashes[-1]}")
+        return pending
+
+    def replace(self, pending):
+        """Re-broadcast a stuck transaction with the same nonce and higher fees."""
+        tx = bump_fees(pending.tx, REPLACEMENT_GAS_BUMP)
+        signed_tx = self.account.sign_transaction(tx)
+        try:
+            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            # Typically "nonce too low" because the previous broadcast was just mined
+            print(f"  Could not replace {pending.label}: {e}")
+            return
+        pending.tx = tx
+        pending.tx_hashes.append(tx_hash)
+        pending.sent_at = time.time()
+        self.record(pending, "replaced", tx_hash=Web3.to_hex(tx_hash), tx=tx)
+        print(
+            f"  Replaced stuck {pending.label} (nonce {tx['nonce']}) at "
+            f"{describe_fees(self.w3, tx)}... TX: {tx_hash.hex()}"
+        )
+
+    def find_receipt(self, pending):
+        """Return the receipt of whichever broadcast for this nonce was mined, if any."""
+        for tx_hash in reversed(pending.tx_hashes):
+            try:
+                return self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
+    def wait_for_receipts(self, timeout=300, poll_interval=POLL_INITIAL_INTERVAL, stuck_after=90, max_replacements=3):
+        """
+        Wait until every submitted transaction is mined.
+
+        Polls after poll_interval seconds and backs off from there, so fast L2s
+        confirm within a fraction of a second while slow chains are not hammered.
+
+        Returns:
+            dict of label -> PendingTransaction (with .receipt set)
+        """
+        deadline = time.time() + timeout
+        replacements = {}
+        intervals = poll_intervals(initial=poll_interval)
+
+        while True:
+            waiting = [p for p in self.pending if p.receipt is None]
+            for pending in waiting:
+                pending.receipt = self.find_receipt(pending)
+                if pending.receipt is not None:
+                    self.record(pending, "mined", receipt=receipt_summary(pending.receipt))
+
+            waiting = [p for p in waiting if p.receipt is None]
+            if not waiting:
+                return {p.label: p for p in self.pending}
+
+            if time.time() > deadline:
+                labels = ", ".join(p.label for p in waiting)
+                raise Exception(f"Timeout waiting for receipts: {labels}")
+
+            # Only the lowest unmined nonce can be stuck; later ones wait behind it
+            oldest = min(waiting, key=lambda p: p.tx["nonce"])
+            count = replacements.get(oldest.tx["nonce"], 0)
+            if time.time() - oldest.sent_at > stuck_after and count < max_replacements:
+                replacements[oldest.tx["nonce"]] = count + 1
+                self.replace(oldest)
+
+            time.sleep(next(intervals))
+
+
+# =============================================================================
+# DEPLOYMENT FUNCTIONS
+# =============================================================================
 
 def get_revert_reason(w3, tx_hash):
     """Try to get the revert reason from a failed transaction."""
@@ -187,8 +853,8 @@ def get_revert_reason(w3, tx_hash):
     return "Unknown reason"
 
 
-def deploy_factory_deployer(w3, account, contract_data):
-    """Deploy FactoryDeployer contract."""
+def build_factory_deployer_tx(w3, account, contract_data, preflight, fees, nonce, cached_gas=None):
+    """Build the FactoryDeployer creation transaction using values read during preflight."""
     contract = w3.eth.contract(
         abi=contract_data["abi"],
         bytecode=contract_data["bytecode"]
@@ -201,59 +867,60 @@ def deploy_factory_deployer(w3, account, contract_data):
     if bytecode_size > 24576:  # EIP-170 limit
         print(f"  WARNING: Bytecode exceeds 24KB limit! ({bytecode_size} > 24576)")
 
-    # Get current gas price
-    gas_price = w3.eth.gas_price
-    print(f"  Gas price: {w3.from_wei(gas_price, 'gwei')} gwei")
+    if preflight["estimated_gas"] is None:
+        print(f"  Gas estimation failed: {preflight['estimate_error']}")
+
+    gas_limit, source = choose_gas_limit(preflight["estimated_gas"], cached_gas)
+    if source == "estimate":
+        print(f"  Estimated gas: {preflight['estimated_gas']}, using: {gas_limit}")
+    elif source == "cache":
+        print(f"  Using gas from previous run: {cached_gas}, using: {gas_limit}")
+    else:
+        print(f"  Using fallback gas limit: {gas_limit}")
 
-    # Build transaction (without gas first for estimation)
-    tx_params = {
+    return contract.constructor(BOT_OPERATOR).build_transaction({
         "from": account.address,
-        "nonce": w3.eth.get_transaction_count(account.address),
-        "gasPrice": gas_price,
-    }
+        "nonce": nonce,
+        "gas": gas_limit,
+        "chainId": preflight["chain_id"],
+        **fees,
+    })
 
-    # Try to estimate gas
-    try:
-        constructor_tx = contract.constructor(BOT_OPERATOR).build_transaction(tx_params)
-        estimated_gas = w3.eth.estimate_gas(constructor_tx)
-        gas_limit = int(estimated_gas * 1.2)  # 20% buffer
-        print(f"  Estimated gas: {estimated_gas}, using: {gas_limit}")
-    except Exception as e:
-        print(f"  Gas estimation failed: {e}")
-        gas_limit = 5000000
-        print(f"  Using fallback gas limit: {gas_limit}")
 
-    # Check if we have enough balance
-    balance = w3.eth.get_balance(account.address)
-    required = gas_limit * gas_price
-    print(f"  Required balance: {w3.from_wei(required, 'ether')} ETH")
-    
-    if balance < required:
-        raise Exception(f"Insufficient balance. Have: {w3.from_wei(balance, 'ether')} ETH, Need: {w3.from_wei(required, 'ether')} ETH")
+def build_deploy_factory_tx(w3, account, deployer_address, deployer_abi, preflight, fees, nonce, cached_gas=None):
+    """
+    Build the deployFactory() transaction.
+
+    The FactoryDeployer is usually not mined yet when this is built (it is sent in the
+    same batch), so gas cannot be estimated. The gas used by this step in a previous
+    run is used when known, otherwise the fallback limit. Unused gas is refunded.
+    """
+    deployer = w3.eth.contract(address=deployer_address, abi=deployer_abi)
+
+    gas_limit, source = choose_gas_limit(cached_gas=cached_gas)
+    if source == "cache":
+        print(f"  Factory deployment gas from previous run: {cached_gas}, using: {gas_limit}")
+    else:
+        print(f"  Factory deployment gas limit: {gas_limit} (fallback)")
 
-    # Build final transaction
-    tx = contract.constructor(BOT_OPERATOR).build_transaction({
+    return deployer.functions.deployFactory(
+        BOT_OPERATOR,
+        WHITELISTED_DEXES
+    ).build_transaction({
         "from": account.address,
-        "nonce": w3.eth.get_transaction_count(account.address),
+        "nonce": nonce,
         "gas": gas_limit,
-        "gasPrice": gas_price,
+        "chainId": preflight["chain_id"],
+        **fees,
     })
 
-    # Sign and send
-    signed_tx = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
 
-    print(f"  Deploying FactoryDeployer... TX: {tx_hash.hex()}")
-    
-    # Wait for receipt with timeout
-    try:
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-    except Exception as e:
-        print(f"  Timeout waiting for receipt: {e}")
-        raise
+def check_receipt(w3, pending, name):
+    """Print receipt details and raise if the transaction failed."""
+    receipt = pending.receipt
+    gas_limit = pending.tx["gas"]
 
-    # Check status
-    print(f"  Transaction status: {receipt['status']} (1=success, 0=failed)")
+    print(f"  {name} status: {receipt['status']} (1=success, 0=failed)")
     print(f"  Gas used: {receipt['gasUsed']} / {gas_limit}")
     
     if receipt['gasUsed'] == gas_limit:
@@ -263,193 +930,566 @@ def deploy_factory_deployer(w3, account, contract_data):
         # Try to get more details
         print(f"  Transaction failed!")
         print(f"  Block number: {receipt['blockNumber']}")
-        print(f"  Transaction hash: {tx_hash.hex()}")
+        print(f"  Transaction hash: {pending.tx_hash.hex()}")
         
         # Try to get revert reason
-        revert_reason = get_revert_reason(w3, tx_hash)
+        revert_reason = get_revert_reason(w3, pending.tx_hash)
         print(f"  Revert reason: {revert_reason}")
         
-        raise Exception(f"FactoryDeployer deployment failed. Reason: {revert_reason}")
+        raise Exception(f"{name} deployment failed. Reason: {revert_reason}")
 
-    print(f"  Contract deployed at: {receipt['contractAddress']}")
-    return receipt["contractAddress"]
 
-
-def predict_factory_address(w3, deployer_address, deployer_abi):
-    """Call predictFactoryAddress to get expected factory address."""
+def get_deployed_factory_address(w3, deployer_address, deployer_abi, receipt):
+    """Parse the FactoryDeployed event to get the factory address."""
     deployer = w3.eth.contract(address=deployer_address, abi=deployer_abi)
-    predicted = deployer.functions.predictFactoryAddress(
-        BOT_OPERATOR,
-        WHITELISTED_DEXES
-    ).call()
-    return predicted
+    factory_deployed_event = deployer.events.FactoryDeployed()
+    logs = factory_deployed_event.process_receipt(receipt)
 
+    if logs:
+        return logs[0]["args"]["factory"]
 
-def deploy_factory(w3, account, deployer_address, deployer_abi):
-    """Deploy LazaiWalletFactory via FactoryDeployer."""
-    deployer = w3.eth.contract(address=deployer_address, abi=deployer_abi)
+    raise Exception("Could not find FactoryDeployed event in receipt")
 
-    gas_price = w3.eth.gas_price
 
-    # Try to estimate gas
-    try:
-        estimated_gas = deployer.functions.deployFactory(
-            BOT_OPERATOR,
-            WHITELISTED_DEXES
-        ).estimate_gas({"from": account.address})
-        gas_limit = int(estimated_gas * 1.2)
-        print(f"  Estimated gas for factory deployment: {estimated_gas}, using: {gas_limit}")
-    except Exception as e:
-        print(f"  Gas estimation failed for factory deployment: {e}")
-        gas_limit = 5000000
-        print(f"  Using fallback gas limit: {gas_limit}")
+# =============================================================================
+# POST-DEPLOY VERIFICATION
+# =============================================================================
 
-    # Build transaction
-    tx = deployer.functions.deployFactory(
-        BOT_OPERATOR,
-        WHITELISTED_DEXES
-    ).build_transaction({
-        "from": account.address,
-        "nonce": w3.eth.get_transaction_count(account.address),
-        "gas": gas_limit,
-        "gasPrice": gas_price,
-    })
+RESULTS_FILE = "deployment_results.json"
 
-    # Sign and send
-    signed_tx = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+# Written next to RESULTS_FILE by --verify
+VERIFICATION_FILE = "verification_results.json"
 
-    print(f"  Deploying Factory via CREATE2... TX: {tx_hash.hex()}")
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+# Factory view calls read by --verify
+OWNER_CALL = "0x" + keccak(text="owner()")[:4].hex()
+BOT_OPERATOR_CALL = "0x" + keccak(text="botOperator()")[:4].hex()
+WHITELISTED_DEXS_CALL = "0x" + keccak(text="getWhitelistedDEXs()")[:4].hex()
 
-    print(f"  Transaction status: {receipt['status']}")
-    print(f"  Gas used: {receipt['gasUsed']} / {gas_limit}")
 
-    if receipt["status"] != 1:
-        revert_reason = get_revert_reason(w3, tx_hash)
-        raise Exception(f"Factory deployment failed. Reason: {revert_reason}")
+def factory_runtime_code(compiled):
+    """
+    Code LazaiWalletFactory should have on-chain.
 
-    # Parse FactoryDeployed event to get factory address
-    factory_deployed_event = deployer.events.FactoryDeployed()
-    logs = factory_deployed_event.process_receipt(receipt)
+    The compiler leaves zeroed slots for immutables in the runtime bytecode;
+    the constructor fills the only one (botOperator) with BOT_OPERATOR.
+    """
+    deployed = compiled["contracts"][FACTORY_SOURCE]["LazaiWalletFactory"]["evm"]["deployedBytecode"]
+    code = bytearray.fromhex(deployed["object"])
+    references = deployed.get("immutableReferences") or {}
+    if len(references) > 1:
+        raise ValueError(
+            f"LazaiWalletFactory has {len(references)} immutables, "
+            "factory_runtime_code only knows how to fill botOperator"
+        )
 
-    if logs:
-        return logs[0]["args"]["factory"]
+    word = abi_encode(["address"], [BOT_OPERATOR])
+    for slots in references.values():
+        for slot in slots:
+            code[slot["start"]:slot["start"] + slot["length"]] = word
+    return bytes(code)
 
-    raise Exception("Could not find FactoryDeployed event in receipt")
+
+def load_factory_addresses(results_file):
+    """Factory address per chain ID from a deployment_results.json written by save_results()."""
+    with open(results_file, "r") as f:
+        results = json.load(f)
+    return {
+        deployment["chain_id"]: deployment["factory_address"]
+        for deployment in results.get("deployments", [])
+        if deployment.get("factory_address")
+    }
+
+
+def decode_call(reply, types):
+    """Decode an eth_call reply, or raise with the RPC error / revert."""
+    if "error" in reply:
+        raise Exception(reply["error"])
+    data = bytes.fromhex(reply["result"].removeprefix("0x"))
+    if not data:
+        raise Exception("empty return data")
+    return abi_decode(types, data)[0]
+
+
+def check(expected, actual):
+    """One report entry: expected vs on-chain value."""
+    return {"expected": expected, "actual": actual, "ok": actual == expected}
+
+
+def verify_chain(chain_config, factory_address, expected_code_hash):
+    """
+    Read the factory's code hash, owner, botOperator and whitelist on one chain.
+
+    Everything is read in a single JSON-RPC batch, so a chain costs one round-trip.
+    """
+    factory_address = to_checksum_address(factory_address)
+    calls = [
+        ("chain_id", "eth_chainId", []),
+        ("code", "eth_getCode", [factory_address, "latest"]),
+        ("owner", "eth_call", [{"to": factory_address, "data": OWNER_CALL}, "latest"]),
+        ("bot_operator", "eth_call", [{"to": factory_address, "data": BOT_OPERATOR_CALL}, "latest"]),
+        ("whitelisted_dexes", "eth_call", [{"to": factory_address, "data": WHITELISTED_DEXS_CALL}, "latest"]),
+    ]
+
+    started = time.perf_counter()
+    with create_rpc_session() as session:
+        replies, http_requests = rpc_batch(session, chain_config["rpc_url"], calls)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    checks = {}
+    errors = {}
+
+    if "error" in replies["chain_id"]:
+        errors["chain_id"] = replies["chain_id"]["error"]
+    else:
+        checks["chain_id"] = check(chain_config["chain_id"], int(replies["chain_id"]["result"], 16))
+
+    if "error" in replies["code"]:
+        errors["code"] = replies["code"]["error"]
+    else:
+        code = bytes.fromhex(replies["code"]["result"].removeprefix("0x"))
+        checks["code_hash"] = check(expected_code_hash, "0x" + keccak(code).hex() if code else None)
+        checks["code_hash"]["code_size"] = len(code)
+
+    views = [
+        ("owner", ["address"], BOT_OPERATOR),
+        ("bot_operator", ["address"], BOT_OPERATOR),
+        ("whitelisted_dexes", ["address[]"], WHITELISTED_DEXES),
+    ]
+    for key, types, expected in views:
+        try:
+            value = decode_call(replies[key], types)
+        except Exception as e:
+            errors[key] = str(e)
+            continue
+        if isinstance(value, str):
+            checks[key] = check(to_checksum_address(expected), to_checksum_address(value))
+        else:
+            checks[key] = check(
+                [to_checksum_address(a) for a in expected],
+                [to_checksum_address(a) for a in value],
+            )
+
+    return {
+        "chain": chain_config["name"],
+        "chain_id": chain_config["chain_id"],
+        "factory_address": factory_address,
+        "checks": checks,
+        "errors": errors,
+        "ok": not errors and all(c["ok"] for c in checks.values()),
+        "http_requests": http_requests,
+        "elapsed_ms": round(elapsed_ms, 1),
+    }
+
+
+def verify_deployment(chains, compiled, factory_addresses):
+    """
+    Check every chain's factory against the local build, concurrently.
+
+    All chains are queried at once (one thread and one batched request each), so
+    the whole run takes about as long as the slowest chain's round-trip.
+
+    Args:
+        factory_addresses: dict of chain_id -> factory address
+
+    Returns:
+        report dict (see VERIFICATION_FILE)
+    """
+    expected_code_hash = "0x" + keccak(factory_runtime_code(compiled)).hex()
+
+    print("\n" + "="*60)
+    print("POST-DEPLOY VERIFICATION (no transactions sent)")
+    print("="*60)
+    print(f"Expected factory runtime code hash: {expected_code_hash}")
+
+    started = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(chains))) as executor:
+        futures = {}
+        for chain in chains:
+            factory_address = factory_addresses.get(chain["chain_id"])
+            if factory_address is None:
+                results[chain["chain_id"]] = {
+                    "chain": chain["name"],
+                    "chain_id": chain["chain_id"],
+                    "ok": False,
+                    "error": "No factory address for this chain",
+                }
+                continue
+            futures[executor.submit(verify_chain, chain, factory_address, expected_code_hash)] = chain
+
+        for future in as_completed(futures):
+            chain = futures[future]
+            try:
+                results[chain["chain_id"]] = future.result()
+            except Exception as e:
+                results[chain["chain_id"]] = {
+                    "chain": chain["name"],
+                    "chain_id": chain["chain_id"],
+                    "factory_address": factory_addresses[chain["chain_id"]],
+                    "ok": False,
+                    "error": str(e),
+                }
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    verified = [results[chain["chain_id"]] for chain in chains]
+
+    # Values that must be identical on every chain, whatever the local build says
+    consistent = {}
+    for key in ("code_hash", "owner", "bot_operator", "whitelisted_dexes"):
+        seen = {
+            json.dumps(result["checks"][key]["actual"])
+            for result in verified
+            if key in result.get("checks", {})
+        }
+        consistent[key] = len(seen) <= 1
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "expected": {
+            "code_hash": expected_code_hash,
+            "bot_operator": BOT_OPERATOR,
+            "whitelisted_dexes": WHITELISTED_DEXES,
+        },
+        "ok": all(result["ok"] for result in verified),
+        "consistent_across_chains": consistent,
+        "elapsed_ms": round(elapsed_ms, 1),
+        "chains": verified,
+    }
+
+
+def print_verification(report):
+    """Print one line per check and chain."""
+    slowest = 0.0
+    for result in report["chains"]:
+        print(f"\n{result['chain']} (Chain ID: {result['chain_id']}):")
+        if "error" in result:
+            print(f"  ERROR: {result['error']}")
+            continue
+        slowest = max(slowest, result["elapsed_ms"])
+        print(f"  Factory: {result['factory_address']}")
+        for key, entry in result["checks"].items():
+            mark = "✓" if entry["ok"] else "✗"
+            if entry["ok"]:
+                print(f"  {mark} {key}")
+            else:
+                print(f"  {mark} {key}: expected {entry['expected']}, got {entry['actual']}")
+        for key, error in result["errors"].items():
+            print(f"  ✗ {key}: {error}")
+        print(f"  {result['http_requests']} HTTP request(s) in {result['elapsed_ms']:.0f} ms")
+
+    print("\n" + "="*60)
+    inconsistent = [key for key, same in report["consistent_across_chains"].items() if not same]
+    if inconsistent:
+        print(f"WARNING: Chains disagree on: {', '.join(inconsistent)}")
+    if report["ok"]:
+        print("SUCCESS! Every factory matches the local build and configuration")
+    else:
+        print("FAILED: At least one chain does not match (see above)")
+    print(f"Verified {len(report['chains'])} chains in {report['elapsed_ms']:.0f} ms "
+          f"(slowest chain {slowest:.0f} ms)")
+    print("="*60)
+
+
+def save_verification(report, results_file=RESULTS_FILE):
+    """Save the verification report next to the deployment results."""
+    output_file = os.path.join(os.path.dirname(results_file), VERIFICATION_FILE)
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nVerification report saved to {output_file}")
 
 
 # =============================================================================
 # MAIN DEPLOYMENT FLOW
 # =============================================================================
 
-def deploy_to_chain(chain_config, compiled_contracts):
+class DeploymentOptions:
+    """Run-wide settings shared by every chain deployment."""
+
+    def __init__(self, journal=None, resume=False, gas_cache=None, config_id=None,
+                 poll_interval=POLL_INITIAL_INTERVAL):
+        self.journal = journal
+        self.resume = resume
+        self.gas_cache = gas_cache
+        self.config_id = config_id
+        self.poll_interval = poll_interval
+
+    def cached_gas(self, chain_id, step):
+        """Gas used by this step on this chain in a previous run, if known."""
+        if self.gas_cache is None:
+            return None
+        return self.gas_cache.get(chain_id, step, self.config_id)
+
+    def remember_gas(self, chain_id, step, receipt):
+        """Store gas used by a successful step for future runs."""
+        if self.gas_cache is not None:
+            self.gas_cache.put(chain_id, step, self.config_id, receipt["gasUsed"])
+
+
+def deploy_to_chain(chain_config, compiled_contracts, options=None):
     """Deploy all contracts to a single chain."""
+    options = options or DeploymentOptions()
+    journal = options.journal
+
     print(f"\n{'='*60}")
     print(f"Deploying to {chain_config['name']} (Chain ID: {chain_config['chain_id']})")
     print(f"{'='*60}")
 
+    state = journal.chain_state(chain_config["chain_id"]) if journal and options.resume else {}
+
+    # Nothing left to do on this chain
+    factory_state = state.get(STEP_FACTORY, {})
+    if factory_state.get("status") == "completed":
+        print(f"  Already deployed (from journal), skipping")
+        return {
+            "chain": chain_config["name"],
+            "chain_id": chain_config["chain_id"],
+            "deployer_address": state[STEP_DEPLOYER]["actual_address"],
+            "factory_address": factory_state["actual_address"],
+        }
+
+    # One keep-alive session for every RPC call to this chain
+    with create_rpc_session() as session:
+        return deploy_with_session(chain_config, compiled_contracts, session, options, state)
+
+
+def deploy_with_session(chain_config, compiled_contracts, session, options, state):
+    """Deploy all contracts to a single chain over an open RPC session."""
+    chain_id = chain_config["chain_id"]
+    journal = options.journal
+
     # Connect to chain
-    w3 = Web3(Web3.HTTPProvider(chain_config["rpc_url"]))
-    if not w3.is_connected():
-        raise Exception(f"Failed to connect to {chain_config['name']}")
+    w3 = Web3(Web3.HTTPProvider(chain_config["rpc_url"], session=session))
+    account = w3.eth.account.from_key(PRIVATE_KEY)
+
+    # Get contract data
+    deployer_data = get_contract_data(compiled_contracts, "FactoryDeployer")
+
+    # Preflight: every read needed before the first transaction, in one batch
+    try:
+        preflight = preflight_chain(
+            session, chain_config["rpc_url"], account.address,
+            deployer_constructor_data(deployer_data),
+        )
+    except Exception as e:
+        raise Exception(f"Failed to connect to {chain_config['name']}: {e}")
 
     print(f"  Connected to {chain_config['name']}")
-    
+    print(
+        f"  Preflight: {preflight['http_requests']} HTTP request(s) in {preflight['elapsed_ms']:.0f} ms "
+        f"(sequential flow used {SEQUENTIAL_PREFLIGHT_REQUESTS})"
+    )
+
     # Check chain ID matches
-    actual_chain_id = w3.eth.chain_id
-    print(f"  Expected chain ID: {chain_config['chain_id']}, Actual: {actual_chain_id}")
+    actual_chain_id = preflight["chain_id"]
+    print(f"  Expected chain ID: {chain_id}, Actual: {actual_chain_id}")
     
-    if actual_chain_id != chain_config['chain_id']:
+    if actual_chain_id != chain_id:
         print(f"  WARNING: Chain ID mismatch!")
 
     # Setup account
-    account = w3.eth.account.from_key(PRIVATE_KEY)
-    balance = w3.eth.get_balance(account.address)
+    balance = preflight["balance"]
     print(f"  Deployer: {account.address}")
     print(f"  Balance: {w3.from_wei(balance, 'ether')} ETH")
 
     if balance == 0:
         raise Exception(f"No balance on {chain_config['name']}")
 
-    # Get contract data
-    deployer_data = get_contract_data(compiled_contracts, "FactoryDeployer")
     print(f"  FactoryDeployer ABI has {len(deployer_data['abi'])} entries")
 
-    # Step 1: Deploy FactoryDeployer
-    deployer_address = deploy_factory_deployer(w3, account, deployer_data)
-    print(f"  FactoryDeployer deployed at: {deployer_address}")
+    # EIP-1559 fees when the chain reports a base fee, legacy gasPrice otherwise
+    fees = fee_params(preflight["gas_price"], preflight["fee_history"])
+    print(f"  Gas price: {describe_fees(w3, fees)}")
+
+    # Nonces are reserved locally so both transactions can be broadcast back-to-back
+    nonces = NonceManager(w3, account, preflight["nonce"], journal, chain_id)
+    new_txs = []
+
+    # Step 1: FactoryDeployer creation - its CREATE address is known from the nonce
+    deployer_state = state.get(STEP_DEPLOYER, {})
+    if deployer_state.get("status") == "completed":
+        deployer_address = deployer_state["actual_address"]
+        print(f"  FactoryDeployer already deployed at {deployer_address} (from journal)")
+    elif deployer_state.get("status") == "pending":
+        deployer_address = deployer_state["predicted_address"]
+        nonces.track(STEP_DEPLOYER, deployer_state["tx"], deployer_state["tx_hashes"])
+    else:
+        deployer_nonce = nonces.reserve()
+        deployer_tx = build_factory_deployer_tx(
+            w3, account, deployer_data, preflight, fees, deployer_nonce,
+            options.cached_gas(chain_id, STEP_DEPLOYER),
+        )
+        deployer_address = predict_create_address(account.address, deployer_nonce)
+        new_txs.append((STEP_DEPLOYER, deployer_tx, deployer_address))
+    print(f"  Predicted FactoryDeployer address: {deployer_address}")
 
-    # Step 2: Predict factory address
-    predicted_address = predict_factory_address(w3, deployer_address, deployer_data["abi"])
+    # Step 2: Predict factory address (offline CREATE2 computation, no RPC call)
+    predicted_address = predict_factory_address_offline(
+        deployer_address, factory_init_code_hash(compiled_contracts)
+    )
     print(f"  Predicted Factory address: {predicted_address}")
 
-    # Step 3: Deploy Factory via CREATE2
-    factory_address = deploy_factory(w3, account, deployer_address, deployer_data["abi"])
+    # Step 3: Factory deployment via CREATE2 on the predicted FactoryDeployer.
+    # A factory tx from a previous run is only valid if its FactoryDeployer survived.
+    factory_state = state.get(STEP_FACTORY, {})
+    if factory_state.get("status") == "pending" and not new_txs:
+        nonces.track(STEP_FACTORY, factory_state["tx"], factory_state["tx_hashes"])
+    else:
+        factory_tx = build_deploy_factory_tx(
+            w3, account, deployer_address, deployer_data["abi"], preflight, fees, nonces.reserve(),
+            options.cached_gas(chain_id, STEP_FACTORY),
+        )
+        new_txs.append((STEP_FACTORY, factory_tx, predicted_address))
+
+    # Check if we have enough balance for the new transactions
+    required = sum(tx["gas"] * max_fee_per_gas(tx) for _, tx, _ in new_txs)
+    print(f"  Required balance: {w3.from_wei(required, 'ether')} ETH")
+    
+    if balance < required:
+        raise Exception(f"Insufficient balance. Have: {w3.from_wei(balance, 'ether')} ETH, Need: {w3.from_wei(required, 'ether')} ETH")
+
+    # Step 4: Broadcast, then wait for all receipts once
+    for step, tx, address in new_txs:
+        nonces.submit(step, tx, predicted_address=address)
+    mined = nonces.wait_for_receipts(poll_interval=options.poll_interval)
+
+    if STEP_DEPLOYER in mined:
+        deployer_pending = mined[STEP_DEPLOYER]
+        check_receipt(w3, deployer_pending, STEP_DEPLOYER)
+        if deployer_pending.receipt["contractAddress"].lower() != deployer_address.lower():
+            raise Exception(
+                f"FactoryDeployer address mismatch! Predicted: {deployer_address}, "
+                f"Actual: {deployer_pending.receipt['contractAddress']}"
+            )
+        options.remember_gas(chain_id, STEP_DEPLOYER, deployer_pending.receipt)
+        if journal:
+            journal.record(chain_id, STEP_DEPLOYER, "completed", actual_address=deployer_address)
+        print(f"  FactoryDeployer deployed at: {deployer_address}")
+
+    check_receipt(w3, mined[STEP_FACTORY], STEP_FACTORY)
+    factory_address = get_deployed_factory_address(
+        w3, deployer_address, deployer_data["abi"], mined[STEP_FACTORY].receipt
+    )
     print(f"  Factory deployed at: {factory_address}")
 
     # Verify prediction matched
     if predicted_address.lower() != factory_address.lower():
         raise Exception(f"Address mismatch! Predicted: {predicted_address}, Actual: {factory_address}")
 
+    options.remember_gas(chain_id, STEP_FACTORY, mined[STEP_FACTORY].receipt)
+    if journal:
+        journal.record(chain_id, STEP_FACTORY, "completed", actual_address=factory_address)
+
     print(f"  ✓ Prediction verified!")
 
     return {
         "chain": chain_config["name"],
-        "chain_id": chain_config["chain_id"],
+        "chain_id": chain_id,
         "deployer_address": deployer_address,
         "factory_address": factory_address,
     }
 
 
-def main():
-    """Main deployment function."""
-    print("="*60)
-    print("DETERMINISTIC CROSS-CHAIN FACTORY DEPLOYMENT")
-    print("="*60)
-    print(f"\nBot Operator: {BOT_OPERATOR}")
-    print(f"Whitelisted DEXes: {WHITELISTED_DEXES}")
-    print(f"Chains: {[c['name'] for c in CHAINS]}")
+class ChainOutput(io.TextIOBase):
+    """
+    stdout proxy that routes print() output of worker threads into per-chain buffers.
 
-    # Validate configuration
-    if PRIVATE_KEY == "your_private_key_here":
-        print("\nERROR: Please update PRIVATE_KEY in the configuration")
-        return
+    Threads that have not registered a buffer write straight through to the real stdout,
+    so the main thread keeps printing as usual while chains deploy in parallel.
+    """
 
-    if BOT_OPERATOR == "0x1234567890123456789012345678901234567890":
-        print("\nERROR: Please update BOT_OPERATOR in the configuration")
-        return
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
 
-    # Compile contracts
-    compiled = compile_contracts()
-    print("Contracts compiled successfully!")
-    
-    # Print available contracts
-    print("\nCompiled contracts:")
-    for source_file, contracts in compiled["contracts"].items():
-        for contract_name in contracts.keys():
-            bytecode_len = len(contracts[contract_name]["evm"]["bytecode"]["object"]) // 2
-            print(f"  - {contract_name} ({bytecode_len} bytes)")
+    def start_capture(self):
+        self.local.buffer = io.StringIO()
 
-    # Deploy to each chain
+    def stop_capture(self):
+        buffer = getattr(self.local, "buffer", None)
+        self.local.buffer = None
+        return buffer.getvalue() if buffer else ""
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def deploy_chain_safe(chain, compiled, options=None):
+    """Deploy to a single chain, converting any failure into an error result."""
+    try:
+        return deploy_to_chain(chain, compiled, options)
+    except Exception as e:
+        print(f"\nERROR deploying to {chain['name']}: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return {
+            "chain": chain["name"],
+            "chain_id": chain["chain_id"],
+            "error": str(e),
+        }
+
+
+def deploy_sequential(chains, compiled, options=None):
+    """Deploy to each chain one after another."""
     results = []
-    for chain in CHAINS:
-        try:
-            result = deploy_to_chain(chain, compiled)
-            results.append(result)
-        except Exception as e:
-            print(f"\nERROR deploying to {chain['name']}: {e}")
-            traceback.print_exc()
-            results.append({
-                "chain": chain["name"],
-                "chain_id": chain["chain_id"],
-                "error": str(e),
-            })
+    for chain in chains:
+        results.append(deploy_chain_safe(chain, compiled, options))
 
         # Small delay between chains
         time.sleep(2)
 
-    # Print summary
+    return results
+
+
+def deploy_parallel(chains, compiled, max_workers, options=None):
+    """
+    Deploy to several chains concurrently using a thread pool.
+
+    Every chain uses its own Web3 provider and account nonce, so deployments are
+    independent and a failure on one chain never affects the others. Output of each
+    chain is buffered and printed as one block when that chain finishes.
+    """
+    print(f"\nDeploying to {len(chains)} chains with {max_workers} parallel workers...")
+
+    output = ChainOutput(sys.stdout)
+
+    def run(chain):
+        output.start_capture()
+        started = time.time()
+        try:
+            result = deploy_chain_safe(chain, compiled, options)
+        finally:
+            elapsed = time.time() - started
+            log = output.stop_capture()
+        return result, log, elapsed
+
+    results = {}
+    original_stdout = sys.stdout
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run, chain): chain for chain in chains}
+            for future in as_completed(futures):
+                chain = futures[future]
+                result, log, elapsed = future.result()
+                results[chain["chain_id"]] = result
+                original_stdout.write(log)
+                status = "FAILED" if "error" in result else "done"
+                original_stdout.write(f"\n  [{chain['name']}] {status} in {elapsed:.1f}s\n")
+                original_stdout.flush()
+    finally:
+        sys.stdout = original_stdout
+
+    # Keep summary order identical to CHAINS
+    return [results[chain["chain_id"]] for chain in chains]
+
+
+def print_summary(results):
+    """Print deployment summary and verify factory addresses match across chains."""
     print("\n" + "="*60)
     print("DEPLOYMENT SUMMARY")
     print("="*60)
@@ -474,8 +1514,9 @@ def main():
         print("This may indicate different parameters were used.")
     print("="*60)
 
-    # Save results to file
-    output_file = "deployment_results.json"
+
+def save_results(results, output_file=RESULTS_FILE):
+    """Save deployment results to file."""
     with open(output_file, "w") as f:
         json.dump({
             "bot_operator": BOT_OPERATOR,
@@ -485,5 +1526,150 @@ def main():
     print(f"\nResults saved to {output_file}")
 
 
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Deterministic cross-chain factory deployment")
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Deploy to up to N chains concurrently (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the compile cache",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Ignore cached compiler output, recompile and refresh the cache",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print predicted FactoryDeployer/factory addresses for all chains and exit",
+    )
+    parser.add_argument(
+        "--predict-wallets",
+        metavar="FILE",
+        help="Predict wallet addresses for the owners listed in FILE, save to wallet_predictions.csv and exit",
+    )
+    parser.add_argument(
+        "--factory",
+        metavar="ADDRESS",
+        help=f"Factory address used by --predict-wallets (and by --verify on every chain instead of {RESULTS_FILE})",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help=f"Check the deployed factory on all chains against the local build, save {VERIFICATION_FILE} and exit",
+    )
+    parser.add_argument(
+        "--results",
+        default=RESULTS_FILE,
+        metavar="FILE",
+        help=f"Deployment results read by --verify (default: {RESULTS_FILE})",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Skip steps completed in {JOURNAL_FILE} and wait for its pending transactions instead of resending",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=POLL_INITIAL_INTERVAL,
+        metavar="SECONDS",
+        help=f"Initial receipt polling interval, backing off from there (default: {POLL_INITIAL_INTERVAL})",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main deployment function."""
+    args = parse_args()
+
+    print("="*60)
+    print("DETERMINISTIC CROSS-CHAIN FACTORY DEPLOYMENT")
+    print("="*60)
+    print(f"\nBot Operator: {BOT_OPERATOR}")
+    print(f"Whitelisted DEXes: {WHITELISTED_DEXES}")
+    print(f"Chains: {[c['name'] for c in CHAINS]}")
+
+    # Validate configuration
+    if PRIVATE_KEY == "your_private_key_here":
+        print("\nERROR: Please update PRIVATE_KEY in the configuration")
+        return
+
+    if BOT_OPERATOR == "0x1234567890123456789012345678901234567890":
+        print("\nERROR: Please update BOT_OPERATOR in the configuration")
+        return
+
+    if args.parallel < 1:
+        print("\nERROR: --parallel must be at least 1")
+        return
+
+    # Compile contracts
+    compiled = compile_contracts(use_cache=not args.no_cache, rebuild=args.rebuild)
+    print("Contracts compiled successfully!")
+    
+    # Print available contracts
+    print("\nCompiled contracts:")
+    for source_file, contracts in compiled["contracts"].items():
+        for contract_name in contracts.keys():
+            bytecode_len = len(contracts[contract_name]["evm"]["bytecode"]["object"]) // 2
+            print(f"  - {contract_name} ({bytecode_len} bytes)")
+
+    if args.predict_wallets:
+        if not args.factory:
+            print("\nERROR: --predict-wallets requires --factory ADDRESS")
+            return
+        save_wallet_predictions(compiled, args.factory, args.predict_wallets)
+        return
+
+    if args.plan:
+        plan_deployment(CHAINS, compiled)
+        return
+
+    if args.verify:
+        if args.factory:
+            factory_addresses = {chain["chain_id"]: args.factory for chain in CHAINS}
+        else:
+            try:
+                factory_addresses = load_factory_addresses(args.results)
+            except FileNotFoundError:
+                print(f"\nERROR: {args.results} not found (deploy first or pass --factory ADDRESS)")
+                sys.exit(1)
+        report = verify_deployment(CHAINS, compiled, factory_addresses)
+        print_verification(report)
+        save_verification(report, args.results)
+        if not report["ok"]:
+            sys.exit(1)
+        return
+
+    # Every step is journaled as it happens so a failed run can be resumed
+    config_id = journal_config_id(compiled)
+    options = DeploymentOptions(
+        journal=DeploymentJournal(JOURNAL_FILE, config_id),
+        resume=args.resume,
+        gas_cache=GasEstimateCache(GAS_CACHE_FILE),
+        config_id=config_id,
+        poll_interval=args.poll_interval,
+    )
+    if args.resume:
+        print(f"\nResuming from {JOURNAL_FILE} ({len(options.journal.load())} entries for this configuration)")
+
+    # Deploy to each chain
+    if args.parallel > 1:
+        results = deploy_parallel(CHAINS, compiled, min(args.parallel, len(CHAINS)), options)
+    else:
+        results = deploy_sequential(CHAINS, compiled, options)
+
+    print_summary(results)
+    save_results(results)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
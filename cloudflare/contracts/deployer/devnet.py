@@ -0,0 +1,169 @@
+"""
+Local EVM Devnet
+
+One in-process EVM chain (py-evm via eth-tester) served over JSON-RPC HTTP, so
+code that talks to remote RPCs with plain HTTP can be benchmarked locally.
+
+Used by:
+    - benchmark.py (deployment latency across several devnets)
+    - ../../tools/bench_balance_reader.py (per-read vs Multicall3 balance reads)
+
+Requires: pip install web3 "eth-tester[py-evm]"
+"""
+
+import json
+import threading
+import time
+from collections.abc import Mapping
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_tester import EthereumTester, PyEVMBackend
+from web3 import EthereumTesterProvider, Web3
+
+
+def to_json_rpc(value):
+    """Convert eth-tester results to JSON-RPC wire format (hex quantities)."""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, Mapping):
+        return {key: to_json_rpc(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_rpc(item) for item in value]
+    return value
+
+
+class DevnetNode:
+    """
+    One in-process EVM chain served over JSON-RPC HTTP.
+
+    Supports JSON-RPC batches, counts HTTP requests and RPC calls, and can add
+    artificial RPC latency and block time (receipts are hidden until block_time
+    seconds after the transaction was sent) to mimic remote chains.
+
+    self.w3 talks to the chain directly, e.g. to fund accounts during setup.
+    """
+
+    def __init__(self, chain_id=None, latency=0.0, block_time=0.0):
+        backend = PyEVMBackend()
+        if chain_id is not None:
+            backend.chain.chain_id = chain_id
+        self.w3 = Web3(EthereumTesterProvider(EthereumTester(backend)))
+        self.chain_id = chain_id if chain_id is not None else self.w3.eth.chain_id
+        self.latency = latency
+        self.block_time = block_time
+
+        self.lock = threading.Lock()
+        self.sent_at = {}
+        self.http_requests = 0
+        self.rpc_calls = 0
+        self.method_counts = {}
+        self.server = None
+
+    @property
+    def rpc_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def reset_counters(self):
+        with self.lock:
+            self.http_requests = self.rpc_calls = 0
+            self.method_counts = {}
+
+    def make_request(self, method, params):
+        """
+        Send one call through the provider and its middleware.
+
+        provider.make_request alone skips eth-tester's request formatting, which
+        turns wire values (hex quantities) into the Python values eth-tester expects.
+        """
+        request = self.w3.provider.request_func(self.w3, self.w3.middleware_onion)
+        return request(method, params)
+
+    def handle_call(self, request):
+        """Execute one JSON-RPC call against the EVM."""
+        method = request.get("method")
+        params = request.get("params") or []
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+
+        with self.lock:
+            self.rpc_calls += 1
+            self.method_counts[method] = self.method_counts.get(method, 0) + 1
+
+            try:
+                if method == "eth_chainId":
+                    response["result"] = hex(self.chain_id)
+                    return response
+
+                if method == "eth_getTransactionReceipt" and self.block_time:
+                    sent_at = self.sent_at.get(params[0].lower())
+                    if sent_at is not None and time.time() - sent_at < self.block_time:
+                        response["result"] = None
+                        return response
+
+                result = self.make_request(method, params)
+            except Exception as e:
+                response["error"] = {"code": -32000, "message": str(e)}
+                return response
+
+        if "error" in result:
+            response["error"] = result["error"]
+            return response
+
+        value = to_json_rpc(result.get("result"))
+        if method == "eth_sendRawTransaction":
+            self.sent_at[value.lower()] = time.time()
+        if isinstance(value, dict) and value.get("to") == "":
+            value["to"] = None
+        response["result"] = value
+        return response
+
+    def start(self):
+        """Start serving on an ephemeral local port."""
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with node.lock:
+                    node.http_requests += 1
+                if node.latency:
+                    time.sleep(node.latency)
+
+                if isinstance(body, list):
+                    reply = [node.handle_call(request) for request in body]
+                else:
+                    reply = node.handle_call(body)
+
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def fund(self, address, amount):
+        """Send native balance from a pre-funded test account."""
+        self.w3.eth.send_transaction({
+            "from": self.w3.eth.accounts[0],
+            "to": address,
+            "value": amount,
+        })
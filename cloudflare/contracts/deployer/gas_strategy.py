@@ -0,0 +1,185 @@
+"""
+Gas Strategy for the Cross-Chain Deployment Script
+
+Fee selection, gas limits and receipt polling used by deploy.py:
+    - EIP-1559 fees from eth_feeHistory when the chain supports it, legacy gasPrice otherwise
+    - Gas limits from a live estimate, else from gas used by the same step in a previous
+      run (per chain), else a fixed fallback
+    - Receipt polling that starts fast and backs off, instead of a fixed interval
+"""
+
+import json
+import os
+import threading
+
+# Safety margin on top of estimated / previously used gas
+GAS_LIMIT_BUFFER = 1.2
+
+# Last-resort gas limit when there is neither an estimate nor a cached value
+FALLBACK_GAS_LIMIT = 5000000
+
+# eth_feeHistory window and reward percentile used for the priority fee
+FEE_HISTORY_BLOCKS = 10
+PRIORITY_FEE_PERCENTILE = 50
+
+# maxFeePerGas = BASE_FEE_MULTIPLIER * next base fee + priority fee
+# (survives several consecutive full blocks before the tx is priced out)
+BASE_FEE_MULTIPLIER = 2
+
+# Receipt polling: first poll after POLL_INITIAL_INTERVAL seconds, growing by
+# POLL_BACKOFF_FACTOR up to POLL_MAX_INTERVAL
+POLL_INITIAL_INTERVAL = 0.5
+POLL_BACKOFF_FACTOR = 1.5
+POLL_MAX_INTERVAL = 5.0
+
+
+# =============================================================================
+# FEES
+# =============================================================================
+
+def fee_history_params():
+    """JSON-RPC params for the eth_feeHistory call made during preflight."""
+    return [hex(FEE_HISTORY_BLOCKS), "latest", [PRIORITY_FEE_PERCENTILE]]
+
+
+def parse_fee_history(fee_history):
+    """
+    Extract (next_base_fee, priority_fee) from an eth_feeHistory result.
+
+    Accepts both raw JSON-RPC results (hex strings) and web3's parsed AttributeDict.
+
+    Returns:
+        tuple (next_base_fee, priority_fee), or None if the chain has no EIP-1559 base fee
+    """
+    if not fee_history:
+        return None
+
+    def to_int(value):
+        return int(value, 16) if isinstance(value, str) else int(value)
+
+    base_fees = [to_int(fee) for fee in fee_history.get("baseFeePerGas") or []]
+    if not base_fees or base_fees[-1] == 0:
+        return None
+
+    rewards = sorted(
+        to_int(block_rewards[0])
+        for block_rewards in fee_history.get("reward") or []
+        if block_rewards
+    )
+    priority_fee = rewards[len(rewards) // 2] if rewards else 0
+
+    # Last entry is the base fee of the next (pending) block
+    return base_fees[-1], priority_fee
+
+
+def fee_params(gas_price, fee_history=None):
+    """
+    Transaction fee fields for this chain.
+
+    Returns:
+        {"maxFeePerGas", "maxPriorityFeePerGas"} for EIP-1559 chains,
+        {"gasPrice"} otherwise
+    """
+    parsed = parse_fee_history(fee_history)
+    if parsed is None:
+        return {"gasPrice": gas_price}
+
+    base_fee, priority_fee = parsed
+    if priority_fee == 0:
+        # Empty reward history (quiet L2) - derive the tip from the node's gas price
+        priority_fee = max(gas_price - base_fee, 0)
+
+    return {
+        "maxFeePerGas": BASE_FEE_MULTIPLIER * base_fee + priority_fee,
+        "maxPriorityFeePerGas": priority_fee,
+    }
+
+
+def max_fee_per_gas(tx):
+    """Highest price per gas a transaction can pay (for balance checks)."""
+    return tx["maxFeePerGas"] if "maxFeePerGas" in tx else tx["gasPrice"]
+
+
+def bump_fees(tx, factor):
+    """Return a copy of tx with every fee field raised by factor (for replacements)."""
+    bumped = dict(tx)
+    for field in ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas"):
+        if field in bumped:
+            bumped[field] = int(bumped[field] * factor) + 1
+    return bumped
+
+
+def describe_fees(w3, fees):
+    """Human-readable summary of fee fields."""
+    if "gasPrice" in fees:
+        return f"{w3.from_wei(fees['gasPrice'], 'gwei')} gwei (legacy)"
+    return (
+        f"max {w3.from_wei(fees['maxFeePerGas'], 'gwei')} gwei, "
+        f"tip {w3.from_wei(fees['maxPriorityFeePerGas'], 'gwei')} gwei (EIP-1559)"
+    )
+
+
+# =============================================================================
+# GAS LIMITS
+# =============================================================================
+
+class GasEstimateCache:
+    """
+    Gas used per (chain, step, config) in previous runs, stored as JSON.
+
+    Used as the gas limit source when a live estimate is not possible, e.g. for
+    deployFactory() which is sent before its FactoryDeployer is mined.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def key(chain_id, step, config_id):
+        return f"{chain_id}:{step}:{config_id}"
+
+    def get(self, chain_id, step, config_id):
+        """Gas used by this step last time, or None."""
+        return self.entries.get(self.key(chain_id, step, config_id))
+
+    def put(self, chain_id, step, config_id, gas_used):
+        """Remember gas used by a successful transaction and persist the cache."""
+        with self.lock:
+            self.entries[self.key(chain_id, step, config_id)] = gas_used
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def choose_gas_limit(estimated_gas=None, cached_gas=None, fallback=FALLBACK_GAS_LIMIT):
+    """
+    Pick a gas limit: live estimate, else gas used previously, else the fallback.
+
+    Returns:
+        tuple (gas_limit, source) where source is "estimate", "cache" or "fallback"
+    """
+    if estimated_gas:
+        return int(estimated_gas * GAS_LIMIT_BUFFER), "estimate"
+    if cached_gas:
+        return int(cached_gas * GAS_LIMIT_BUFFER), "cache"
+    return fallback, "fallback"
+
+
+# =============================================================================
+# RECEIPT POLLING
+# =============================================================================
+
+def poll_intervals(initial=POLL_INITIAL_INTERVAL, factor=POLL_BACKOFF_FACTOR, maximum=POLL_MAX_INTERVAL):
+    """Yield sleep intervals for receipt polling: fast at first, then backing off."""
+    interval = initial
+    while True:
+        yield interval
+        interval = min(interval * factor, maximum)
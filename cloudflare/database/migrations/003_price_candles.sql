@@ -0,0 +1,50 @@
+-- =============================================
+-- Migration: PriceHistory OHLC rollups and retention
+-- Date: 2026-10-16
+-- Description:
+--   Adds PriceCandles (1m / 1h / 1d OHLC per PairID), maintained incrementally
+--   from new PriceHistory rows by lt-trading-queue (shared/priceRollup.js).
+--   Adds PriceRollupState to track the last rolled-up PriceID.
+--   Adds an index on Trades(PriceID) so the retention job can skip
+--   PriceHistory rows that trades still reference.
+-- =============================================
+
+-- OHLC candles per pair and resolution
+CREATE TABLE IF NOT EXISTS PriceCandles (
+    PairID INTEGER NOT NULL,
+    Resolution TEXT NOT NULL,
+    BucketStart TEXT NOT NULL,
+    Open REAL NOT NULL,
+    High REAL NOT NULL,
+    Low REAL NOT NULL,
+    Close REAL NOT NULL,
+    SampleCount INTEGER NOT NULL,
+    FirstPriceID INTEGER NOT NULL,
+    LastPriceID INTEGER NOT NULL,
+    PRIMARY KEY (PairID, Resolution, BucketStart),
+    FOREIGN KEY (PairID) REFERENCES TradingPairs(PairID),
+    CHECK (Resolution IN ('1m', '1h', '1d'))
+);
+
+-- Rollup progress (last PriceHistory.PriceID included in PriceCandles)
+CREATE TABLE IF NOT EXISTS PriceRollupState (
+    Name TEXT PRIMARY KEY,
+    LastPriceID INTEGER NOT NULL DEFAULT 0,
+    UpdatedAt TEXT DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS IX_PriceCandles_Resolution_BucketStart ON PriceCandles(Resolution, BucketStart);
+CREATE INDEX IF NOT EXISTS IX_Trades_PriceID ON Trades(PriceID);
+
+-- =============================================
+-- Migration Notes:
+-- =============================================
+--
+-- Existing PriceHistory rows are rolled up by the first lt-trading-queue runs
+-- after deployment (in batches of 10,000 rows per run).
+--
+-- Retention (see shared/priceRollup.js):
+--   - Raw PriceHistory ticks: 7 days, except rows referenced by Trades
+--   - 1m candles: 30 days
+--   - 1h candles: 365 days
+--   - 1d candles: kept
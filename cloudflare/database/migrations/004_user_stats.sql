@@ -0,0 +1,174 @@
+-- =============================================
+-- Migration: Per-user trading and funding aggregates
+-- Date: 2026-10-16
+-- Description:
+--   Adds UserPairStats (trade counts, volume, average-cost position and
+--   realized PnL per UserID/PairID) and UserTokenStats (deposit and
+--   withdrawal counts/totals per UserID/TokenID).
+--   Both are updated in the same D1 batch as the Trades, DepositTransactions
+--   and Withdrawals inserts (shared/userStats.js), so /chart and /balance read
+--   a handful of rows instead of the user's whole history.
+--   Existing rows are backfilled below.
+-- =============================================
+
+-- Trading aggregates per user and pair
+-- Volumes are in token units: BaseVolume in the base token, QuoteVolume in the quote token.
+-- PositionBase/PositionCost hold the bought base amount still held and what it cost
+-- (average cost); SELLs realize proceeds minus average cost into RealizedPnL (quote token).
+CREATE TABLE IF NOT EXISTS UserPairStats (
+    UserID INTEGER NOT NULL,
+    PairID INTEGER NOT NULL,
+    BuyCount INTEGER NOT NULL DEFAULT 0,
+    SellCount INTEGER NOT NULL DEFAULT 0,
+    BaseVolume REAL NOT NULL DEFAULT 0,
+    QuoteVolume REAL NOT NULL DEFAULT 0,
+    PositionBase REAL NOT NULL DEFAULT 0,
+    PositionCost REAL NOT NULL DEFAULT 0,
+    RealizedPnL REAL NOT NULL DEFAULT 0,
+    FirstTradeAt TEXT,
+    LastTradeAt TEXT,
+    UpdatedAt TEXT DEFAULT (datetime('now')),
+    PRIMARY KEY (UserID, PairID),
+    FOREIGN KEY (UserID) REFERENCES Users(UserID),
+    FOREIGN KEY (PairID) REFERENCES TradingPairs(PairID)
+);
+
+-- Funding aggregates per user and token (amounts in token units)
+CREATE TABLE IF NOT EXISTS UserTokenStats (
+    UserID INTEGER NOT NULL,
+    TokenID INTEGER NOT NULL,
+    DepositCount INTEGER NOT NULL DEFAULT 0,
+    DepositedAmount REAL NOT NULL DEFAULT 0,
+    WithdrawalCount INTEGER NOT NULL DEFAULT 0,
+    WithdrawnAmount REAL NOT NULL DEFAULT 0,
+    UpdatedAt TEXT DEFAULT (datetime('now')),
+    PRIMARY KEY (UserID, TokenID),
+    FOREIGN KEY (UserID) REFERENCES Users(UserID),
+    FOREIGN KEY (TokenID) REFERENCES Tokens(TokenID)
+);
+
+-- =============================================
+-- Backfill
+-- =============================================
+
+-- Trades in order per user/pair, as base/quote amounts
+CREATE TABLE IF NOT EXISTS UserPairStatsReplay (
+    UserID INTEGER NOT NULL,
+    PairID INTEGER NOT NULL,
+    Step INTEGER NOT NULL,
+    IsBuy INTEGER NOT NULL,
+    BaseQty REAL NOT NULL,
+    QuoteQty REAL NOT NULL,
+    PRIMARY KEY (UserID, PairID, Step)
+);
+
+INSERT INTO UserPairStatsReplay (UserID, PairID, Step, IsBuy, BaseQty, QuoteQty)
+SELECT
+    UserID,
+    PairID,
+    ROW_NUMBER() OVER (PARTITION BY UserID, PairID ORDER BY TradeID),
+    Action = 'BUY',
+    CASE WHEN Action = 'BUY' THEN QuantityReceived ELSE QuantitySent END,
+    CASE WHEN Action = 'BUY' THEN QuantitySent ELSE QuantityReceived END
+FROM Trades;
+
+-- Replays the average-cost position with the same arithmetic as shared/userStats.js
+INSERT OR REPLACE INTO UserPairStats (
+    UserID, PairID, BuyCount, SellCount, BaseVolume, QuoteVolume,
+    PositionBase, PositionCost, RealizedPnL, FirstTradeAt, LastTradeAt, UpdatedAt
+)
+WITH RECURSIVE Replay (UserID, PairID, Step, PositionBase, PositionCost, RealizedPnL) AS (
+    SELECT DISTINCT UserID, PairID, 0, 0.0, 0.0, 0.0
+    FROM UserPairStatsReplay
+    UNION ALL
+    SELECT
+        r.UserID,
+        r.PairID,
+        s.Step,
+        CASE WHEN s.IsBuy THEN r.PositionBase + s.BaseQty
+             ELSE MAX(r.PositionBase - s.BaseQty, 0) END,
+        CASE WHEN s.IsBuy THEN r.PositionCost + s.QuoteQty
+             WHEN r.PositionBase > s.BaseQty THEN r.PositionCost * (1 - s.BaseQty / r.PositionBase)
+             ELSE 0 END,
+        r.RealizedPnL + CASE
+             WHEN NOT s.IsBuy AND r.PositionBase > 0 AND s.BaseQty > 0
+             THEN MIN(s.BaseQty, r.PositionBase) * (s.QuoteQty / s.BaseQty - r.PositionCost / r.PositionBase)
+             ELSE 0 END
+    FROM Replay r
+    INNER JOIN UserPairStatsReplay s
+        ON s.UserID = r.UserID AND s.PairID = r.PairID AND s.Step = r.Step + 1
+),
+Totals AS (
+    SELECT
+        UserID,
+        PairID,
+        SUM(Action = 'BUY') AS BuyCount,
+        SUM(Action = 'SELL') AS SellCount,
+        SUM(CASE WHEN Action = 'BUY' THEN QuantityReceived ELSE QuantitySent END) AS BaseVolume,
+        SUM(CASE WHEN Action = 'BUY' THEN QuantitySent ELSE QuantityReceived END) AS QuoteVolume,
+        MIN(CreatedAt) AS FirstTradeAt,
+        MAX(CreatedAt) AS LastTradeAt,
+        COUNT(*) AS Steps
+    FROM Trades
+    GROUP BY UserID, PairID
+)
+SELECT
+    t.UserID,
+    t.PairID,
+    t.BuyCount,
+    t.SellCount,
+    t.BaseVolume,
+    t.QuoteVolume,
+    r.PositionBase,
+    r.PositionCost,
+    r.RealizedPnL,
+    t.FirstTradeAt,
+    t.LastTradeAt,
+    datetime('now')
+FROM Totals t
+INNER JOIN Replay r
+    ON r.UserID = t.UserID AND r.PairID = t.PairID AND r.Step = t.Steps;
+
+DROP TABLE IF EXISTS UserPairStatsReplay;
+
+-- Confirmed deposits (matched to Tokens by address and chain) and withdrawals.
+-- Withdrawals without AmountFormatted store raw units in Amount.
+INSERT OR REPLACE INTO UserTokenStats (
+    UserID, TokenID, DepositCount, DepositedAmount, WithdrawalCount, WithdrawnAmount, UpdatedAt
+)
+SELECT
+    UserID,
+    TokenID,
+    SUM(IsDeposit),
+    SUM(CASE WHEN IsDeposit THEN Amount ELSE 0 END),
+    SUM(NOT IsDeposit),
+    SUM(CASE WHEN IsDeposit THEN 0 ELSE Amount END),
+    datetime('now')
+FROM (
+    SELECT d.UserID, t.TokenID, 1 AS IsDeposit, d.Amount AS Amount
+    FROM DepositTransactions d
+    INNER JOIN Tokens t ON t.TokenAddress = d.TokenAddress AND t.ChainID = d.ChainID
+    WHERE d.Status = 'confirmed'
+    UNION ALL
+    SELECT
+        w.UserID,
+        t.TokenID,
+        0 AS IsDeposit,
+        COALESCE(CAST(w.AmountFormatted AS REAL), CAST(w.Amount AS REAL) / power(10, t.Decimals)) AS Amount
+    FROM Withdrawals w
+    INNER JOIN Tokens t ON t.TokenID = w.TokenID
+    WHERE w.Status = 'confirmed'
+)
+GROUP BY UserID, TokenID;
+
+-- =============================================
+-- Migration Notes:
+-- =============================================
+--
+-- Reference trades (0 quantities, created for new configs) count as BUYs, as
+-- they did when the chart worker counted Trades rows.
+--
+-- Realized PnL only covers base bought through trades. Selling base that was
+-- deposited (no cost basis) realizes nothing.
+--
+-- Native-token withdrawals (no TokenID) are not aggregated.
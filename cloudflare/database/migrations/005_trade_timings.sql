@@ -0,0 +1,45 @@
+-- =============================================
+-- Migration: Trade pipeline timings
+-- Date: 2026-10-16
+-- Description:
+--   Adds TradeTimings: one row per processed trade message with the stage
+--   spans of its trace, from the lt-trading-queue cron tick through the queue
+--   and lt-trading-execution (price, balance, approve, swap, receipt, record,
+--   notify). See shared/tradeTrace.js for the span format and
+--   tools/trace_report.py for percentiles per stage, chain and DEX handler.
+-- =============================================
+
+CREATE TABLE IF NOT EXISTS TradeTimings (
+    TimingID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TraceID TEXT NOT NULL,
+    UserID INTEGER NOT NULL,
+    PairID INTEGER NOT NULL,
+    ChainID INTEGER NOT NULL,
+    DEXType TEXT,
+    Action TEXT,
+    Outcome TEXT NOT NULL,
+    TradeID INTEGER,
+    Attempt INTEGER NOT NULL DEFAULT 1,
+    TickStartedAt TEXT NOT NULL,
+    TotalMs INTEGER NOT NULL,
+    Spans TEXT NOT NULL,
+    CreatedAt TEXT DEFAULT (datetime('now')),
+    FOREIGN KEY (UserID) REFERENCES Users(UserID),
+    FOREIGN KEY (PairID) REFERENCES TradingPairs(PairID),
+    FOREIGN KEY (ChainID) REFERENCES Chains(ChainID),
+    FOREIGN KEY (TradeID) REFERENCES Trades(TradeID)
+);
+
+CREATE INDEX IF NOT EXISTS IX_TradeTimings_CreatedAt ON TradeTimings(CreatedAt);
+CREATE INDEX IF NOT EXISTS IX_TradeTimings_TraceID ON TradeTimings(TraceID);
+
+-- =============================================
+-- Migration Notes:
+-- =============================================
+--
+-- Outcome values: executed, no_price, trigger_invalid, zero_balance,
+-- below_minimum, unsupported_dex, oracle_failed, approve_failed, swap_failed, error.
+-- A retried message writes one row per attempt (same TraceID, Attempt 1, 2, ...).
+--
+-- Spans is a JSON array of {"name", "start", "duration"} in milliseconds,
+-- start relative to TickStartedAt.
@@ -0,0 +1,71 @@
+-- =============================================
+-- Migration: Running-balance ledger for deposit detection
+-- Date: 2026-10-16
+-- Description:
+--   Adds UserTokenStats.ExpectedBalance: the balance each user/token should
+--   have on-chain given everything LazaiTrader has recorded. Trades, detected
+--   deposits and withdrawals change it in the same D1 batch as their row
+--   (shared/userStats.js); lt-balance-tracker compares each on-chain balance
+--   with it and records the surplus as a deposit, instead of re-reading the
+--   user's trades and withdrawals since the previous snapshot.
+--   Existing user/tokens are seeded from their latest UserBalances snapshot
+--   plus the trades and confirmed withdrawals recorded after it.
+-- =============================================
+
+-- NULL until the balance tracker (or this backfill) sets a baseline
+ALTER TABLE UserTokenStats ADD COLUMN ExpectedBalance REAL;
+
+-- =============================================
+-- Backfill
+-- =============================================
+
+INSERT INTO UserTokenStats (UserID, TokenID, ExpectedBalance, UpdatedAt)
+SELECT
+    s.UserID,
+    s.TokenID,
+    s.Balance
+        + COALESCE((
+            SELECT SUM(CASE WHEN t.TokenReceived = s.TokenID THEN t.QuantityReceived ELSE 0 END)
+                 - SUM(CASE WHEN t.TokenSent = s.TokenID THEN t.QuantitySent ELSE 0 END)
+            FROM Trades t
+            WHERE t.UserID = s.UserID
+              AND (t.TokenSent = s.TokenID OR t.TokenReceived = s.TokenID)
+              AND t.CreatedAt > s.CreatedAt
+        ), 0)
+        - COALESCE((
+            SELECT SUM(COALESCE(CAST(w.AmountFormatted AS REAL), CAST(w.Amount AS REAL) / power(10, tk.Decimals)))
+            FROM Withdrawals w
+            INNER JOIN Tokens tk ON tk.TokenID = w.TokenID
+            WHERE w.UserID = s.UserID
+              AND w.TokenID = s.TokenID
+              AND w.Status = 'confirmed'
+              AND w.WithdrawnAt > s.CreatedAt
+        ), 0),
+    datetime('now')
+FROM (
+    SELECT
+        UserID,
+        TokenID,
+        Balance,
+        CreatedAt,
+        ROW_NUMBER() OVER (PARTITION BY UserID, TokenID ORDER BY CreatedAt DESC, BalanceID DESC) AS rn
+    FROM UserBalances
+) s
+WHERE s.rn = 1
+ON CONFLICT(UserID, TokenID) DO UPDATE SET
+    ExpectedBalance = excluded.ExpectedBalance,
+    UpdatedAt = excluded.UpdatedAt;
+
+-- =============================================
+-- Migration Notes:
+-- =============================================
+--
+-- Deposits made after the latest snapshot are not in the backfilled value, so
+-- the first tracker run after this migration detects them as before.
+--
+-- User/tokens without a snapshot keep ExpectedBalance NULL; their first
+-- on-chain reading becomes the baseline (no deposit is recorded for it), the
+-- same as the first snapshot did.
+--
+-- A balance below ExpectedBalance (transfers LazaiTrader did not make, native
+-- withdrawals without a TokenID) moves the ledger down to the on-chain value.
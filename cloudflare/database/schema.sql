@@ -133,6 +133,32 @@ CREATE TABLE IF NOT EXISTS PriceHistory (
     FOREIGN KEY (PairID) REFERENCES TradingPairs(PairID)
 );
 
+-- TABLE: PriceCandles
+-- OHLC rollups of PriceHistory per pair (1m / 1h / 1d)
+CREATE TABLE IF NOT EXISTS PriceCandles (
+    PairID INTEGER NOT NULL,
+    Resolution TEXT NOT NULL,
+    BucketStart TEXT NOT NULL,
+    Open REAL NOT NULL,
+    High REAL NOT NULL,
+    Low REAL NOT NULL,
+    Close REAL NOT NULL,
+    SampleCount INTEGER NOT NULL,
+    FirstPriceID INTEGER NOT NULL,
+    LastPriceID INTEGER NOT NULL,
+    PRIMARY KEY (PairID, Resolution, BucketStart),
+    FOREIGN KEY (PairID) REFERENCES TradingPairs(PairID),
+    CHECK (Resolution IN ('1m', '1h', '1d'))
+);
+
+-- TABLE: PriceRollupState
+-- Last PriceHistory row included in PriceCandles
+CREATE TABLE IF NOT EXISTS PriceRollupState (
+    Name TEXT PRIMARY KEY,
+    LastPriceID INTEGER NOT NULL DEFAULT 0,
+    UpdatedAt TEXT DEFAULT (datetime('now'))
+);
+
 -- TABLE: Trades
 -- Executed trades
 CREATE TABLE IF NOT EXISTS Trades (
@@ -266,6 +292,70 @@ CREATE TABLE IF NOT EXISTS Withdrawals (
     CHECK (Status IN ('pending', 'confirmed', 'failed'))
 );
 
+-- TABLE: UserPairStats
+-- Trading aggregates per user/pair, updated with each trade (shared/userStats.js)
+-- PositionBase/PositionCost: bought base still held and its cost (average cost)
+-- RealizedPnL: SELL proceeds minus average cost, in the quote token
+CREATE TABLE IF NOT EXISTS UserPairStats (
+    UserID INTEGER NOT NULL,
+    PairID INTEGER NOT NULL,
+    BuyCount INTEGER NOT NULL DEFAULT 0,
+    SellCount INTEGER NOT NULL DEFAULT 0,
+    BaseVolume REAL NOT NULL DEFAULT 0,
+    QuoteVolume REAL NOT NULL DEFAULT 0,
+    PositionBase REAL NOT NULL DEFAULT 0,
+    PositionCost REAL NOT NULL DEFAULT 0,
+    RealizedPnL REAL NOT NULL DEFAULT 0,
+    FirstTradeAt TEXT,
+    LastTradeAt TEXT,
+    UpdatedAt TEXT DEFAULT (datetime('now')),
+    PRIMARY KEY (UserID, PairID),
+    FOREIGN KEY (UserID) REFERENCES Users(UserID),
+    FOREIGN KEY (PairID) REFERENCES TradingPairs(PairID)
+);
+
+-- TABLE: UserTokenStats
+-- Deposit/withdrawal aggregates per user/token (token units), updated with each record
+-- ExpectedBalance: on-chain balance implied by recorded trades, deposits and withdrawals
+-- (NULL until lt-balance-tracker sets a baseline); deposits are balances above it
+CREATE TABLE IF NOT EXISTS UserTokenStats (
+    UserID INTEGER NOT NULL,
+    TokenID INTEGER NOT NULL,
+    DepositCount INTEGER NOT NULL DEFAULT 0,
+    DepositedAmount REAL NOT NULL DEFAULT 0,
+    WithdrawalCount INTEGER NOT NULL DEFAULT 0,
+    WithdrawnAmount REAL NOT NULL DEFAULT 0,
+    ExpectedBalance REAL,
+    UpdatedAt TEXT DEFAULT (datetime('now')),
+    PRIMARY KEY (UserID, TokenID),
+    FOREIGN KEY (UserID) REFERENCES Users(UserID),
+    FOREIGN KEY (TokenID) REFERENCES Tokens(TokenID)
+);
+
+-- TABLE: TradeTimings
+-- Stage timings of each processed trade message (shared/tradeTrace.js)
+-- Spans: JSON array of {name, start, duration} in ms, start relative to TickStartedAt
+CREATE TABLE IF NOT EXISTS TradeTimings (
+    TimingID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TraceID TEXT NOT NULL,
+    UserID INTEGER NOT NULL,
+    PairID INTEGER NOT NULL,
+    ChainID INTEGER NOT NULL,
+    DEXType TEXT,
+    Action TEXT,
+    Outcome TEXT NOT NULL,
+    TradeID INTEGER,
+    Attempt INTEGER NOT NULL DEFAULT 1,
+    TickStartedAt TEXT NOT NULL,
+    TotalMs INTEGER NOT NULL,
+    Spans TEXT NOT NULL,
+    CreatedAt TEXT DEFAULT (datetime('now')),
+    FOREIGN KEY (UserID) REFERENCES Users(UserID),
+    FOREIGN KEY (PairID) REFERENCES TradingPairs(PairID),
+    FOREIGN KEY (ChainID) REFERENCES Chains(ChainID),
+    FOREIGN KEY (TradeID) REFERENCES Trades(TradeID)
+);
+
 -- TABLE: UserStrategyPending
 -- Pending strategy selections
 CREATE TABLE IF NOT EXISTS UserStrategyPending (
@@ -314,6 +404,9 @@ CREATE INDEX IF NOT EXISTS IX_CachedPrices_FetchedAt ON CachedPrices(FetchedAt);
 CREATE INDEX IF NOT EXISTS IX_PriceHistory_Pair_CreatedAt ON PriceHistory(PairID, CreatedAt DESC);
 CREATE INDEX IF NOT EXISTS IX_PriceHistory_CreatedAt ON PriceHistory(CreatedAt);
 
+-- PriceCandles
+CREATE INDEX IF NOT EXISTS IX_PriceCandles_Resolution_BucketStart ON PriceCandles(Resolution, BucketStart);
+
 -- Trades
 CREATE INDEX IF NOT EXISTS IX_Trades_Pair_CreatedAt ON Trades(PairID, CreatedAt DESC);
 CREATE INDEX IF NOT EXISTS IX_Trades_User ON Trades(UserID);
@@ -322,6 +415,11 @@ CREATE INDEX IF NOT EXISTS IX_Trades_TxHash ON Trades(TxHash);
 CREATE INDEX IF NOT EXISTS IX_Trades_User_CreatedAt ON Trades(UserID, CreatedAt DESC);
 CREATE INDEX IF NOT EXISTS IX_Trades_TokenSent ON Trades(TokenSent);
 CREATE INDEX IF NOT EXISTS IX_Trades_TokenReceived ON Trades(TokenReceived);
+CREATE INDEX IF NOT EXISTS IX_Trades_PriceID ON Trades(PriceID);
+
+-- TradeTimings
+CREATE INDEX IF NOT EXISTS IX_TradeTimings_CreatedAt ON TradeTimings(CreatedAt);
+CREATE INDEX IF NOT EXISTS IX_TradeTimings_TraceID ON TradeTimings(TraceID);
 
 -- TradeMetrics
 CREATE INDEX IF NOT EXISTS IX_TradeMetrics_TradeID ON TradeMetrics(TradeID);
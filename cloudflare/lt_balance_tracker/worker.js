@@ -4,7 +4,8 @@
  * This worker runs on a schedule to:
  * 1. Check balances for all active users on all active chains/tokens
  * 2. Store balance snapshots with USDC values
- * 3. Detect deposits by comparing with previous snapshots
+ * 3. Detect deposits by comparing with the expected balance ledger
+ *    (UserTokenStats.ExpectedBalance, kept up to date by trades and withdrawals)
  * 4. Track deposits in DepositTransactions table
  *
  * Schedule: Every 5 minutes
@@ -12,6 +13,12 @@
 
 import { ethers } from 'ethers';
 import { getTokenPriceUSDC, normalizeTokenSymbol } from '../shared/priceHelper.js';
+import {
+  depositStatsStatement,
+  ledgerChangeStatement,
+  ledgerBaselineStatement,
+  getExpectedBalances
+} from '../shared/userStats.js';
 
 const ERC20_ABI = [
   {
@@ -23,6 +30,65 @@ const ERC20_ABI = [
   }
 ];
 
+// Multicall3 is deployed at the same address on most EVM chains (https://www.multicall3.com)
+const MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11';
+
+// aggregate3 is payable on-chain; declared as view so ethers sends it as eth_call
+const MULTICALL3_ABI = [
+  {
+    inputs: [
+      {
+        components: [
+          { name: 'target', type: 'address' },
+          { name: 'allowFailure', type: 'bool' },
+          { name: 'callData', type: 'bytes' }
+        ],
+        name: 'calls',
+        type: 'tuple[]'
+      }
+    ],
+    name: 'aggregate3',
+    outputs: [
+      {
+        components: [
+          { name: 'success', type: 'bool' },
+          { name: 'returnData', type: 'bytes' }
+        ],
+        name: 'returnData',
+        type: 'tuple[]'
+      }
+    ],
+    stateMutability: 'view',
+    type: 'function'
+  },
+  {
+    inputs: [{ name: 'addr', type: 'address' }],
+    name: 'getEthBalance',
+    outputs: [{ name: 'balance', type: 'uint256' }],
+    stateMutability: 'view',
+    type: 'function'
+  }
+];
+
+// Tokens with this address are the chain's native currency
+const NATIVE_TOKEN_ADDRESS = '0x0000000000000000000000000000000000000000';
+
+// Balance reads per aggregate3 call (override with the MULTICALL_PAGE_SIZE var)
+const DEFAULT_MULTICALL_PAGE_SIZE = 500;
+
+// RPC calls in flight per chain, pages and fallback reads alike (override with the
+// MULTICALL_CONCURRENCY var)
+const DEFAULT_MULTICALL_CONCURRENCY = 6;
+
+// UserBalances rows / ledger updates per D1 batch
+const INSERT_BATCH_SIZE = 100;
+
+// Differences from the ledger up to this size are rounding, not deposits
+const BALANCE_TOLERANCE = 0.000001;
+
+const erc20Interface = new ethers.Interface(ERC20_ABI);
+const multicallInterface = new ethers.Interface(MULTICALL3_ABI);
+
 // ============================================
 // BALANCE FETCHING UTILITIES
 // ============================================
@@ -55,167 +121,177 @@ async function getActiveChains(db) {
 }
 
 /**
- * Get all active tokens for a specific chain
+ * Get all active tokens grouped by chain
+ * Returns Map<ChainID, tokens[]>
  */
-async function getActiveTokens(db, chainId) {
+async function getActiveTokensByChain(db) {
   const result = await db.prepare(`
-    SELECT TokenID, Symbol, TokenAddress, Decimals
+    SELECT TokenID, ChainID, Symbol, TokenAddress, Decimals
     FROM Tokens
-    WHERE ChainID = ? AND IsActive = 1
-    ORDER BY Symbol
-  `).bind(chainId).all();
+    WHERE IsActive = 1
+    ORDER BY ChainID, Symbol
+  `).all();
 
-  return result.results || [];
+  const tokensByChain = new Map();
+  for (const token of (result.results || [])) {
+    if (!tokensByChain.has(token.ChainID)) {
+      tokensByChain.set(token.ChainID, []);
+    }
+    tokensByChain.get(token.ChainID).push(token);
+  }
+
+  return tokensByChain;
+}
+
+function isNativeToken(tokenAddress) {
+  return tokenAddress.toLowerCase() === NATIVE_TOKEN_ADDRESS;
 }
 
 /**
  * Fetch balance for a single token
+ * Returns null if the read failed (no snapshot is stored for failed reads)
  */
 async function fetchTokenBalance(provider, tokenAddress, scwAddress, decimals) {
   try {
-    const tokenContract = new ethers.Contract(tokenAddress, ERC20_ABI, provider);
-    const balance = await tokenContract.balanceOf(scwAddress);
+    const balance = isNativeToken(tokenAddress)
+      ? await provider.getBalance(scwAddress)
+      : await new ethers.Contract(tokenAddress, ERC20_ABI, provider).balanceOf(scwAddress);
     const balanceFormatted = ethers.formatUnits(balance, decimals);
     return parseFloat(balanceFormatted);
   } catch (error) {
     console.error(`Error fetching balance for ${tokenAddress}:`, error.message);
-    return 0;
+    return null;
   }
 }
 
 /**
- * Get the most recent balance entry for a user/token
- */
-async function getPreviousSnapshot(db, userId, tokenId) {
-  const result = await db.prepare(`
-    SELECT Balance, BalanceUSDC, CreatedAt
-    FROM UserBalances
-    WHERE UserID = ? AND TokenID = ?
-    ORDER BY CreatedAt DESC
-    LIMIT 1
-  `).bind(userId, tokenId).first();
-
-  return result;
-}
-
-/**
- * Calculate balance changes from trades between two timestamps
+ * Create a limiter that runs at most `concurrency` tasks at a time
+ * Returns run(task): a promise for task()'s result, started once a slot is free.
  */
-async function getTradeBalanceChanges(db, userId, tokenId, sinceTimestamp) {
-  // Get all trades for this user and token since the timestamp
-  const trades = await db.prepare(`
-    SELECT
-      t.Action,
-      t.TokenSent,
-      t.TokenReceived,
-      t.QuantitySent,
-      t.QuantityReceived,
-      t.CreatedAt
-    FROM Trades t
-    WHERE t.UserID = ?
-      AND (t.TokenSent = ? OR t.TokenReceived = ?)
-      AND t.CreatedAt > ?
-    ORDER BY t.CreatedAt ASC
-  `).bind(userId, tokenId, tokenId, sinceTimestamp).all();
-
-  let netChange = 0;
-
-  for (const trade of (trades.results || [])) {
-    if (trade.TokenReceived === tokenId) {
-      // This token was received, add to balance
-      netChange += trade.QuantityReceived;
-    }
-    if (trade.TokenSent === tokenId) {
-      // This token was sent, subtract from balance
-      netChange -= trade.QuantitySent;
-    }
-  }
+function createLimiter(concurrency) {
+  const queue = [];
+  let active = 0;
+
+  const next = () => {
+    if (active >= concurrency || queue.length === 0) return;
+    active++;
+    const { task, resolve, reject } = queue.shift();
+    task().then(resolve, reject).finally(() => {
+      active--;
+      next();
+    });
+  };
 
-  return netChange;
+  return (task) => new Promise((resolve, reject) => {
+    queue.push({ task, resolve, reject });
+    next();
+  });
 }
 
 /**
- * Calculate balance changes from withdrawals between two timestamps
+ * Fetch balances for all users x tokens of one chain via Multicall3
+ *
+ * Reads are grouped into aggregate3 calls of pageSize (allowFailure per read). A
+ * page that fails as a whole (e.g. Multicall3 not deployed on this chain) falls
+ * back to individual balanceOf calls. Pages and fallback calls share one limit of
+ * `concurrency` RPC calls in flight.
+ *
+ * @returns {Promise<Map>} Map<`${UserID}:${TokenID}`, number|null>
  */
-async function getWithdrawalBalanceChanges(db, userId, tokenId, sinceTimestamp) {
-  const withdrawals = await db.prepare(`
-    SELECT Amount, AmountFormatted, Status, WithdrawnAt
-    FROM Withdrawals
-    WHERE UserID = ?
-      AND TokenID = ?
-      AND WithdrawnAt > ?
-      AND Status = 'confirmed'
-    ORDER BY WithdrawnAt ASC
-  `).bind(userId, tokenId, sinceTimestamp).all();
-
-  let totalWithdrawn = 0;
-
-  for (const withdrawal of (withdrawals.results || [])) {
-    // Use AmountFormatted if available, otherwise parse Amount
-    const amount = withdrawal.AmountFormatted
-      ? parseFloat(withdrawal.AmountFormatted)
-      : parseFloat(withdrawal.Amount);
-
-    if (!isNaN(amount)) {
-      totalWithdrawn += amount;
+async function fetchChainBalances(provider, users, tokens, pageSize, concurrency) {
+  const reads = [];
+  for (const user of users) {
+    for (const token of tokens) {
+      reads.push({
+        user,
+        token,
+        call: isNativeToken(token.TokenAddress)
+          ? {
+              target: MULTICALL3_ADDRESS,
+              allowFailure: true,
+              callData: multicallInterface.encodeFunctionData('getEthBalance', [user.SCWAddress])
+            }
+          : {
+              target: token.TokenAddress,
+              allowFailure: true,
+              callData: erc20Interface.encodeFunctionData('balanceOf', [user.SCWAddress])
+            }
+      });
     }
   }
 
-  return totalWithdrawn;
-}
-
-/**
- * Detect if there's a deposit based on balance change vs trades/withdrawals
- */
-async function detectAndRecordDeposit(db, userId, tokenId, chainId, scwAddress, currentBalance, previousSnapshot) {
-  if (!previousSnapshot) {
-    // First snapshot, no deposit detection
-    return;
+  const multicall = new ethers.Contract(MULTICALL3_ADDRESS, MULTICALL3_ABI, provider);
+  const pages = [];
+  for (let i = 0; i < reads.length; i += pageSize) {
+    pages.push(reads.slice(i, i + pageSize));
   }
 
-  const previousBalance = previousSnapshot.Balance;
-  const balanceChange = currentBalance - previousBalance;
+  const balances = new Map();
+  // A page gives up its slot before queueing its fallback calls
+  const limit = createLimiter(concurrency);
 
-  // If balance decreased or stayed the same, no deposit
-  if (balanceChange <= 0) {
-    return;
-  }
+  await Promise.all(pages.map(async (page) => {
+    let results;
+    try {
+      results = await limit(() => multicall.aggregate3(page.map(read => read.call)));
+    } catch (error) {
+      console.warn(`Multicall page failed (${page.length} reads), falling back to single calls:`, error.message);
+      await Promise.all(page.map(async ({ user, token }) => {
+        balances.set(
+          `${user.UserID}:${token.TokenID}`,
+          await limit(() => fetchTokenBalance(provider, token.TokenAddress, user.SCWAddress, token.Decimals))
+        );
+      }));
+      return;
+    }
+
+    page.forEach(({ user, token }, index) => {
+      const [success, returnData] = results[index];
+      let balance = null;
 
-  // Calculate expected balance change from trades and withdrawals
-  const tradeChange = await getTradeBalanceChanges(db, userId, tokenId, previousSnapshot.CreatedAt);
-  const withdrawalChange = await getWithdrawalBalanceChanges(db, userId, tokenId, previousSnapshot.CreatedAt);
+      // A call to an address without code succeeds with empty return data
+      if (success && ethers.dataLength(returnData) >= 32) {
+        const raw = ethers.AbiCoder.defaultAbiCoder().decode(['uint256'], returnData)[0];
+        balance = parseFloat(ethers.formatUnits(raw, token.Decimals));
+      } else {
+        console.error(`Error fetching balance for ${token.TokenAddress} (user ${user.UserID})`);
+      }
 
-  // Expected balance = previous + trades - withdrawals
-  const expectedBalance = previousBalance + tradeChange - withdrawalChange;
-  const unexplainedChange = currentBalance - expectedBalance;
+      balances.set(`${user.UserID}:${token.TokenID}`, balance);
+    });
+  }));
 
-  // If there's a significant unexplained increase (> 0.000001 to account for rounding)
-  if (unexplainedChange > 0.000001) {
-    console.log(`[DEPOSIT DETECTED] User ${userId}, Token ${tokenId}: +${unexplainedChange}`);
+  return balances;
+}
 
-    // Get token details for logging
-    const token = await db.prepare(`
-      SELECT Symbol, TokenAddress FROM Tokens WHERE TokenID = ?
-    `).bind(tokenId).first();
+/**
+ * Record a deposit: the on-chain balance is above the ledger by `amount`
+ * The deposit row and the ledger/aggregate update go in one batch.
+ */
+async function recordDeposit(db, user, token, chainId, amount) {
+  console.log(`[DEPOSIT DETECTED] User ${user.UserID}, Token ${token.TokenID}: +${amount}`);
 
-    // Record deposit in DepositTransactions
-    try {
-      await db.prepare(`
+  try {
+    await db.batch([
+      db.prepare(`
         INSERT INTO DepositTransactions (
           UserID, ChainID, SCWAddress, TokenAddress, Amount, Status, CreatedAt, ConfirmedAt
         ) VALUES (?, ?, ?, ?, ?, 'confirmed', datetime('now'), datetime('now'))
       `).bind(
-        userId,
+        user.UserID,
         chainId,
-        scwAddress,
-        token?.TokenAddress || 'unknown',
-        unexplainedChange
-      ).run();
-
-      console.log(`[DEPOSIT RECORDED] ${unexplainedChange} ${token?.Symbol || 'tokens'} for user ${userId}`);
-    } catch (error) {
-      console.error(`[DEPOSIT ERROR] Failed to record deposit:`, error.message);
-    }
+        user.SCWAddress,
+        token.TokenAddress,
+        amount
+      ),
+      depositStatsStatement(db, user.UserID, token.TokenID, amount)
+    ]);
+
+    console.log(`[DEPOSIT RECORDED] ${amount} ${token.Symbol} for user ${user.UserID}`);
+    return true;
+  } catch (error) {
+    console.error(`[DEPOSIT ERROR] Failed to record deposit:`, error.message);
+    return false;
   }
 }
 
@@ -223,12 +299,47 @@ async function detectAndRecordDeposit(db, userId, tokenId, chainId, scwAddress,
 // MAIN WORKER LOGIC
 // ============================================
 
+/**
+ * Get token price in USDC, looked up once per symbol per run
+ */
+async function getRunPrice(db, priceCache, symbol) {
+  // Normalize symbol to handle variants (M.USDC, GUSDC, etc.)
+  const normalizedSymbol = normalizeTokenSymbol(symbol);
+
+  if (normalizedSymbol === 'USDC') {
+    // USDC variants (USDC, M.USDC, GUSDC) - price is always 1
+    return 1.0;
+  }
+
+  if (!priceCache.has(normalizedSymbol)) {
+    // Uses ±5 min caching
+    const priceData = await getTokenPriceUSDC(db, symbol, 'USDC', 5);
+    priceCache.set(normalizedSymbol, priceData ? priceData.price : null);
+  }
+
+  return priceCache.get(normalizedSymbol);
+}
+
 /**
  * Process balance snapshots for all users
+ *
+ * Balances are read per chain with Multicall3 (all users x tokens) and new
+ * snapshots are inserted in D1 batches. Each balance is compared with the
+ * user/token's ExpectedBalance: a surplus is a deposit, a shortfall moves the
+ * ledger down to the chain, and a first reading becomes the baseline. The ledger
+ * is loaded once before and once after the reads (two queries per run).
  */
-async function processBalanceSnapshots(db) {
-  const users = await getActiveUsers(db);
-  const chains = await getActiveChains(db);
+async function processBalanceSnapshots(
+  db,
+  pageSize = DEFAULT_MULTICALL_PAGE_SIZE,
+  concurrency = DEFAULT_MULTICALL_CONCURRENCY
+) {
+  const [users, chains, tokensByChain, ledgerBeforeReads] = await Promise.all([
+    getActiveUsers(db),
+    getActiveChains(db),
+    getActiveTokensByChain(db),
+    getExpectedBalances(db)
+  ]);
 
   if (users.length === 0) {
     console.log('No active users found');
@@ -242,80 +353,105 @@ async function processBalanceSnapshots(db) {
 
   let totalSnapshots = 0;
   let totalDeposits = 0;
+  const priceCache = new Map();
 
-  for (const user of users) {
-    console.log(`Processing user ${user.UserID} (${user.Username || 'unknown'})`);
-
-    for (const chain of chains) {
-      const tokens = await getActiveTokens(db, chain.ChainID);
+  // Read all chains concurrently
+  const chainBalances = await Promise.all(chains.map(async (chain) => {
+    const tokens = tokensByChain.get(chain.ChainID) || [];
+    if (tokens.length === 0) {
+      return new Map();
+    }
 
-      if (tokens.length === 0) {
-        continue;
+    try {
+      const provider = new ethers.JsonRpcProvider(chain.RPCEndpoint, undefined, { staticNetwork: true });
+      const balances = await fetchChainBalances(provider, users, tokens, pageSize, concurrency);
+      console.log(`Chain ${chain.ChainName}: read ${balances.size} balances (${users.length} users x ${tokens.length} tokens)`);
+      return balances;
+    } catch (error) {
+      console.error(`Error reading balances on ${chain.ChainName}:`, error.message);
+      return new Map();
+    }
+  }));
+
+  // A trade or withdrawal recorded while balances were being read may or may not
+  // be in them; user/tokens whose ledger moved in the meantime are compared next run
+  const expectedBalances = await getExpectedBalances(db);
+
+  for (const [chainIndex, chain] of chains.entries()) {
+    const tokens = tokensByChain.get(chain.ChainID) || [];
+    const balances = chainBalances[chainIndex];
+    const inserts = [];
+    const ledgerUpdates = [];
+    const deposits = [];
+
+    for (const token of tokens) {
+      let priceUSDC = null;
+      try {
+        priceUSDC = await getRunPrice(db, priceCache, token.Symbol);
+      } catch (error) {
+        console.error(`Error fetching price for ${token.Symbol}:`, error.message);
       }
 
-      // Create provider for this chain
-      const provider = new ethers.JsonRpcProvider(chain.RPCEndpoint);
-
-      for (const token of tokens) {
-        try {
-          // Fetch current balance from blockchain
-          const currentBalance = await fetchTokenBalance(
-            provider,
-            token.TokenAddress,
-            user.SCWAddress,
-            token.Decimals
-          );
-
-          // Get previous snapshot
-          const previousSnapshot = await getPreviousSnapshot(db, user.UserID, token.TokenID);
-
-          // Get token price in USDC (uses ±5 min caching)
-          let priceUSDC = null;
-          let balanceUSDC = null;
-
-          // Normalize symbol to handle variants (M.USDC, GUSDC, etc.)
-          const normalizedSymbol = normalizeTokenSymbol(token.Symbol);
-
-          if (normalizedSymbol !== 'USDC') {
-            const priceData = await getTokenPriceUSDC(db, token.Symbol, 'USDC', 5);
-            if (priceData) {
-              priceUSDC = priceData.price;
-              balanceUSDC = currentBalance * priceUSDC;
-            }
-          } else {
-            // USDC variants (USDC, M.USDC, GUSDC) - price is always 1
-            priceUSDC = 1.0;
-            balanceUSDC = currentBalance;
-          }
-
-          // Insert into UserBalances (creates new row for historical tracking)
-          await db.prepare(`
-            INSERT INTO UserBalances (UserID, TokenID, Balance, BalanceUSDC, PriceUSDC, CreatedAt)
-            VALUES (?, ?, ?, ?, ?, datetime('now'))
-          `).bind(
-            user.UserID,
-            token.TokenID,
-            currentBalance,
-            balanceUSDC,
-            priceUSDC
-          ).run();
-
-          totalSnapshots++;
-
-          // Detect deposits
-          await detectAndRecordDeposit(
-            db,
-            user.UserID,
-            token.TokenID,
-            chain.ChainID,
-            user.SCWAddress,
-            currentBalance,
-            previousSnapshot
-          );
-
-        } catch (error) {
-          console.error(`Error processing ${token.Symbol} for user ${user.UserID}:`, error.message);
+      for (const user of users) {
+        const key = `${user.UserID}:${token.TokenID}`;
+        const currentBalance = balances.get(key);
+        if (currentBalance === null || currentBalance === undefined) {
+          continue;
+        }
+
+        const balanceUSDC = priceUSDC !== null ? currentBalance * priceUSDC : null;
+
+        // Insert into UserBalances (creates new row for historical tracking)
+        inserts.push(db.prepare(`
+          INSERT INTO UserBalances (UserID, TokenID, Balance, BalanceUSDC, PriceUSDC, CreatedAt)
+          VALUES (?, ?, ?, ?, ?, datetime('now'))
+        `).bind(
+          user.UserID,
+          token.TokenID,
+          currentBalance,
+          balanceUSDC,
+          priceUSDC
+        ));
+
+        // Compare with the ledger
+        const expectedBalance = expectedBalances.get(key);
+        if (expectedBalance !== ledgerBeforeReads.get(key)) {
+          continue;
         }
+        if (expectedBalance === undefined) {
+          // First reading of this user/token, no deposit detection
+          ledgerUpdates.push(ledgerBaselineStatement(db, user.UserID, token.TokenID, currentBalance));
+        } else if (currentBalance - expectedBalance > BALANCE_TOLERANCE) {
+          deposits.push({ user, token, amount: currentBalance - expectedBalance });
+        } else if (expectedBalance - currentBalance > BALANCE_TOLERANCE) {
+          // Left the wallet without a record (e.g. a transfer we did not make)
+          console.log(`[LEDGER] User ${user.UserID}, Token ${token.TokenID}: ${currentBalance} on-chain, ${expectedBalance} expected`);
+          ledgerUpdates.push(ledgerChangeStatement(db, user.UserID, token.TokenID, currentBalance - expectedBalance));
+        }
+      }
+    }
+
+    for (let i = 0; i < inserts.length; i += INSERT_BATCH_SIZE) {
+      try {
+        await db.batch(inserts.slice(i, i + INSERT_BATCH_SIZE));
+        totalSnapshots += Math.min(INSERT_BATCH_SIZE, inserts.length - i);
+      } catch (error) {
+        console.error(`Error storing balances on ${chain.ChainName}:`, error.message);
+      }
+    }
+
+    for (let i = 0; i < ledgerUpdates.length; i += INSERT_BATCH_SIZE) {
+      try {
+        await db.batch(ledgerUpdates.slice(i, i + INSERT_BATCH_SIZE));
+      } catch (error) {
+        console.error(`Error updating balance ledger on ${chain.ChainName}:`, error.message);
+      }
+    }
+
+    // Record deposits
+    for (const { user, token, amount } of deposits) {
+      if (await recordDeposit(db, user, token, chain.ChainID, amount)) {
+        totalDeposits++;
       }
     }
   }
@@ -344,7 +480,10 @@ export default {
     try {
       const db = env.DB;
 
-      const result = await processBalanceSnapshots(db);
+      const pageSize = parseInt(env.MULTICALL_PAGE_SIZE) || DEFAULT_MULTICALL_PAGE_SIZE;
+      const concurrency = parseInt(env.MULTICALL_CONCURRENCY) || DEFAULT_MULTICALL_CONCURRENCY;
+
+      const result = await processBalanceSnapshots(db, pageSize, concurrency);
 
       const duration = Date.now() - startTime;
       console.log(`=== Balance Tracker completed in ${duration}ms ===`);
@@ -25,6 +25,8 @@ import {
   handleWithdrawChain
 } from './helper.withdrawalhandlers.js';
 
+import { getUserStats, summarizeUserStats } from '../shared/userStats.js';
+
 const TELEGRAM_API = 'https://api.telegram.org/bot';
 
 // Bot commands configuration
@@ -722,8 +724,16 @@ async function handleBalance(chatId, userId, env) {
       return;
     }
 
+    // Trading and funding totals from the user's aggregates (a few rows per user)
+    let stats = null;
+    try {
+      stats = summarizeUserStats(await getUserStats(env.DB, userId));
+    } catch (error) {
+      console.error('[handleBalance] Error loading user stats:', error);
+    }
+
     // Format and display balances
-    await displayBalances(chatId, balanceResult.balances, user.SCWAddress, env);
+    await displayBalances(chatId, balanceResult.balances, user.SCWAddress, env, stats);
 
   } catch (error) {
     console.error('Error in handleBalance:', error);
@@ -762,7 +772,7 @@ export async function callBalanceWorker(userId, scwAddress, env) {
 /**
  * Display balances grouped by chain
  */
-async function displayBalances(chatId, balances, scwAddress, env) {
+async function displayBalances(chatId, balances, scwAddress, env, stats = null) {
   try {
     // Build message for each chain
     let message = `💰 *Your Smart Contract Wallet Balances*\n\n`;
@@ -802,6 +812,16 @@ async function displayBalances(chatId, balances, scwAddress, env) {
       message += `_Your wallet appears to be empty. Use /deposit to fund it!_`;
     }
 
+    if (stats && (stats.totalTrades > 0 || stats.totalDeposits > 0 || stats.totalWithdrawals > 0)) {
+      const pnlSign = stats.realizedPnlUSDC >= 0 ? '+' : '-';
+      message += `\n📈 *Trading Summary*\n`;
+      message += `  • Trades: ${stats.totalTrades} (${stats.buyCount} buys, ${stats.sellCount} sells)\n`;
+      message += `  • Volume: $${stats.tradeVolumeUSDC.toFixed(2)}\n`;
+      message += `  • Realized PnL: ${pnlSign}$${Math.abs(stats.realizedPnlUSDC).toFixed(2)}\n`;
+      message += `  • Deposited: $${stats.totalDepositedUSDC.toFixed(2)} (${stats.totalDeposits})\n`;
+      message += `  • Withdrawn: $${stats.totalWithdrawnUSDC.toFixed(2)} (${stats.totalWithdrawals})\n`;
+    }
+
     message += `\n📊 Last updated: \`${new Date().toISOString()}\``;
 
     await sendMessage(chatId, env, {
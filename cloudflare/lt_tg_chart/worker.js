@@ -1,6 +1,7 @@
 /**
  * LazaiTrader Chart Worker - Cloudflare Worker
- * Generates trade history charts using QuickChart API
+ * Generates trade history charts with the self-hosted chart renderer
+ * (chart_renderer/renderer.py), falling back to the QuickChart API
  *
  * Features:
  * - Token price lines (normalized across chains - ETH from any chain is "ETH")
@@ -12,9 +13,18 @@
  */
 
 import { normalizeTokenSymbol, isStablecoin, getTokenChartColor } from '../shared/priceHelper.js';
+import { getPriceCandles } from '../shared/priceRollup.js';
+import { getUserStats, summarizeUserStats } from '../shared/userStats.js';
 
 const QUICKCHART_API = 'https://quickchart.io/chart';
 
+// Bump when generateChartConfig changes, so cached images are re-rendered
+const CHART_VERSION = 1;
+
+// Image size
+const CHART_WIDTH = 800;
+const CHART_HEIGHT = 400;
+
 export default {
   async fetch(request, env) {
     if (request.method !== 'POST') {
@@ -37,12 +47,23 @@ export default {
       userId = parseInt(userId);
       console.log(`[chart] Generating chart for user ${userId}`);
 
-      // Get all data needed for the chart
-      const [trades, deposits, withdrawals, balanceHistory] = await Promise.all([
+      // Same user and unchanged data: serve the image the renderer already has
+      const cacheKey = await getChartCacheKey(userId, env);
+      if (cacheKey) {
+        const cached = await getCachedChart(cacheKey, env);
+        if (cached) {
+          console.log('[chart] Served cached chart');
+          return jsonResponse({ success: true, ...cached });
+        }
+      }
+
+      // Get all data needed for the chart, and statistics from the user's aggregates
+      const [trades, deposits, withdrawals, balanceHistory, stats] = await Promise.all([
         getUserTrades(userId, env),
         getUserDeposits(userId, env),
         getUserWithdrawals(userId, env),
-        getUserBalanceHistory(userId, env)
+        getUserBalanceHistory(userId, env),
+        calculateStats(userId, env)
       ]);
 
       if ((!trades || trades.length === 0) && (!balanceHistory || balanceHistory.length === 0)) {
@@ -54,11 +75,11 @@ export default {
         });
       }
 
-      // Calculate statistics with proper PnL
-      const stats = calculateStats(trades, deposits, withdrawals, balanceHistory);
+      // Token prices from PriceCandles (raw PriceHistory ticks expire after a few days)
+      const tokenPrices = await getTokenPriceHistory(trades, env);
 
       // Generate chart configuration
-      const chartConfig = generateChartConfig(trades, deposits, withdrawals, balanceHistory, stats);
+      const chartConfig = generateChartConfig(trades, deposits, withdrawals, balanceHistory, stats, tokenPrices);
 
       // Validate chart config has data to display
       if (!chartConfig.data.datasets || chartConfig.data.datasets.length === 0) {
@@ -79,18 +100,25 @@ export default {
         });
       }
 
-      // Generate chart URL using QuickChart
-      const chartUrl = await generateChartUrl(chartConfig);
+      const meta = {
+        stats: stats,
+        tradeCount: stats.totalTrades,
+        depositCount: stats.totalDeposits,
+        withdrawalCount: stats.totalWithdrawals
+      };
+
+      // Render with the chart renderer, QuickChart if it is not configured or fails
+      let chartUrl = cacheKey ? await renderChart(chartConfig, cacheKey, meta, env) : null;
+      if (!chartUrl) {
+        chartUrl = await generateChartUrl(chartConfig);
+      }
 
       console.log('[chart] Chart generated successfully');
 
       return jsonResponse({
         success: true,
         chartUrl: chartUrl,
-        stats: stats,
-        tradeCount: trades?.length || 0,
-        depositCount: deposits?.length || 0,
-        withdrawalCount: withdrawals?.length || 0
+        ...meta
       });
 
     } catch (error) {
@@ -119,6 +147,7 @@ async function getUserTrades(userId, env) {
         t.TxHash,
         t.CreatedAt,
         ph.Price,
+        tp.PairID,
         tp.PairName,
         bt.Symbol AS BaseSymbol,
         qt.Symbol AS QuoteSymbol,
@@ -241,81 +270,95 @@ async function getUserBalanceHistory(userId, env) {
 }
 
 /**
- * Calculate trading statistics including PnL with deposits/withdrawals consideration
+ * Get daily token prices (USD) for the pairs the user traded
+ * Reads OHLC candles at the resolution that fits the trade history range and keeps
+ * the last close per day. Only stablecoin-quoted pairs are used (quote = $1).
+ * Returns Map<NormalizedSymbol, Map<YYYY-MM-DD, price>>
  */
-function calculateStats(trades, deposits, withdrawals, balanceHistory) {
-  const stats = {
-    totalTrades: trades?.length || 0,
-    totalDeposits: deposits?.length || 0,
-    totalWithdrawals: withdrawals?.length || 0,
-    buyCount: 0,
-    sellCount: 0,
-    // Track USDC values for PnL
-    totalDepositedUSDC: 0,
-    totalWithdrawnUSDC: 0,
-    currentPortfolioUSDC: 0,
-    pnlAbsolute: 0,
-    pnlPercentage: 0,
-    firstTradeDate: null,
-    lastTradeDate: null,
-    tokensTraded: new Set()
-  };
-
-  if (!trades || trades.length === 0) {
-    return stats;
-  }
-
-  // Process trades
-  trades.forEach(trade => {
-    if (trade.Action === 'BUY') {
-      stats.buyCount++;
-    } else if (trade.Action === 'SELL') {
-      stats.sellCount++;
+async function getTokenPriceHistory(trades, env) {
+  const tokenPrices = new Map();
+  if (!trades || trades.length === 0) return tokenPrices;
+
+  const pairSymbols = new Map();
+  trades.forEach(t => {
+    if (isStablecoin(t.NormalizedQuoteSymbol) && !isStablecoin(t.NormalizedBaseSymbol)) {
+      pairSymbols.set(t.PairID, t.NormalizedBaseSymbol);
     }
-    stats.tokensTraded.add(trade.NormalizedBaseSymbol);
   });
+  if (pairSymbols.size === 0) return tokenPrices;
 
-  // Set date range
-  stats.firstTradeDate = trades[0]?.CreatedAt;
-  stats.lastTradeDate = trades[trades.length - 1]?.CreatedAt;
-
-  // Calculate deposits in USDC (approximate - use stablecoins or latest prices)
-  if (deposits && deposits.length > 0) {
-    deposits.forEach(d => {
-      if (isStablecoin(d.NormalizedSymbol)) {
-        stats.totalDepositedUSDC += d.Amount || 0;
+  try {
+    const to = new Date().toISOString().slice(0, 19).replace('T', ' ');
+    const { resolution, candles } = await getPriceCandles(
+      env.DB, Array.from(pairSymbols.keys()), trades[0].CreatedAt, to
+    );
+    console.log(`[chart] Loaded ${candles.length} ${resolution} candles for ${pairSymbols.size} pairs`);
+
+    // Candles are ordered by PairID, BucketStart - later closes overwrite earlier ones
+    candles.forEach(c => {
+      const symbol = pairSymbols.get(c.PairID);
+      if (!tokenPrices.has(symbol)) {
+        tokenPrices.set(symbol, new Map());
       }
-      // For non-stablecoins, we'd need historical prices - simplified for now
+      tokenPrices.get(symbol).set(formatDate(c.BucketStart), c.Close);
     });
+  } catch (error) {
+    console.error('[chart] Error fetching price candles:', error.message);
   }
 
-  // Calculate withdrawals in USDC
-  if (withdrawals && withdrawals.length > 0) {
-    withdrawals.forEach(w => {
-      if (isStablecoin(w.NormalizedSymbol)) {
-        stats.totalWithdrawnUSDC += w.AmountParsed || 0;
-      }
-    });
-  }
+  return tokenPrices;
+}
 
-  // Calculate current portfolio value from latest balances
-  if (balanceHistory && balanceHistory.length > 0) {
-    // Get latest balance per token
-    const latestBalances = new Map();
-    balanceHistory.forEach(b => {
-      const existing = latestBalances.get(b.NormalizedSymbol);
-      if (!existing || new Date(b.CreatedAt) > new Date(existing.CreatedAt)) {
-        latestBalances.set(b.NormalizedSymbol, b);
-      }
-    });
+/**
+ * Get the latest USDC value per token held by the user (one row per token)
+ */
+async function getLatestBalances(userId, env) {
+  try {
+    const result = await env.DB.prepare(`
+      SELECT
+        t.TokenID,
+        t.Symbol AS TokenSymbol,
+        (
+          SELECT ub.BalanceUSDC
+          FROM UserBalances ub
+          WHERE ub.UserID = ? AND ub.TokenID = t.TokenID
+          ORDER BY ub.CreatedAt DESC
+          LIMIT 1
+        ) AS BalanceUSDC
+      FROM Tokens t
+    `).bind(userId).all();
 
-    // Sum up USDC values
-    latestBalances.forEach(b => {
-      if (b.BalanceUSDC && b.BalanceUSDC > 0) {
-        stats.currentPortfolioUSDC += b.BalanceUSDC;
-      }
-    });
+    return (result.results || []).filter(b => b.BalanceUSDC !== null);
+  } catch (error) {
+    console.error('[chart] Error fetching latest balances:', error.message);
+    return [];
   }
+}
+
+/**
+ * Calculate trading statistics including PnL with deposits/withdrawals consideration
+ * Totals come from the UserPairStats/UserTokenStats aggregates (shared/userStats.js),
+ * the current portfolio from the latest balance of each token.
+ */
+async function calculateStats(userId, env) {
+  const [userStats, latestBalances] = await Promise.all([
+    getUserStats(env.DB, userId),
+    getLatestBalances(userId, env)
+  ]);
+
+  const stats = {
+    ...summarizeUserStats(userStats),
+    currentPortfolioUSDC: 0,
+    pnlAbsolute: 0,
+    pnlPercentage: 0
+  };
+
+  // Sum up USDC values
+  latestBalances.forEach(b => {
+    if (b.BalanceUSDC > 0) {
+      stats.currentPortfolioUSDC += b.BalanceUSDC;
+    }
+  });
 
   // PnL = Current Value + Withdrawals - Deposits
   // This properly accounts for:
@@ -328,9 +371,6 @@ function calculateStats(trades, deposits, withdrawals, balanceHistory) {
     stats.pnlPercentage = (stats.pnlAbsolute / stats.totalDepositedUSDC) * 100;
   }
 
-  // Convert Set to Array for serialization
-  stats.tokensTraded = Array.from(stats.tokensTraded);
-
   return stats;
 }
 
@@ -339,7 +379,7 @@ function calculateStats(trades, deposits, withdrawals, balanceHistory) {
  * Main feature: Portfolio value line (total USD value over time)
  * Secondary: Token price lines (faded 20%), buy/sell/deposit/withdrawal markers
  */
-function generateChartConfig(trades, deposits, withdrawals, balanceHistory, stats) {
+function generateChartConfig(trades, deposits, withdrawals, balanceHistory, stats, tokenPrices = new Map()) {
   const datasets = [];
   const allDates = new Set();
 
@@ -454,14 +494,25 @@ function generateChartConfig(trades, deposits, withdrawals, balanceHistory, stat
     });
   }
 
+  // Tokens with candle prices but no balance snapshots still get a price line
+  tokenPrices.forEach((prices, tokenSymbol) => {
+    if (!balancesByToken.has(tokenSymbol)) {
+      balancesByToken.set(tokenSymbol, []);
+    }
+  });
+
   // Create faded price line datasets for each token
   balancesByToken.forEach((balances, tokenSymbol) => {
     const baseColor = getTokenChartColor(tokenSymbol);
     // Convert hex to rgba with 20% opacity
     const fadedColor = hexToRgba(baseColor, 0.2);
+    const candlePrices = tokenPrices.get(tokenSymbol);
 
-    // Create price line data
+    // Create price line data (candle close first, balance snapshot price as fallback)
     const priceData = sortedDates.map(date => {
+      if (candlePrices && candlePrices.has(date)) {
+        return candlePrices.get(date);
+      }
       const dayBalances = balances.filter(b => formatDate(b.CreatedAt) === date);
       if (dayBalances.length > 0) {
         return dayBalances[dayBalances.length - 1].PriceUSDC;
@@ -697,6 +748,98 @@ function hexToRgba(hex, opacity) {
   return `rgba(${r}, ${g}, ${b}, ${opacity})`;
 }
 
+/**
+ * Data watermark of a user's chart: changes whenever a trade, deposit, withdrawal
+ * or balance snapshot is added, and every hour (candle closes of the current day move)
+ */
+async function getChartWatermark(userId, env) {
+  const row = await env.DB.prepare(`
+    SELECT
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(TradeID), 0) FROM Trades WHERE UserID = ?) AS Trades,
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(DepositID), 0) FROM DepositTransactions WHERE UserID = ? AND Status = 'confirmed') AS Deposits,
+      (SELECT COUNT(*) || ':' || COALESCE(MAX(WithdrawalID), 0) FROM Withdrawals WHERE UserID = ? AND Status = 'confirmed') AS Withdrawals,
+      (SELECT COALESCE(MAX(BalanceID), 0) FROM UserBalances WHERE UserID = ?) AS Balances
+  `).bind(userId, userId, userId, userId).first();
+
+  const hour = new Date().toISOString().slice(0, 13);
+  return `${row.Trades}|${row.Deposits}|${row.Withdrawals}|${row.Balances}|${hour}`;
+}
+
+/**
+ * Cache key of a chart: HMAC of (version, user, data watermark) with the renderer
+ * secret, so image URLs cannot be guessed. Null if the renderer is not configured.
+ */
+async function getChartCacheKey(userId, env) {
+  if (!env.CHART_RENDERER_URL || !env.RENDERER_SECRET) {
+    return null;
+  }
+
+  try {
+    const watermark = await getChartWatermark(userId, env);
+    const encoder = new TextEncoder();
+    const key = await crypto.subtle.importKey(
+      'raw', encoder.encode(env.RENDERER_SECRET), { name: 'HMAC', hash: 'SHA-256' }, false, ['sign']
+    );
+    const signature = await crypto.subtle.sign('HMAC', key, encoder.encode(`${CHART_VERSION}:${userId}:${watermark}`));
+    return Array.from(new Uint8Array(signature), b => b.toString(16).padStart(2, '0')).join('');
+  } catch (error) {
+    console.error('[chart] Error computing chart cache key:', error.message);
+    return null;
+  }
+}
+
+/**
+ * Get a cached chart (chartUrl, stats, counts) from the renderer, or null
+ */
+async function getCachedChart(cacheKey, env) {
+  try {
+    const response = await fetch(`${env.CHART_RENDERER_URL}/chart/${cacheKey}.json`, {
+      headers: { 'Authorization': `Bearer ${env.RENDERER_SECRET}` }
+    });
+    if (!response.ok) {
+      return null;
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('[chart] Error reading chart cache:', error.message);
+    return null;
+  }
+}
+
+/**
+ * Render the chart with the self-hosted renderer, returns the image URL or null
+ */
+async function renderChart(chartConfig, cacheKey, meta, env) {
+  try {
+    const response = await fetch(`${env.CHART_RENDERER_URL}/render`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${env.RENDERER_SECRET}`
+      },
+      body: JSON.stringify({
+        key: cacheKey,
+        chart: chartConfig,
+        width: CHART_WIDTH,
+        height: CHART_HEIGHT,
+        meta
+      })
+    });
+
+    if (!response.ok) {
+      console.error('[chart] Renderer error:', response.status, await response.text());
+      return null;
+    }
+
+    const result = await response.json();
+    console.log(`[chart] Renderer ${result.cached ? 'cache hit' : 'rendered'}`);
+    return result.url || null;
+  } catch (error) {
+    console.error('[chart] Error calling chart renderer:', error.message);
+    return null;
+  }
+}
+
 /**
  * Generate chart URL using QuickChart API
  */
@@ -717,8 +860,8 @@ async function generateChartUrl(chartConfig) {
       },
       body: JSON.stringify({
         chart: chartConfig,
-        width: 800,
-        height: 400,
+        width: CHART_WIDTH,
+        height: CHART_HEIGHT,
         backgroundColor: 'white',
         format: 'png'
       })
@@ -27,6 +27,7 @@
  */
 
 import { ethers } from 'ethers';
+import { withdrawalStatsStatement } from '../shared/userStats.js';
 
 // SCW Contract ABI - Complete from LazaiTradingWallet contract
 const SCW_ABI = [
@@ -263,30 +264,42 @@ async function storeWithdrawalInDatabase(userId, scwAddress, txHash, tokenAddres
 
     // Get token info if not native
     let tokenId = null;
+    let amountFormatted = null;
     if (tokenAddress !== ethers.ZeroAddress) {
       const token = await env.DB.prepare(
-        'SELECT TokenID FROM Tokens WHERE TokenAddress = ?'
-      ).bind(tokenAddress).first();
+        'SELECT TokenID, Decimals FROM Tokens WHERE TokenAddress = ? AND ChainID = ?'
+      ).bind(tokenAddress, chainId).first();
       
       if (token) {
         tokenId = token.TokenID;
+        amountFormatted = ethers.formatUnits(withdrawnAmount, token.Decimals);
       }
     }
 
-    // Insert withdrawal record with actual amount
-    await env.DB.prepare(
-      `INSERT INTO Withdrawals (UserID, SCWAddress, TokenID, TokenAddress, Amount, RecipientAddress, TxHash, ChainID, Status, WithdrawnAt)
-       VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'confirmed', datetime('now'))`
-    ).bind(
-      userId, 
-      scwAddress, 
-      tokenId, 
-      tokenAddress === ethers.ZeroAddress ? null : tokenAddress, 
-      withdrawnAmount,
-      user.UserWallet, 
-      txHash, 
-      chainId
-    ).run();
+    // Insert withdrawal record with actual amount (raw units, and token units when known)
+    const statements = [
+      env.DB.prepare(
+        `INSERT INTO Withdrawals (UserID, SCWAddress, TokenID, TokenAddress, Amount, AmountFormatted, RecipientAddress, TxHash, ChainID, Status, WithdrawnAt)
+         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'confirmed', datetime('now'))`
+      ).bind(
+        userId, 
+        scwAddress, 
+        tokenId, 
+        tokenAddress === ethers.ZeroAddress ? null : tokenAddress, 
+        withdrawnAmount,
+        amountFormatted,
+        user.UserWallet, 
+        txHash, 
+        chainId
+      )
+    ];
+
+    // Fold into the user's token aggregates
+    if (tokenId !== null) {
+      statements.push(withdrawalStatsStatement(env.DB, userId, tokenId, parseFloat(amountFormatted)));
+    }
+
+    await env.DB.batch(statements);
 
     console.log(`[storeWithdrawalInDatabase] ✓ Withdrawal recorded: ${txHash} (${withdrawnAmount} wei)`);
   } catch (error) {
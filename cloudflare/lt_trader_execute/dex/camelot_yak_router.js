@@ -210,7 +210,7 @@ async function checkAndApproveAllowance(
  * @param {BigInt} amountInWei - Amount to swap in wei
  * @param {number} slippageBps - Slippage tolerance in basis points (e.g., 50 = 0.5%)
  * @param {Object} pathInfo - Optional pre-queried path info from findBestPath
- * @returns {Object} Result with success, txHash, gasUsed, and optional approvalTxHash
+ * @returns {Object} Result with success, txHash, gasUsed, submittedAt (epoch ms the tx was sent), and optional approvalTxHash
  */
 export async function executeSwap(
   scwContract,
@@ -376,6 +376,7 @@ export async function executeSwap(
       gasLimit: 500000 // Higher gas for complex multi-hop swaps
     });
 
+    const submittedAt = Date.now();
     console.log(`[CAMELOT:EXECUTE] TX Hash: ${tx.hash}`);
     console.log(`[CAMELOT:EXECUTE] Waiting for confirmation...`);
 
@@ -398,6 +399,7 @@ export async function executeSwap(
       success: receipt.status === 1,
       txHash: receipt.hash,
       gasUsed: receipt.gasUsed.toString(),
+      submittedAt,
       approvalTxHash: approvalResult.txHash || null
     };
   } catch (error) {
@@ -75,7 +75,7 @@ export async function updateOraclePrices(
  * @param {string} dexAddress - LazaiSwap DEX contract address
  * @param {string} tokenInAddress - Address of token being sold
  * @param {BigInt} amountInWei - Amount to swap in wei
- * @returns {Object} Result with success, txHash, and gasUsed
+ * @returns {Object} Result with success, txHash, gasUsed, and submittedAt (epoch ms the tx was sent)
  */
 export async function executeSwap(
   scwContract,
@@ -104,6 +104,7 @@ export async function executeSwap(
     gasLimit: 500000
   });
 
+  const submittedAt = Date.now();
   console.log(`[LAZAISWAP:EXECUTE] TX Hash: ${tx.hash}`);
 
   const receipt = await tx.wait();
@@ -111,7 +112,8 @@ export async function executeSwap(
   return {
     success: receipt.status === 1,
     txHash: receipt.hash,
-    gasUsed: receipt.gasUsed.toString()
+    gasUsed: receipt.gasUsed.toString(),
+    submittedAt
   };
 }
 
@@ -18,7 +18,9 @@
 
 import { ethers } from 'ethers';
 import * as dexHandlers from './dex/index.js';
-import { parsePrice } from '../shared/priceParser.js';
+import { getEndpoints, fetchPriceHedged } from '../shared/priceFetcher.js';
+import { tradeStatsStatement, tradeLedgerStatements } from '../shared/userStats.js';
+import { TradeTrace, recordTradeTiming } from '../shared/tradeTrace.js';
 import tokenMappings from '../shared/tokenMappings.json';
 
 // ============================================
@@ -56,49 +58,12 @@ function normalizeBasePairSymbol(pairName) {
 
 /**
  * Fetch fresh price for validation
+ * Hedged across endpoints; endpoint counters are left to the producer's tick.
  */
 async function fetchFreshPrice(db, pairName) {
   const basePairSymbol = normalizeBasePairSymbol(pairName);
-
-  const endpoints = await db.prepare(`
-    SELECT * FROM PriceAPIEndpoints
-    WHERE BasePairSymbol = ? AND IsActive = 1
-    ORDER BY Priority ASC
-  `).bind(basePairSymbol).all();
-
-  if (!endpoints.results || endpoints.results.length === 0) {
-    return null;
-  }
-
-  for (const endpoint of endpoints.results) {
-    try {
-      const controller = new AbortController();
-      const timeoutId = setTimeout(() => controller.abort(), 5000);
-
-      const response = await fetch(endpoint.EndpointURL, {
-        signal: controller.signal,
-        headers: { 'Accept': 'application/json' }
-      });
-
-      clearTimeout(timeoutId);
-
-      if (!response.ok) continue;
-
-      const data = await response.json();
-
-      // Use ResponseSchema if available, otherwise fall back to provider-based parsing
-      const schemaOrProvider = endpoint.ResponseSchema || endpoint.Provider;
-      const price = parsePrice(data, schemaOrProvider);
-
-      if (price && price > 0) {
-        return { price, provider: endpoint.Provider };
-      }
-    } catch (e) {
-      continue;
-    }
-  }
-
-  return null;
+  const endpoints = await getEndpoints(db, basePairSymbol);
+  return fetchPriceHedged(endpoints, basePairSymbol);
 }
 
 // ============================================
@@ -289,21 +254,26 @@ async function recordTrade(db, tradeData) {
 
   const priceId = priceResult.meta?.last_row_id;
 
-  // Insert trade with token IDs
-  const tradeResult = await db.prepare(`
-    INSERT INTO Trades (PairID, UserID, PriceID, Action, TokenSent, TokenReceived, QuantitySent, QuantityReceived, TxHash, CreatedAt)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
-  `).bind(
-    tradeData.pairId,
-    tradeData.userId,
-    priceId,
-    tradeData.action,
-    tradeData.tokenSent,
-    tradeData.tokenReceived,
-    tradeData.quantitySent,
-    tradeData.quantityReceived,
-    tradeData.txHash
-  ).run();
+  // Insert trade with token IDs, and fold it into the user's pair aggregates and
+  // expected token balances (the deposit detection ledger)
+  const [tradeResult] = await db.batch([
+    db.prepare(`
+      INSERT INTO Trades (PairID, UserID, PriceID, Action, TokenSent, TokenReceived, QuantitySent, QuantityReceived, TxHash, CreatedAt)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+    `).bind(
+      tradeData.pairId,
+      tradeData.userId,
+      priceId,
+      tradeData.action,
+      tradeData.tokenSent,
+      tradeData.tokenReceived,
+      tradeData.quantitySent,
+      tradeData.quantityReceived,
+      tradeData.txHash
+    ),
+    tradeStatsStatement(db, tradeData),
+    ...tradeLedgerStatements(db, tradeData)
+  ]);
 
   const tradeId = tradeResult.meta?.last_row_id;
 
@@ -402,6 +372,8 @@ Your Smart Contract Wallet has no ${trade.tokenSymbol} balance. Please fund your
 
 /**
  * Process a single trade message from the queue
+ * Every stage is timed on the trace the producer started (shared/tradeTrace.js),
+ * which is written to TradeTimings however the message ends.
  */
 async function processTradeMessage(message, env) {
   const trade = message.body;
@@ -409,16 +381,24 @@ async function processTradeMessage(message, env) {
   console.log(`[PROCESS] Starting trade for user ${trade.userId}, pair ${trade.pair.pairName}, action ${trade.action}`);
   console.log(`[MESSAGE] Full payload: ${JSON.stringify(trade)}`);
   
+  // Queue stage: from sendBatch in the producer until this message is picked up
+  const trace = TradeTrace.fromMessage(trade.trace);
+  if (trade.trace?.enqueuedAt) {
+    trace.add('queue', trade.trace.enqueuedAt);
+  }
+  const timing = { outcome: 'error', action: trade.action, tradeId: null };
+  
   try {
     const db = env.DB;
     
     // Step 1: Fetch fresh price
     console.log(`[PRICE] Fetching fresh price for ${trade.pair.pairName}...`);
-    const freshPriceData = await fetchFreshPrice(db, trade.pair.pairName);
+    const freshPriceData = await trace.span('fresh_price', () => fetchFreshPrice(db, trade.pair.pairName));
     
     if (!freshPriceData) {
       console.error(`[ERROR] Failed to fetch fresh price for ${trade.pair.pairName}`);
       // Don't log, don't execute - just skip
+      timing.outcome = 'no_price';
       message.ack();
       return;
     }
@@ -437,19 +417,21 @@ async function processTradeMessage(message, env) {
     if (!validation.valid) {
       console.log(`[SKIP] Trigger no longer valid: ${validation.reason}`);
       // Don't log, don't execute - just skip
+      timing.outcome = 'trigger_invalid';
       message.ack();
       return;
     }
     
     console.log(`[VALIDATE] Trigger still valid: ${validation.action} at ${validation.percentChange.toFixed(2)}% change`);
+    timing.action = validation.action;
     
     // Step 3: Get consecutive count
-    const consecutiveCount = await getConsecutiveCount(
+    const consecutiveCount = await trace.span('consecutive_count', () => getConsecutiveCount(
       db,
       trade.userId,
       trade.pairId,
       validation.action
-    );
+    ));
     console.log(`[CALC] Consecutive count: ${consecutiveCount}`);
     
     // Step 4: Calculate actual trade percentage
@@ -483,11 +465,11 @@ async function processTradeMessage(message, env) {
     console.log(`[TRADE] Token in price: $${tokenInPriceUSD} per ${tokenIn.symbol}`);
     
     // Get SCW balance of token to sell
-    const balanceWei = await getSCWTokenBalance(
+    const balanceWei = await trace.span('balance', () => getSCWTokenBalance(
       provider,
       trade.scwAddress,
       tokenIn.address
-    );
+    ));
     const balance = parseFloat(ethers.formatUnits(balanceWei, tokenIn.decimals));
     console.log(`[BALANCE] SCW ${tokenIn.symbol} balance: ${balance}`);
     
@@ -496,7 +478,7 @@ async function processTradeMessage(message, env) {
       console.log(`[SKIP] Zero balance - cannot execute trade`);
 
       // Record as 0-amount trade with explanation
-      await recordTrade(db, {
+      await trace.span('record_trade', () => recordTrade(db, {
         pairId: trade.pairId,
         userId: trade.userId,
         price: currentPrice,
@@ -508,10 +490,10 @@ async function processTradeMessage(message, env) {
         txHash: `NO_BALANCE-${trade.userId}-${trade.pairId}-${Date.now()}`,
         consecutiveCount: 0,
         actualTradePercentage: 0
-      });
+      }));
       
       // Notify user
-      await sendTelegramNotification(
+      await trace.span('notify', () => sendTelegramNotification(
         env.TELEGRAM_BOT_TOKEN,
         trade.telegramChatId,
         formatZeroBalanceMessage({
@@ -521,8 +503,9 @@ async function processTradeMessage(message, env) {
           scwAddress: trade.scwAddress,
           chainName: trade.chain.chainName
         })
-      );
+      ));
       
+      timing.outcome = 'zero_balance';
       message.ack();
       return;
     }
@@ -543,7 +526,7 @@ async function processTradeMessage(message, env) {
       console.log(`[MINIMUM] Trade below minimum: ${tradeCalc.reason}`);
 
       // Record as 0-amount trade with explanation
-      await recordTrade(db, {
+      await trace.span('record_trade', () => recordTrade(db, {
         pairId: trade.pairId,
         userId: trade.userId,
         price: currentPrice,
@@ -555,10 +538,10 @@ async function processTradeMessage(message, env) {
         txHash: `BELOW_MIN-${trade.userId}-${trade.pairId}-${Date.now()}`,
         consecutiveCount: consecutiveCount,
         actualTradePercentage: actualTradePercentage
-      });
+      }));
       
       // Notify user
-      await sendTelegramNotification(
+      await trace.span('notify', () => sendTelegramNotification(
         env.TELEGRAM_BOT_TOKEN,
         trade.telegramChatId,
         formatBelowMinimumMessage({
@@ -567,8 +550,9 @@ async function processTradeMessage(message, env) {
           amountUSD: tradeCalc.amountUSD,
           minAmount: trade.minimumAmount
         })
-      );
+      ));
       
+      timing.outcome = 'below_minimum';
       message.ack();
       return;
     }
@@ -583,6 +567,7 @@ async function processTradeMessage(message, env) {
     if (!dexHandler) {
       console.error(`[ERROR] Unsupported DEX type: ${dexType}`);
       console.error(`[ERROR] Supported types: ${dexHandlers.getSupportedTypes().join(', ')}`);
+      timing.outcome = 'unsupported_dex';
       message.ack(); // Don't retry - this is a configuration error
       return;
     }
@@ -598,14 +583,15 @@ async function processTradeMessage(message, env) {
     if (dexInfo.requiresOracleUpdate) {
       console.log(`[ORACLE] Updating DEX oracle prices...`);
       try {
-        const oracleResult = await dexHandler.updateOraclePrices(
+        const oracleResult = await trace.span('oracle_update', () => dexHandler.updateOraclePrices(
           botWallet,
           trade.pair.dexAddress,
           currentPrice
-        );
+        ));
 
         if (!oracleResult.success) {
           console.error(`[ERROR] Failed to update oracle prices`);
+          timing.outcome = 'oracle_failed';
           message.retry();
           return;
         }
@@ -613,6 +599,7 @@ async function processTradeMessage(message, env) {
         console.log(`[ORACLE] Prices updated successfully. TxHash: ${oracleResult.txHash}`);
       } catch (oracleError) {
         console.error(`[ERROR] Oracle update failed: ${oracleError.message}`);
+        timing.outcome = 'oracle_failed';
         message.retry();
         return;
       }
@@ -629,16 +616,17 @@ async function processTradeMessage(message, env) {
     // Step 12: Approve token from SCW to DEX
     console.log(`[APPROVE] Approving token for trade...`);
     try {
-      const approvalResult = await approveTokenOnSCW(
+      const approvalResult = await trace.span('approve', () => approveTokenOnSCW(
         botWallet,
         trade.scwAddress,
         tokenIn.address,
         trade.pair.dexAddress,
         amountWei
-      );
+      ));
 
       if (!approvalResult.success) {
         console.error(`[ERROR] Token approval failed`);
+        timing.outcome = 'approve_failed';
         message.retry();
         return;
       }
@@ -646,6 +634,7 @@ async function processTradeMessage(message, env) {
       console.log(`[APPROVE] Token approved successfully. TxHash: ${approvalResult.txHash}`);
     } catch (approvalError) {
       console.error(`[ERROR] Token approval failed: ${approvalError.message}`);
+      timing.outcome = 'approve_failed';
       message.retry();
       return;
     }
@@ -653,6 +642,7 @@ async function processTradeMessage(message, env) {
     // Step 13: Execute trade via DEX handler
     console.log(`[EXECUTE] Executing trade on ${dexType} DEX ${trade.pair.dexAddress}...`);
 
+    const swapStart = Date.now();
     let result;
     try {
       if (dexType === 'CamelotYakRouter') {
@@ -677,13 +667,23 @@ async function processTradeMessage(message, env) {
 
       if (!result.success) {
         console.error(`[ERROR] Trade execution failed`);
+        timing.outcome = 'swap_failed';
         message.retry();
         return;
       }
     } catch (execError) {
       console.error(`[ERROR] Trade execution failed: ${execError.message}`);
+      timing.outcome = 'swap_failed';
       message.retry();
       return;
+    } finally {
+      // Handlers report when the tx was sent; sent -> mined is the receipt stage
+      if (result?.submittedAt) {
+        trace.add('swap', swapStart, result.submittedAt);
+        trace.add('receipt', result.submittedAt);
+      } else {
+        trace.add('swap', swapStart);
+      }
     }
 
     console.log(`[SUCCESS] Trade executed! TxHash: ${result.txHash}`);
@@ -711,7 +711,7 @@ async function processTradeMessage(message, env) {
     console.log(`[TRADE] Sent: ${quantitySent} ${tokenIn.symbol}, Received: ${quantityReceived.toFixed(5)} ${tokenOut.symbol}`);
 
     // Step 15: Record trade in database
-    const { tradeId } = await recordTrade(db, {
+    const { tradeId } = await trace.span('record_trade', () => recordTrade(db, {
       pairId: trade.pairId,
       userId: trade.userId,
       price: currentPrice,
@@ -723,12 +723,13 @@ async function processTradeMessage(message, env) {
       txHash: result.txHash,
       consecutiveCount: consecutiveCount,
       actualTradePercentage: actualTradePercentage
-    });
+    }));
     
     console.log(`[DB] Recorded trade ID: ${tradeId}`);
+    timing.tradeId = tradeId;
 
     // Step 16: Send Telegram notification
-    await sendTelegramNotification(
+    await trace.span('notify', () => sendTelegramNotification(
       env.TELEGRAM_BOT_TOKEN,
       trade.telegramChatId,
       formatTradeSuccessMessage({
@@ -744,9 +745,10 @@ async function processTradeMessage(message, env) {
         txHash: result.txHash,
         capped: tradeCalc.capped
       })
-    );
+    ));
     
     console.log(`[COMPLETE] Trade processed successfully for user ${trade.userId}`);
+    timing.outcome = 'executed';
     message.ack();
     
   } catch (error) {
@@ -755,6 +757,20 @@ async function processTradeMessage(message, env) {
     
     // Retry the message
     message.retry();
+  } finally {
+    // Timing is diagnostics only - never affects the trade
+    try {
+      await recordTradeTiming(env.DB, trace, {
+        userId: trade.userId,
+        pairId: trade.pairId,
+        chainId: trade.chainId,
+        dexType: trade.pair?.dexType,
+        attempt: message.attempts,
+        ...timing
+      });
+    } catch (error) {
+      console.error(`[TRACE] Failed to record trade timing: ${error.message}`);
+    }
   }
 }
 
@@ -9,7 +9,10 @@
  * The consumer worker (lt-trading-execution) will pick up messages from the queue
  */
 
-import { parsePrice } from '../shared/priceParser.js';
+import { getEndpointsByPair, fetchPriceHedged, EndpointStats, flushEndpointStats } from '../shared/priceFetcher.js';
+import { rollupPriceHistory, compactPriceHistory } from '../shared/priceRollup.js';
+import { tradeStatsStatement } from '../shared/userStats.js';
+import { TradeTrace } from '../shared/tradeTrace.js';
 import tokenMappings from '../shared/tokenMappings.json';
 
 // ============================================
@@ -35,91 +38,6 @@ function normalizeBasePairSymbol(pairName) {
   return mappedParts.join('-');
 }
 
-/**
- * Fetch price from a single API endpoint
- */
-async function fetchPriceFromEndpoint(endpoint) {
-  try {
-    const controller = new AbortController();
-    const timeoutId = setTimeout(() => controller.abort(), 5000); // 5s timeout
-
-    const response = await fetch(endpoint.EndpointURL, {
-      signal: controller.signal,
-      headers: {
-        'Accept': 'application/json',
-        'User-Agent': 'LazaiTrader/1.0'
-      }
-    });
-
-    clearTimeout(timeoutId);
-
-    if (!response.ok) {
-      throw new Error(`HTTP ${response.status}`);
-    }
-
-    const data = await response.json();
-
-    // Use ResponseSchema if available, otherwise fall back to provider-based parsing
-    const schemaOrProvider = endpoint.ResponseSchema || endpoint.Provider;
-    const price = parsePrice(data, schemaOrProvider);
-
-    if (price === null || isNaN(price) || price <= 0) {
-      throw new Error('Invalid price value');
-    }
-
-    return { success: true, price, provider: endpoint.Provider };
-  } catch (error) {
-    return { success: false, error: error.message, provider: endpoint.Provider };
-  }
-}
-
-/**
- * Fetch price for a base pair symbol using fallback endpoints
- */
-async function fetchPriceWithFallback(db, basePairSymbol) {
-  // Get all active endpoints for this pair, ordered by priority
-  const endpoints = await db.prepare(`
-    SELECT * FROM PriceAPIEndpoints 
-    WHERE BasePairSymbol = ? AND IsActive = 1 
-    ORDER BY Priority ASC
-  `).bind(basePairSymbol).all();
-  
-  if (!endpoints.results || endpoints.results.length === 0) {
-    console.warn(`No API endpoints configured for ${basePairSymbol}`);
-    return null;
-  }
-  
-  for (const endpoint of endpoints.results) {
-    const result = await fetchPriceFromEndpoint(endpoint);
-    
-    if (result.success) {
-      // Update success timestamp and reset failure count
-      await db.prepare(`
-        UPDATE PriceAPIEndpoints 
-        SET LastSuccessAt = datetime('now'), 
-            ConsecutiveFailures = 0,
-            UpdatedAt = datetime('now')
-        WHERE EndpointID = ?
-      `).bind(endpoint.EndpointID).run();
-      
-      return { price: result.price, provider: result.provider };
-    } else {
-      // Update failure info
-      console.warn(`${endpoint.Provider} failed for ${basePairSymbol}: ${result.error}`);
-      await db.prepare(`
-        UPDATE PriceAPIEndpoints 
-        SET LastFailureAt = datetime('now'), 
-            ConsecutiveFailures = ConsecutiveFailures + 1,
-            UpdatedAt = datetime('now')
-        WHERE EndpointID = ?
-      `).bind(endpoint.EndpointID).run();
-    }
-  }
-  
-  console.error(`All endpoints failed for ${basePairSymbol}`);
-  return null;
-}
-
 // ============================================
 // MAIN WORKER LOGIC
 // ============================================
@@ -165,9 +83,13 @@ async function fetchAndCachePrices(db, pairs) {
   const priceMap = new Map();
   const fetchPromises = [];
   
+  // All endpoints in one query; attempt counters are written in one batch below
+  const endpointsByPair = await getEndpointsByPair(db);
+  const endpointStats = new EndpointStats();
+  
   for (const [basePairSymbol, relatedPairs] of basePairSymbols) {
     fetchPromises.push(
-      fetchPriceWithFallback(db, basePairSymbol).then(async (result) => {
+      fetchPriceHedged(endpointsByPair.get(basePairSymbol), basePairSymbol, endpointStats).then(async (result) => {
         if (result) {
           priceMap.set(basePairSymbol, result);
           
@@ -194,40 +116,89 @@ async function fetchAndCachePrices(db, pairs) {
   }
   
   await Promise.all(fetchPromises);
+  
+  try {
+    await flushEndpointStats(db, endpointStats);
+  } catch (error) {
+    console.error('Failed to update endpoint stats:', error.message);
+  }
+  
   return priceMap;
 }
 
 /**
- * Get cached price for a pair
+ * Get all cached prices keyed by BasePairSymbol
  */
-async function getCachedPrice(db, pairName) {
-  const basePairSymbol = normalizeBasePairSymbol(pairName);
+async function getCachedPriceMap(db) {
   const result = await db.prepare(`
-    SELECT Price, Provider, FetchedAt FROM CachedPrices
-    WHERE BasePairSymbol = ?
-  `).bind(basePairSymbol).first();
-  
-  return result;
+    SELECT BasePairSymbol, Price, Provider, FetchedAt FROM CachedPrices
+  `).all();
+
+  const prices = new Map();
+  for (const row of result.results || []) {
+    prices.set(row.BasePairSymbol, row);
+  }
+  return prices;
 }
 
 /**
- * Get user's last trade for a specific pair
+ * Get all active trading configs with pair, token and chain details and the
+ * user's last trade for the pair, in a single query.
+ * The last trade lookup uses the same rule as before: latest Trades row
+ * (by CreatedAt) for the user/pair that has a PriceHistory entry.
  */
-async function getLastTrade(db, userId, pairId) {
+async function getActiveConfigs(db) {
   const result = await db.prepare(`
-    SELECT 
-      t.TradeID,
-      t.Action,
-      ph.Price,
-      t.CreatedAt
-    FROM Trades t
-    INNER JOIN PriceHistory ph ON t.PriceID = ph.PriceID
-    WHERE t.UserID = ? AND t.PairID = ?
-    ORDER BY t.CreatedAt DESC
-    LIMIT 1
-  `).bind(userId, pairId).first();
-  
-  return result;
+    SELECT
+      utc.ConfigID,
+      utc.UserID,
+      utc.PairID,
+      utc.TradePercentage,
+      utc.TriggerPercentage,
+      utc.MaxAmount,
+      utc.MinimumAmount,
+      utc.Multiplier,
+      u.TelegramChatID,
+      u.SCWAddress,
+      u.UserWallet,
+      tp.PairName,
+      tp.ChainID,
+      tp.DEXAddress,
+      tp.DEXType,
+      c.ChainName,
+      c.RPCEndpoint,
+      c.ExplorerURL,
+      c.NativeCurrency,
+      bt.TokenID AS BaseTokenID,
+      bt.Symbol AS BaseSymbol,
+      bt.TokenAddress AS BaseTokenAddress,
+      bt.Decimals AS BaseDecimals,
+      qt.TokenID AS QuoteTokenID,
+      qt.Symbol AS QuoteSymbol,
+      qt.TokenAddress AS QuoteTokenAddress,
+      qt.Decimals AS QuoteDecimals,
+      lt.TradeID AS LastTradeID,
+      lt.Action AS LastTradeAction,
+      lph.Price AS LastTradePrice
+    FROM UserTradingConfigs utc
+    INNER JOIN Users u ON utc.UserID = u.UserID
+    INNER JOIN TradingPairs tp ON utc.PairID = tp.PairID
+    INNER JOIN Chains c ON tp.ChainID = c.ChainID
+    INNER JOIN Tokens bt ON tp.BaseTokenID = bt.TokenID
+    INNER JOIN Tokens qt ON tp.QuoteTokenID = qt.TokenID
+    LEFT JOIN Trades lt ON lt.TradeID = (
+      SELECT t.TradeID
+      FROM Trades t
+      INNER JOIN PriceHistory ph ON t.PriceID = ph.PriceID
+      WHERE t.UserID = utc.UserID AND t.PairID = utc.PairID
+      ORDER BY t.CreatedAt DESC
+      LIMIT 1
+    )
+    LEFT JOIN PriceHistory lph ON lt.PriceID = lph.PriceID
+    WHERE utc.IsActive = 1 AND u.IsActive = 1 AND tp.IsActive = 1
+  `).all();
+
+  return result.results || [];
 }
 
 /**
@@ -262,10 +233,13 @@ async function createReferenceTrade(db, userId, pairId, currentPrice) {
   // Using 'BUY' as action to satisfy CHECK constraint (BUY/SELL only)
   // QuantitySent = 0 indicates this is a reference/init trade
   // For a BUY action, we'd be sending quote token and receiving base token
-  await db.prepare(`
-    INSERT INTO Trades (PairID, UserID, PriceID, Action, TokenSent, TokenReceived, QuantitySent, QuantityReceived, TxHash, CreatedAt)
-    VALUES (?, ?, ?, 'BUY', ?, ?, 0, 0, ?, datetime('now'))
-  `).bind(pairId, userId, priceId, pair.QuoteTokenID, pair.BaseTokenID, refTxHash).run();
+  await db.batch([
+    db.prepare(`
+      INSERT INTO Trades (PairID, UserID, PriceID, Action, TokenSent, TokenReceived, QuantitySent, QuantityReceived, TxHash, CreatedAt)
+      VALUES (?, ?, ?, 'BUY', ?, ?, 0, 0, ?, datetime('now'))
+    `).bind(pairId, userId, priceId, pair.QuoteTokenID, pair.BaseTokenID, refTxHash),
+    tradeStatsStatement(db, { userId, pairId, action: 'BUY', quantitySent: 0, quantityReceived: 0 })
+  ]);
 
   return { priceId, txHash: refTxHash };
 }
@@ -302,65 +276,23 @@ function checkTriggerCondition(currentPrice, lastTradePrice, lastTradeAction, tr
   return { triggered: false, percentChange, absChange };
 }
 
-/**
- * Get full config details needed for trade execution
- */
-async function getFullConfigDetails(db, config) {
-  // Get chain details
-  const chain = await db.prepare(`
-    SELECT * FROM Chains WHERE ChainID = ?
-  `).bind(config.ChainID).first();
-  
-  // Get pair details with tokens (including DEXType for routing to correct handler)
-  const pairDetails = await db.prepare(`
-    SELECT
-      tp.*,
-      bt.TokenID AS BaseTokenID,
-      bt.Symbol AS BaseSymbol,
-      bt.TokenAddress AS BaseTokenAddress,
-      bt.Decimals AS BaseDecimals,
-      qt.TokenID AS QuoteTokenID,
-      qt.Symbol AS QuoteSymbol,
-      qt.TokenAddress AS QuoteTokenAddress,
-      qt.Decimals AS QuoteDecimals
-    FROM TradingPairs tp
-    INNER JOIN Tokens bt ON tp.BaseTokenID = bt.TokenID
-    INNER JOIN Tokens qt ON tp.QuoteTokenID = qt.TokenID
-    WHERE tp.PairID = ?
-  `).bind(config.PairID).first();
-  
-  return { chain, pairDetails };
-}
-
 /**
  * Process all user trading configs and send triggered trades to queue
+ *
+ * Set-based: configs (with pair/chain details and last trade) and cached prices
+ * are loaded with two queries per run, and triggers are evaluated in memory.
+ * Each message carries its own trace, forked from the tick's trace.
  */
-async function processConfigs(db, queue) {
+async function processConfigs(db, queue, tickTrace = new TradeTrace()) {
+  const configsStart = Date.now();
+  
   // Get all active user trading configs with full details
-  const configs = await db.prepare(`
-    SELECT
-      utc.ConfigID,
-      utc.UserID,
-      utc.PairID,
-      utc.TradePercentage,
-      utc.TriggerPercentage,
-      utc.MaxAmount,
-      utc.MinimumAmount,
-      utc.Multiplier,
-      u.TelegramChatID,
-      u.SCWAddress,
-      u.UserWallet,
-      tp.PairName,
-      tp.ChainID,
-      tp.DEXAddress,
-      tp.DEXType
-    FROM UserTradingConfigs utc
-    INNER JOIN Users u ON utc.UserID = u.UserID
-    INNER JOIN TradingPairs tp ON utc.PairID = tp.PairID
-    WHERE utc.IsActive = 1 AND u.IsActive = 1 AND tp.IsActive = 1
-  `).all();
+  const [configs, cachedPrices] = await Promise.all([
+    getActiveConfigs(db),
+    getCachedPriceMap(db)
+  ]);
   
-  if (!configs.results || configs.results.length === 0) {
+  if (configs.length === 0) {
     console.log('No active trading configs found');
     return { processed: 0, triggered: 0 };
   }
@@ -369,11 +301,11 @@ async function processConfigs(db, queue) {
   let triggered = 0;
   const queueMessages = [];
   
-  for (const config of configs.results) {
+  for (const config of configs) {
     processed++;
     
     // Get cached price for this pair
-    const cachedPrice = await getCachedPrice(db, config.PairName);
+    const cachedPrice = cachedPrices.get(normalizeBasePairSymbol(config.PairName));
     if (!cachedPrice) {
       console.warn(`[SKIP] No cached price for ${config.PairName}, config ${config.ConfigID}`);
       continue;
@@ -381,11 +313,8 @@ async function processConfigs(db, queue) {
     
     const currentPrice = cachedPrice.Price;
     
-    // Get user's last trade for this pair
-    const lastTrade = await getLastTrade(db, config.UserID, config.PairID);
-    
     // Handle new users without any trades
-    if (!lastTrade) {
+    if (!config.LastTradeID) {
       try {
         const ref = await createReferenceTrade(db, config.UserID, config.PairID, currentPrice);
         console.log(`[NEW USER] Created reference trade for user ${config.UserID}, pair ${config.PairName} at price ${currentPrice} (txHash: ${ref.txHash})`);
@@ -398,13 +327,13 @@ async function processConfigs(db, queue) {
     // Check if trigger condition is met
     const triggerResult = checkTriggerCondition(
       currentPrice,
-      lastTrade?.Price,
-      lastTrade?.Action,
+      config.LastTradePrice,
+      config.LastTradeAction,
       config.TriggerPercentage
     );
     
     if (!triggerResult) {
-      console.warn(`[SKIP] Invalid trigger check for user ${config.UserID}, pair ${config.PairName} (lastTradePrice: ${lastTrade?.Price})`);
+      console.warn(`[SKIP] Invalid trigger check for user ${config.UserID}, pair ${config.PairName} (lastTradePrice: ${config.LastTradePrice})`);
       continue;
     }
     
@@ -413,9 +342,6 @@ async function processConfigs(db, queue) {
       continue;
     }
     
-    // Get full details for execution
-    const { chain, pairDetails } = await getFullConfigDetails(db, config);
-    
     // Build queue message with all data needed for execution
     const queueMessage = {
       // Identifiers
@@ -429,8 +355,8 @@ async function processConfigs(db, queue) {
       
       // Price info
       triggerPrice: currentPrice,
-      lastTradePrice: lastTrade?.Price || null,
-      lastTradeId: lastTrade?.TradeID || null,
+      lastTradePrice: config.LastTradePrice || null,
+      lastTradeId: config.LastTradeID || null,
       triggerPercentage: config.TriggerPercentage,
       actualChangePercent: triggerResult.percentChange,
       
@@ -447,37 +373,40 @@ async function processConfigs(db, queue) {
       
       // Chain details
       chain: {
-        chainId: chain.ChainID,
-        chainName: chain.ChainName,
-        rpcEndpoint: chain.RPCEndpoint,
-        explorerUrl: chain.ExplorerURL,
-        nativeCurrency: chain.NativeCurrency
+        chainId: config.ChainID,
+        chainName: config.ChainName,
+        rpcEndpoint: config.RPCEndpoint,
+        explorerUrl: config.ExplorerURL,
+        nativeCurrency: config.NativeCurrency
       },
       
       // Pair details
       pair: {
-        pairName: pairDetails.PairName,
-        dexAddress: pairDetails.DEXAddress,
-        dexType: pairDetails.DEXType || 'LazaiSwap', // Default for backwards compatibility
+        pairName: config.PairName,
+        dexAddress: config.DEXAddress,
+        dexType: config.DEXType || 'LazaiSwap', // Default for backwards compatibility
         baseToken: {
-          tokenId: pairDetails.BaseTokenID,
-          symbol: pairDetails.BaseSymbol,
-          address: pairDetails.BaseTokenAddress,
-          decimals: pairDetails.BaseDecimals
+          tokenId: config.BaseTokenID,
+          symbol: config.BaseSymbol,
+          address: config.BaseTokenAddress,
+          decimals: config.BaseDecimals
         },
         quoteToken: {
-          tokenId: pairDetails.QuoteTokenID,
-          symbol: pairDetails.QuoteSymbol,
-          address: pairDetails.QuoteTokenAddress,
-          decimals: pairDetails.QuoteDecimals
+          tokenId: config.QuoteTokenID,
+          symbol: config.QuoteSymbol,
+          address: config.QuoteTokenAddress,
+          decimals: config.QuoteDecimals
         }
       },
       
       // Metadata
       queuedAt: new Date().toISOString(),
-      priority: Math.floor(triggerResult.absChange) // Higher change = higher priority
+      priority: Math.floor(triggerResult.absChange), // Higher change = higher priority
+      trace: tickTrace.fork()
     };
     
+    queueMessage.trace.add('configs', configsStart);
+    
     queueMessages.push(queueMessage);
     triggered++;
     
@@ -490,11 +419,12 @@ async function processConfigs(db, queue) {
     const batchSize = 100; // Cloudflare Queue max batch size
     for (let i = 0; i < queueMessages.length; i += batchSize) {
       const batch = queueMessages.slice(i, i + batchSize);
+      const enqueuedAt = Date.now();
       
       // Use sendBatch for multiple messages
       await queue.sendBatch(
         batch.map(msg => ({
-          body: msg,
+          body: { ...msg, trace: { ...msg.trace.toJSON(), enqueuedAt } },
           // Optional: set content type
           contentType: 'json'
         }))
@@ -530,9 +460,12 @@ export default {
         throw new Error('TRADING_QUEUE binding not configured');
       }
       
+      // Trace of this tick, continued per queued trade by the consumer
+      const tickTrace = new TradeTrace({ startedAt: startTime });
+      
       // Step 1: Get all active pairs
       console.log('Step 1: Fetching active pairs...');
-      const pairs = await getActivePairs(db);
+      const pairs = await tickTrace.span('pairs', () => getActivePairs(db));
       console.log(`Found ${pairs.length} active pairs`);
       
       if (pairs.length === 0) {
@@ -542,14 +475,30 @@ export default {
       
       // Step 2: Fetch and cache prices
       console.log('Step 2: Fetching prices...');
-      const priceMap = await fetchAndCachePrices(db, pairs);
+      const priceMap = await tickTrace.span('prices', () => fetchAndCachePrices(db, pairs));
       console.log(`Cached prices for ${priceMap.size} unique base pairs`);
       
       // Step 3: Process configs and send to queue
       console.log('Step 3: Processing trading configs...');
-      const { processed, triggered } = await processConfigs(db, queue);
+      const { processed, triggered } = await processConfigs(db, queue, tickTrace);
       console.log(`Processed ${processed} configs, triggered ${triggered} trades`);
       
+      // Step 4: Roll up new prices into candles and delete expired rows
+      // Failures here must not affect trading - the next run picks up where this one stopped
+      console.log('Step 4: Rolling up price history...');
+      try {
+        const rollup = await rollupPriceHistory(db);
+        console.log(`Rolled up ${rollup.rows} price rows (PriceID ${rollup.fromPriceId} -> ${rollup.toPriceId})`);
+        
+        // Every tick, so deletes keep pace with inserts (a no-op run is a few index lookups)
+        const compacted = await compactPriceHistory(db);
+        if (compacted.rawTicks || compacted.candles || !compacted.complete) {
+          console.log(`Compacted ${compacted.rawTicks} raw ticks, ${compacted.candles} expired candles in ${compacted.rounds} round(s)${compacted.complete ? '' : ' - time budget reached, continuing next run'}`);
+        }
+      } catch (error) {
+        console.error('Price rollup error:', error);
+      }
+      
       const duration = Date.now() - startTime;
       console.log(`=== Producer completed in ${duration}ms ===`);
       
@@ -0,0 +1,266 @@
+/**
+ * Price Fetcher
+ *
+ * Fetches a price from the PriceAPIEndpoints of a base pair with hedged requests:
+ * the best-priority endpoint is asked first, the next one is fired when the
+ * current one fails or has not answered within HEDGE_DELAY_MS, and the first
+ * valid parsed price wins (slower requests are aborted).
+ *
+ * Endpoints whose ConsecutiveFailures reached BREAKER_FAILURE_THRESHOLD are
+ * skipped until BREAKER_COOLDOWN_SECONDS after their LastFailureAt (circuit
+ * breaker). After the cooldown the endpoint gets one attempt again.
+ *
+ * Success/failure counters are collected in EndpointStats and written with one
+ * D1 batch per tick (flushEndpointStats) instead of one UPDATE per attempt.
+ *
+ * Used by: lt-trading-queue, lt-trading-execution, shared/priceHelper.js
+ */
+
+import { parseEndpointPriceStream } from './priceParser.js';
+
+// Per-request timeout
+const REQUEST_TIMEOUT_MS = 5000;
+
+// Fire the next endpoint if the current one has not answered within this budget
+export const HEDGE_DELAY_MS = 750;
+
+// Skip an endpoint after this many consecutive failures...
+export const BREAKER_FAILURE_THRESHOLD = 3;
+
+// ...until this long after its last failure
+export const BREAKER_COOLDOWN_SECONDS = 300;
+
+/**
+ * Load all active endpoints grouped by BasePairSymbol (priority order)
+ * Returns Map<BasePairSymbol, endpoints[]>
+ */
+export async function getEndpointsByPair(db) {
+  const result = await db.prepare(`
+    SELECT * FROM PriceAPIEndpoints
+    WHERE IsActive = 1
+    ORDER BY BasePairSymbol, Priority ASC
+  `).all();
+
+  const endpointsByPair = new Map();
+  for (const endpoint of (result.results || [])) {
+    if (!endpointsByPair.has(endpoint.BasePairSymbol)) {
+      endpointsByPair.set(endpoint.BasePairSymbol, []);
+    }
+    endpointsByPair.get(endpoint.BasePairSymbol).push(endpoint);
+  }
+
+  return endpointsByPair;
+}
+
+/**
+ * Load the active endpoints of one base pair (priority order)
+ */
+export async function getEndpoints(db, basePairSymbol) {
+  const result = await db.prepare(`
+    SELECT * FROM PriceAPIEndpoints
+    WHERE BasePairSymbol = ? AND IsActive = 1
+    ORDER BY Priority ASC
+  `).bind(basePairSymbol).all();
+
+  return result.results || [];
+}
+
+/**
+ * SQLite datetime ('YYYY-MM-DD HH:MM:SS', UTC) -> milliseconds
+ */
+function parseDatetime(datetime) {
+  if (typeof datetime !== 'string') return NaN;
+  return Date.parse(datetime.includes('T') ? datetime : `${datetime.replace(' ', 'T')}Z`);
+}
+
+/**
+ * Whether the circuit breaker currently skips this endpoint
+ */
+export function isCircuitOpen(endpoint, now = Date.now()) {
+  if ((endpoint.ConsecutiveFailures || 0) < BREAKER_FAILURE_THRESHOLD) {
+    return false;
+  }
+
+  const lastFailure = parseDatetime(endpoint.LastFailureAt);
+  if (isNaN(lastFailure)) {
+    return false;
+  }
+
+  return now - lastFailure < BREAKER_COOLDOWN_SECONDS * 1000;
+}
+
+/**
+ * Fetch price from a single API endpoint
+ * The controller aborts the request on timeout, or when another endpoint won.
+ */
+export async function fetchPriceFromEndpoint(endpoint, controller = new AbortController()) {
+  const timeoutId = setTimeout(() => controller.abort(), REQUEST_TIMEOUT_MS);
+
+  try {
+    const response = await fetch(endpoint.EndpointURL, {
+      signal: controller.signal,
+      headers: {
+        'Accept': 'application/json',
+        'User-Agent': 'LazaiTrader/1.0'
+      }
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}`);
+    }
+
+    // Uses ResponseSchema if available, otherwise falls back to provider-based parsing.
+    // Schema paths are read from the body stream without parsing the whole payload.
+    const price = await parseEndpointPriceStream(response.body, endpoint);
+
+    if (price === null || isNaN(price) || price <= 0) {
+      throw new Error('Invalid price value');
+    }
+
+    return { success: true, price, provider: endpoint.Provider };
+  } catch (error) {
+    return { success: false, error: error.message, provider: endpoint.Provider };
+  } finally {
+    clearTimeout(timeoutId);
+  }
+}
+
+/**
+ * Fetch a price from endpoints (priority order) with hedged requests
+ *
+ * @param {Array<Object>} endpoints - PriceAPIEndpoints rows of one base pair
+ * @param {string} basePairSymbol - For logging
+ * @param {EndpointStats|null} stats - Collects attempt outcomes (optional)
+ * @param {Object} options - { hedgeDelayMs, now }
+ * @returns {Promise<Object|null>} { price, provider } or null if every endpoint failed
+ */
+export async function fetchPriceHedged(endpoints, basePairSymbol, stats = null, options = {}) {
+  const { hedgeDelayMs = HEDGE_DELAY_MS, now = Date.now() } = options;
+
+  if (!endpoints || endpoints.length === 0) {
+    console.warn(`No API endpoints configured for ${basePairSymbol}`);
+    return null;
+  }
+
+  const available = endpoints.filter(endpoint => !isCircuitOpen(endpoint, now));
+  if (available.length < endpoints.length) {
+    const skipped = endpoints.filter(endpoint => !available.includes(endpoint)).map(e => e.Provider);
+    console.warn(`Skipping cooling-down endpoints for ${basePairSymbol}: ${skipped.join(', ')}`);
+  }
+
+  if (available.length === 0) {
+    console.error(`All endpoints for ${basePairSymbol} are cooling down`);
+    return null;
+  }
+
+  return new Promise((resolve) => {
+    const controllers = [];
+    let next = 0;
+    let inFlight = 0;
+    let settled = false;
+    let hedgeTimer = null;
+
+    const finish = (result) => {
+      settled = true;
+      clearTimeout(hedgeTimer);
+      controllers.forEach(controller => controller.abort());
+      resolve(result);
+    };
+
+    const launch = () => {
+      clearTimeout(hedgeTimer);
+      if (settled || next >= available.length) return;
+
+      const endpoint = available[next++];
+      const controller = new AbortController();
+      controllers.push(controller);
+      inFlight++;
+
+      fetchPriceFromEndpoint(endpoint, controller).then((result) => {
+        inFlight--;
+
+        // Requests that lost the race are aborted and not counted
+        if (settled) return;
+
+        stats?.record(endpoint, result.success);
+
+        if (result.success) {
+          finish({ price: result.price, provider: result.provider });
+          return;
+        }
+
+        console.warn(`${endpoint.Provider} failed for ${basePairSymbol}: ${result.error}`);
+
+        if (next < available.length) {
+          launch();
+        } else if (inFlight === 0) {
+          console.error(`All endpoints failed for ${basePairSymbol}`);
+          finish(null);
+        }
+      });
+
+      if (next < available.length) {
+        hedgeTimer = setTimeout(launch, hedgeDelayMs);
+      }
+    };
+
+    launch();
+  });
+}
+
+/**
+ * Attempt outcomes per endpoint, written once per tick by flushEndpointStats
+ */
+export class EndpointStats {
+  constructor() {
+    this.endpoints = new Map();
+  }
+
+  record(endpoint, success) {
+    const entry = this.endpoints.get(endpoint.EndpointID) || { successes: 0, failures: 0 };
+    if (success) {
+      entry.successes++;
+    } else {
+      entry.failures++;
+    }
+    this.endpoints.set(endpoint.EndpointID, entry);
+  }
+
+  get size() {
+    return this.endpoints.size;
+  }
+}
+
+/**
+ * Write collected success/failure counters in one D1 batch
+ * A success resets ConsecutiveFailures; otherwise failures are added to it.
+ */
+export async function flushEndpointStats(db, stats) {
+  if (!stats || stats.size === 0) {
+    return 0;
+  }
+
+  const statements = [];
+  for (const [endpointId, { successes, failures }] of stats.endpoints) {
+    if (successes > 0) {
+      statements.push(db.prepare(`
+        UPDATE PriceAPIEndpoints
+        SET LastSuccessAt = datetime('now'),
+            ConsecutiveFailures = 0,
+            UpdatedAt = datetime('now')
+        WHERE EndpointID = ?
+      `).bind(endpointId));
+    } else {
+      statements.push(db.prepare(`
+        UPDATE PriceAPIEndpoints
+        SET LastFailureAt = datetime('now'),
+            ConsecutiveFailures = ConsecutiveFailures + ?,
+            UpdatedAt = datetime('now')
+        WHERE EndpointID = ?
+      `).bind(failures, endpointId));
+    }
+  }
+
+  await db.batch(statements);
+  return statements.length;
+}
@@ -4,7 +4,7 @@
  * Helper functions for fetching and caching token prices with time-based logic
  */
 
-import { parsePrice } from './priceParser.js';
+import { getEndpoints, fetchPriceHedged, EndpointStats, flushEndpointStats } from './priceFetcher.js';
 import tokenMappings from './tokenMappings.json';
 
 /**
@@ -110,90 +110,21 @@ export async function getTokenPriceUSDC(db, tokenSymbol, quoteSymbol = 'USDC', t
 }
 
 /**
- * Fetch price from a single API endpoint
- * (Copied from lt_trader_queue/worker.js for reusability)
+ * Fetch price for a base pair symbol from its endpoints (hedged, see priceFetcher.js)
  */
-async function fetchPriceFromEndpoint(endpoint) {
-  try {
-    const controller = new AbortController();
-    const timeoutId = setTimeout(() => controller.abort(), 5000); // 5s timeout
-
-    const response = await fetch(endpoint.EndpointURL, {
-      signal: controller.signal,
-      headers: {
-        'Accept': 'application/json',
-        'User-Agent': 'LazaiTrader/1.0'
-      }
-    });
-
-    clearTimeout(timeoutId);
-
-    if (!response.ok) {
-      throw new Error(`HTTP ${response.status}`);
-    }
-
-    const data = await response.json();
+async function fetchPriceWithFallback(db, basePairSymbol) {
+  const endpoints = await getEndpoints(db, basePairSymbol);
+  const stats = new EndpointStats();
 
-    // Use ResponseSchema if available, otherwise fall back to provider-based parsing
-    const schemaOrProvider = endpoint.ResponseSchema || endpoint.Provider;
-    const price = parsePrice(data, schemaOrProvider);
+  const result = await fetchPriceHedged(endpoints, basePairSymbol, stats);
 
-    if (price === null || isNaN(price) || price <= 0) {
-      throw new Error('Invalid price value');
-    }
-
-    return { success: true, price, provider: endpoint.Provider };
+  try {
+    await flushEndpointStats(db, stats);
   } catch (error) {
-    return { success: false, error: error.message, provider: endpoint.Provider };
-  }
-}
-
-/**
- * Fetch price for a base pair symbol using fallback endpoints
- * (Copied from lt_trader_queue/worker.js for reusability)
- */
-async function fetchPriceWithFallback(db, basePairSymbol) {
-  // Get all active endpoints for this pair, ordered by priority
-  const endpoints = await db.prepare(`
-    SELECT * FROM PriceAPIEndpoints
-    WHERE BasePairSymbol = ? AND IsActive = 1
-    ORDER BY Priority ASC
-  `).bind(basePairSymbol).all();
-
-  if (!endpoints.results || endpoints.results.length === 0) {
-    console.warn(`No API endpoints configured for ${basePairSymbol}`);
-    return null;
+    console.error('Failed to update endpoint stats:', error.message);
   }
 
-  for (const endpoint of endpoints.results) {
-    const result = await fetchPriceFromEndpoint(endpoint);
-
-    if (result.success) {
-      // Update success timestamp and reset failure count
-      await db.prepare(`
-        UPDATE PriceAPIEndpoints
-        SET LastSuccessAt = datetime('now'),
-            ConsecutiveFailures = 0,
-            UpdatedAt = datetime('now')
-        WHERE EndpointID = ?
-      `).bind(endpoint.EndpointID).run();
-
-      return { price: result.price, provider: result.provider };
-    } else {
-      // Update failure info
-      console.warn(`${endpoint.Provider} failed for ${basePairSymbol}: ${result.error}`);
-      await db.prepare(`
-        UPDATE PriceAPIEndpoints
-        SET LastFailureAt = datetime('now'),
-            ConsecutiveFailures = ConsecutiveFailures + 1,
-            UpdatedAt = datetime('now')
-        WHERE EndpointID = ?
-      `).bind(endpoint.EndpointID).run();
-    }
-  }
-
-  console.error(`All endpoints failed for ${basePairSymbol}`);
-  return null;
+  return result;
 }
 
 /**
@@ -5,46 +5,167 @@
  * Supports various response formats without code changes.
  */
 
+// Compiled schemas by cache key ('endpoint:<EndpointID>' or the schema text)
+const compiledSchemas = new Map();
+
+// Compiled schemas for schema objects (tests, validateSchema)
+const compiledSchemaObjects = new WeakMap();
+
+// Upper bound for text-keyed entries (endpoint entries are bounded by the table)
+const MAX_CACHED_SCHEMAS = 500;
+
 /**
- * Parse price from API response using schema configuration
+ * Compile a ResponseSchema (JSON string or object) or legacy provider name
  *
- * @param {Object} data - The JSON response from the API
- * @param {string|Object} schemaOrProvider - Either ResponseSchema JSON string or legacy provider name
- * @returns {number|null} - Parsed price or null if parsing fails
+ * Schemas become { pricePath, steps, extract } where steps are the pre-split
+ * path parts and extract(data) is the accessor. Provider names become
+ * { provider }. Invalid schemas become { error }.
+ *
+ * Path syntax:
+ * - Simple paths: "price"
+ * - Nested paths: "data.amount"
+ * - Dynamic keys: "*.usd" (gets first key's value, then navigates to 'usd')
+ * - Array indices: "pairs.0.priceUsd"
+ *
+ * @param {string|Object} schemaOrProvider - ResponseSchema or legacy provider name
+ * @returns {Object} - Compiled schema
  */
-export function parsePrice(data, schemaOrProvider) {
-  try {
-    // Handle legacy provider-based parsing for backwards compatibility
-    if (typeof schemaOrProvider === 'string' && !schemaOrProvider.startsWith('{')) {
-      return parsePriceLegacy(schemaOrProvider, data);
-    }
+export function compileSchema(schemaOrProvider) {
+  // Handle legacy provider-based parsing for backwards compatibility
+  if (typeof schemaOrProvider === 'string' && !schemaOrProvider.startsWith('{')) {
+    return { provider: schemaOrProvider };
+  }
 
-    // Parse schema if it's a JSON string
-    const schema = typeof schemaOrProvider === 'string'
+  let schema;
+  try {
+    schema = typeof schemaOrProvider === 'string'
       ? JSON.parse(schemaOrProvider)
       : schemaOrProvider;
+  } catch (e) {
+    return { error: `Invalid schema JSON: ${e.message}` };
+  }
 
-    if (!schema || !schema.pricePath) {
-      console.error('[PRICE PARSER] Invalid schema: missing pricePath');
-      return null;
+  if (!schema || !schema.pricePath) {
+    return { error: 'Invalid schema: missing pricePath' };
+  }
+
+  const steps = schema.pricePath.split('.').map(part => {
+    if (part === '*') return { kind: 'any' };
+    if (/^\d+$/.test(part)) return { kind: 'index', index: parseInt(part, 10) };
+    return { kind: 'key', key: part };
+  });
+
+  return { pricePath: schema.pricePath, steps, extract: compilePath(steps) };
+}
+
+/**
+ * Build the accessor for pre-split path steps
+ */
+function compilePath(steps) {
+  return function extract(obj) {
+    let current = obj;
+
+    for (const step of steps) {
+      if (current === null || current === undefined) {
+        return null;
+      }
+
+      if (step.kind === 'any') {
+        // Dynamic key: first key's value
+        const keys = Object.keys(current);
+        if (keys.length === 0) return null;
+        current = current[keys[0]];
+      } else if (step.kind === 'index') {
+        if (!Array.isArray(current) || step.index >= current.length) {
+          return null;
+        }
+        current = current[step.index];
+      } else {
+        if (!Object.prototype.hasOwnProperty.call(current, step.key)) {
+          return null;
+        }
+        current = current[step.key];
+      }
     }
 
-    // Parse using schema path
-    const price = extractValueByPath(data, schema.pricePath);
+    return current;
+  };
+}
 
-    if (price === null || price === undefined) {
-      console.error(`[PRICE PARSER] Failed to extract price using path: ${schema.pricePath}`);
-      return null;
+/**
+ * Get the compiled schema for schemaOrProvider, compiling it on first use
+ *
+ * @param {string|Object} schemaOrProvider - ResponseSchema or legacy provider name
+ * @param {string} cacheKey - Stable key (e.g. per endpoint); the schema text is the version
+ */
+export function getCompiledSchema(schemaOrProvider, cacheKey = null) {
+  if (schemaOrProvider && typeof schemaOrProvider === 'object') {
+    let compiled = compiledSchemaObjects.get(schemaOrProvider);
+    if (!compiled) {
+      compiled = compileSchema(schemaOrProvider);
+      compiledSchemaObjects.set(schemaOrProvider, compiled);
     }
+    return compiled;
+  }
+
+  const key = cacheKey ?? schemaOrProvider;
+  const cached = compiledSchemas.get(key);
+
+  // A changed ResponseSchema for the same endpoint is a new version
+  if (cached && cached.source === schemaOrProvider) {
+    return cached.compiled;
+  }
+
+  if (!cached && compiledSchemas.size >= MAX_CACHED_SCHEMAS) {
+    compiledSchemas.clear();
+  }
+
+  const compiled = compileSchema(schemaOrProvider);
+  compiledSchemas.set(key, { source: schemaOrProvider, compiled });
+  return compiled;
+}
+
+/**
+ * Check an extracted value and convert it to a price
+ */
+function toPrice(value, compiled) {
+  if (value === null || value === undefined) {
+    console.error(`[PRICE PARSER] Failed to extract price using path: ${compiled.pricePath}`);
+    return null;
+  }
+
+  const numericPrice = parseFloat(value);
+
+  if (isNaN(numericPrice) || numericPrice <= 0) {
+    console.error(`[PRICE PARSER] Invalid price value: ${value}`);
+    return null;
+  }
+
+  return numericPrice;
+}
+
+/**
+ * Parse price from API response using schema configuration
+ *
+ * @param {Object} data - The JSON response from the API
+ * @param {string|Object} schemaOrProvider - Either ResponseSchema JSON string or legacy provider name
+ * @param {string} cacheKey - Optional compiled-schema cache key (see endpointCacheKey)
+ * @returns {number|null} - Parsed price or null if parsing fails
+ */
+export function parsePrice(data, schemaOrProvider, cacheKey = null) {
+  try {
+    const compiled = getCompiledSchema(schemaOrProvider, cacheKey);
 
-    const numericPrice = parseFloat(price);
+    if (compiled.provider) {
+      return parsePriceLegacy(compiled.provider, data);
+    }
 
-    if (isNaN(numericPrice) || numericPrice <= 0) {
-      console.error(`[PRICE PARSER] Invalid price value: ${price}`);
+    if (compiled.error) {
+      console.error(`[PRICE PARSER] ${compiled.error}`);
       return null;
     }
 
-    return numericPrice;
+    return toPrice(compiled.extract(data), compiled);
 
   } catch (e) {
     console.error(`[PRICE PARSER] Parsing error: ${e.message}`);
@@ -53,57 +174,259 @@ export function parsePrice(data, schemaOrProvider) {
 }
 
 /**
- * Extract value from nested object using dot-notation path
- * Supports:
- * - Simple paths: "price"
- * - Nested paths: "data.amount"
- * - Dynamic keys: "*.usd" (gets first key's value, then navigates to 'usd')
- * - Array indices: "pairs.0.priceUsd"
+ * Compiled-schema cache key of a PriceAPIEndpoints row
+ */
+export function endpointCacheKey(endpoint) {
+  return `endpoint:${endpoint.EndpointID}`;
+}
+
+/**
+ * Parse price for a PriceAPIEndpoints row (ResponseSchema, else Provider)
+ */
+export function parseEndpointPrice(data, endpoint) {
+  return parsePrice(data, endpoint.ResponseSchema || endpoint.Provider, endpointCacheKey(endpoint));
+}
+
+/**
+ * Parse price for a PriceAPIEndpoints row straight from a response body stream
  *
- * @param {Object} obj - The object to extract from
- * @param {string} path - The path to the value
- * @returns {any|null} - The extracted value or null
+ * Schema paths are matched while the body is scanned and reading stops at the
+ * price field, so large payloads are never fully decoded into objects.
+ * Legacy providers read the whole body. If a key repeats within one object the
+ * first occurrence is used (JSON.parse would keep the last).
+ *
+ * @param {ReadableStream} stream - Response body (e.g. response.body)
+ * @param {Object} endpoint - PriceAPIEndpoints row
+ * @returns {Promise<number|null>} - Parsed price or null if parsing fails
  */
-function extractValueByPath(obj, path) {
-  if (!obj || !path) return null;
+export async function parseEndpointPriceStream(stream, endpoint) {
+  const schemaOrProvider = endpoint.ResponseSchema || endpoint.Provider;
+  const compiled = getCompiledSchema(schemaOrProvider, endpointCacheKey(endpoint));
 
-  const parts = path.split('.');
-  let current = obj;
+  if (compiled.provider || compiled.error) {
+    const text = await new Response(stream).text();
+    return parsePrice(JSON.parse(text), schemaOrProvider, endpointCacheKey(endpoint));
+  }
 
-  for (let i = 0; i < parts.length; i++) {
-    const part = parts[i];
+  const scanner = new PathScanner(compiled.steps);
+  const reader = stream.getReader();
+  const decoder = new TextDecoder();
 
-    if (current === null || current === undefined) {
-      return null;
+  try {
+    while (!scanner.done) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      scanner.write(decoder.decode(value, { stream: true }));
     }
+  } finally {
+    // Stop downloading the rest of the body
+    reader.cancel().catch(() => {});
+  }
+
+  if (scanner.error) {
+    console.error(`[PRICE PARSER] Parsing error: ${scanner.error}`);
+    return null;
+  }
+
+  return toPrice(scanner.value, compiled);
+}
+
+// PathScanner modes
+const VALUE = 0;          // expecting a value
+const VALUE_OR_END = 1;   // after '[': value or ']'
+const KEY_OR_END = 2;     // after '{': key or '}'
+const KEY = 3;            // after ',' in an object
+const COLON = 4;          // after a key
+const STRING = 5;         // inside a string
+const LITERAL = 6;        // inside a number / true / false / null
+const AFTER_VALUE = 7;    // expecting ',' or the end of the container
+
+/**
+ * Incremental JSON scanner that stops at the first value found at a path
+ *
+ * Tracks the current key / index of every open container and only keeps the
+ * text of keys and of the matching value. A container found at the path
+ * yields null (a price must be a scalar).
+ */
+class PathScanner {
+  constructor(steps) {
+    this.steps = steps;
+    this.stack = [];
+    this.mode = VALUE;
+    this.buffer = '';
+    this.escaped = false;
+    this.stringIsKey = false;
+    this.capture = false;
+    this.done = false;
+    this.value = null;
+    this.error = null;
+  }
+
+  matches() {
+    if (this.stack.length !== this.steps.length) return false;
+
+    for (let i = 0; i < this.steps.length; i++) {
+      const step = this.steps[i];
+      const frame = this.stack[i];
 
-    // Handle dynamic key (wildcard)
-    if (part === '*') {
-      const keys = Object.keys(current);
-      if (keys.length === 0) return null;
-      current = current[keys[0]]; // Get first key's value
-      continue;
+      if (step.kind === 'any') {
+        // First key of an object (or first element, as Object.keys does for arrays)
+        if ((frame.array ? frame.index : frame.count) !== 0) return false;
+      } else if (step.kind === 'index') {
+        if (!frame.array || frame.index !== step.index) return false;
+      } else if (frame.array || frame.key !== step.key) {
+        return false;
+      }
     }
 
-    // Handle array index
-    if (/^\d+$/.test(part)) {
-      const index = parseInt(part, 10);
-      if (!Array.isArray(current) || index >= current.length) {
-        return null;
+    return true;
+  }
+
+  finish(value) {
+    this.value = value;
+    this.done = true;
+  }
+
+  fail(message) {
+    this.error = message;
+    this.done = true;
+  }
+
+  endValue() {
+    if (this.stack.length === 0) {
+      this.finish(null);
+      return;
+    }
+    this.mode = AFTER_VALUE;
+  }
+
+  startValue(ch) {
+    if (ch === '{' || ch === '[') {
+      if (this.matches()) {
+        this.finish(null);
+        return;
       }
-      current = current[index];
-      continue;
+      this.stack.push(ch === '[' ? { array: true, index: 0 } : { array: false, key: null, count: 0 });
+      this.mode = ch === '[' ? VALUE_OR_END : KEY_OR_END;
+    } else if (ch === '"') {
+      this.capture = this.matches();
+      this.stringIsKey = false;
+      this.buffer = '';
+      this.mode = STRING;
+    } else {
+      this.capture = this.matches();
+      this.buffer = ch;
+      this.mode = LITERAL;
     }
+  }
 
-    // Handle regular property
-    if (!current.hasOwnProperty(part)) {
-      return null;
+  closeContainer() {
+    this.stack.pop();
+    // Ends the scan (no match) when the top-level value closes
+    this.endValue();
+  }
+
+  write(text) {
+    for (let i = 0; i < text.length && !this.done; i++) {
+      const ch = text[i];
+
+      switch (this.mode) {
+        case STRING:
+          if (this.escaped) {
+            this.escaped = false;
+          } else if (ch === '\\') {
+            this.escaped = true;
+          } else if (ch === '"') {
+            if (this.stringIsKey) {
+              this.stack[this.stack.length - 1].key = JSON.parse(`"${this.buffer}"`);
+              this.mode = COLON;
+            } else if (this.capture) {
+              this.finish(JSON.parse(`"${this.buffer}"`));
+            } else {
+              this.endValue();
+            }
+            break;
+          }
+          if (this.stringIsKey || this.capture) {
+            this.buffer += ch;
+          }
+          break;
+
+        case LITERAL:
+          if (ch === ',' || ch === '}' || ch === ']' || ch <= ' ') {
+            if (this.capture) {
+              try {
+                this.finish(JSON.parse(this.buffer));
+              } catch (e) {
+                this.fail(`Invalid literal: ${this.buffer}`);
+              }
+              break;
+            }
+            this.endValue();
+            i--; // Re-read the delimiter
+          } else if (this.capture) {
+            this.buffer += ch;
+          }
+          break;
+
+        default:
+          if (ch <= ' ') break;
+          this.step(ch);
+      }
     }
 
-    current = current[part];
+    return this.done;
   }
 
-  return current;
+  step(ch) {
+    const frame = this.stack[this.stack.length - 1];
+
+    switch (this.mode) {
+      case VALUE:
+        this.startValue(ch);
+        break;
+
+      case VALUE_OR_END:
+        if (ch === ']') this.closeContainer();
+        else this.startValue(ch);
+        break;
+
+      case KEY_OR_END:
+      case KEY:
+        if (ch === '}' && this.mode === KEY_OR_END) {
+          this.closeContainer();
+        } else if (ch === '"') {
+          this.stringIsKey = true;
+          this.capture = false;
+          this.buffer = '';
+          this.mode = STRING;
+        } else {
+          this.fail(`Unexpected '${ch}' where a key was expected`);
+        }
+        break;
+
+      case COLON:
+        if (ch === ':') this.mode = VALUE;
+        else this.fail(`Unexpected '${ch}' where ':' was expected`);
+        break;
+
+      case AFTER_VALUE:
+        if (ch === ',') {
+          if (frame.array) {
+            frame.index++;
+            this.mode = VALUE;
+          } else {
+            frame.count++;
+            this.mode = KEY;
+          }
+        } else if (ch === (frame.array ? ']' : '}')) {
+          this.closeContainer();
+        } else {
+          this.fail(`Unexpected '${ch}' after a value`);
+        }
+        break;
+    }
+  }
 }
 
 /**
@@ -0,0 +1,266 @@
+/**
+ * PriceHistory Rollups
+ *
+ * Maintains 1m / 1h / 1d OHLC candles per PairID (PriceCandles) incrementally from
+ * new PriceHistory rows, expires raw ticks and fine candles past their retention,
+ * and lets readers pick a resolution for a time range.
+ *
+ * Writer: lt-trading-queue (after each price fetch)
+ * Readers: lt-tg-chart
+ */
+
+const ROLLUP_NAME = 'PriceCandles';
+
+// Max PriceHistory rows rolled up per run (catches up gradually after deploy)
+const ROLLUP_BATCH_SIZE = 10000;
+
+// Raw ticks older than this are deleted once rolled up (unless a trade references them)
+export const RAW_RETENTION_DAYS = 7;
+
+// Max rows deleted per table per DELETE statement
+const COMPACTION_BATCH_SIZE = 5000;
+
+// Time a compaction run may spend repeating full batches (the rest is left for the next run)
+const COMPACTION_TIME_BUDGET_MS = 5000;
+
+/**
+ * Candle resolutions, finest first
+ * bucket: SQLite expression mapping PriceHistory.CreatedAt to the candle start
+ * retentionDays: candles older than this are deleted (null = kept forever)
+ */
+export const RESOLUTIONS = [
+  { name: '1m', seconds: 60, bucket: `strftime('%Y-%m-%d %H:%M:00', CreatedAt)`, retentionDays: 30 },
+  { name: '1h', seconds: 3600, bucket: `strftime('%Y-%m-%d %H:00:00', CreatedAt)`, retentionDays: 365 },
+  { name: '1d', seconds: 86400, bucket: `strftime('%Y-%m-%d 00:00:00', CreatedAt)`, retentionDays: null }
+];
+
+/**
+ * Build the upsert that folds PriceHistory rows (LastPriceID, UpToPriceID] into
+ * candles of one resolution. Open/Close come from the first/last PriceID of each
+ * bucket, so batches can be applied in any split without changing the result.
+ */
+function buildRollupStatement(db, resolution, fromPriceId, toPriceId) {
+  return db.prepare(`
+    WITH batch AS (
+      SELECT PairID, PriceID, Price, ${resolution.bucket} AS BucketStart
+      FROM PriceHistory
+      WHERE PriceID > ? AND PriceID <= ?
+    ),
+    agg AS (
+      SELECT
+        PairID,
+        BucketStart,
+        MAX(Price) AS High,
+        MIN(Price) AS Low,
+        COUNT(*) AS SampleCount,
+        MIN(PriceID) AS FirstPriceID,
+        MAX(PriceID) AS LastPriceID
+      FROM batch
+      GROUP BY PairID, BucketStart
+    )
+    INSERT INTO PriceCandles (PairID, Resolution, BucketStart, Open, High, Low, Close, SampleCount, FirstPriceID, LastPriceID)
+    SELECT
+      a.PairID,
+      '${resolution.name}',
+      a.BucketStart,
+      (SELECT Price FROM PriceHistory WHERE PriceID = a.FirstPriceID),
+      a.High,
+      a.Low,
+      (SELECT Price FROM PriceHistory WHERE PriceID = a.LastPriceID),
+      a.SampleCount,
+      a.FirstPriceID,
+      a.LastPriceID
+    FROM agg a
+    WHERE true
+    ON CONFLICT(PairID, Resolution, BucketStart) DO UPDATE SET
+      Open = CASE WHEN excluded.FirstPriceID < FirstPriceID THEN excluded.Open ELSE Open END,
+      Close = CASE WHEN excluded.LastPriceID > LastPriceID THEN excluded.Close ELSE Close END,
+      High = MAX(High, excluded.High),
+      Low = MIN(Low, excluded.Low),
+      SampleCount = SampleCount + excluded.SampleCount,
+      FirstPriceID = MIN(FirstPriceID, excluded.FirstPriceID),
+      LastPriceID = MAX(LastPriceID, excluded.LastPriceID)
+  `).bind(fromPriceId, toPriceId);
+}
+
+/**
+ * Roll up PriceHistory rows added since the last run into PriceCandles
+ *
+ * All resolutions and the progress marker are written in one D1 batch (a single
+ * transaction), so a failed run is simply retried from the same PriceID.
+ *
+ * @param {Object} db - D1 database instance
+ * @returns {Promise<Object>} { rows, fromPriceId, toPriceId }
+ */
+export async function rollupPriceHistory(db, batchSize = ROLLUP_BATCH_SIZE) {
+  const state = await db.prepare(`
+    SELECT
+      (SELECT LastPriceID FROM PriceRollupState WHERE Name = ?) AS LastPriceID,
+      (SELECT MAX(PriceID) FROM PriceHistory) AS MaxPriceID
+  `).bind(ROLLUP_NAME).first();
+
+  const fromPriceId = state?.LastPriceID || 0;
+  const maxPriceId = state?.MaxPriceID || 0;
+
+  if (maxPriceId <= fromPriceId) {
+    return { rows: 0, fromPriceId, toPriceId: fromPriceId };
+  }
+
+  const toPriceId = Math.min(maxPriceId, fromPriceId + batchSize);
+
+  await db.batch([
+    ...RESOLUTIONS.map(resolution => buildRollupStatement(db, resolution, fromPriceId, toPriceId)),
+    db.prepare(`
+      INSERT INTO PriceRollupState (Name, LastPriceID, UpdatedAt)
+      VALUES (?, ?, datetime('now'))
+      ON CONFLICT(Name) DO UPDATE SET
+        LastPriceID = excluded.LastPriceID,
+        UpdatedAt = excluded.UpdatedAt
+    `).bind(ROLLUP_NAME, toPriceId)
+  ]);
+
+  return { rows: toPriceId - fromPriceId, fromPriceId, toPriceId };
+}
+
+/**
+ * Delete raw ticks and candles past their retention window
+ *
+ * Raw PriceHistory rows are only deleted once rolled up, and never when a trade
+ * references them (Trades.PriceID is the executed trade price).
+ * Each DELETE removes at most COMPACTION_BATCH_SIZE rows and is repeated until it
+ * removes fewer (or the time budget runs out), so deletes keep up with inserts
+ * however many pairs are tracked. With nothing expired a run is a few index
+ * lookups, cheap enough for every producer tick.
+ *
+ * @param {Object} db - D1 database instance
+ * @param {number} timeBudgetMs - Stop repeating full batches after this long
+ * @returns {Promise<Object>} { rawTicks, candles, rounds, complete }
+ */
+export async function compactPriceHistory(db, timeBudgetMs = COMPACTION_TIME_BUDGET_MS) {
+  const jobs = [{
+    kind: 'rawTicks',
+    statement: db.prepare(`
+      DELETE FROM PriceHistory
+      WHERE PriceID IN (
+        SELECT ph.PriceID
+        FROM PriceHistory ph
+        WHERE ph.PriceID <= (SELECT LastPriceID FROM PriceRollupState WHERE Name = ?)
+          AND ph.CreatedAt < datetime('now', ?)
+          AND NOT EXISTS (SELECT 1 FROM Trades t WHERE t.PriceID = ph.PriceID)
+        ORDER BY ph.CreatedAt
+        LIMIT ?
+      )
+    `).bind(ROLLUP_NAME, `-${RAW_RETENTION_DAYS} days`, COMPACTION_BATCH_SIZE)
+  }];
+
+  for (const resolution of RESOLUTIONS) {
+    if (resolution.retentionDays === null) continue;
+    jobs.push({
+      kind: 'candles',
+      statement: db.prepare(`
+        DELETE FROM PriceCandles
+        WHERE rowid IN (
+          SELECT rowid FROM PriceCandles
+          WHERE Resolution = ? AND BucketStart < datetime('now', ?)
+          LIMIT ?
+        )
+      `).bind(resolution.name, `-${resolution.retentionDays} days`, COMPACTION_BATCH_SIZE)
+    });
+  }
+
+  const deadline = Date.now() + timeBudgetMs;
+  const totals = { rawTicks: 0, candles: 0 };
+  let pending = jobs;
+  let rounds = 0;
+
+  do {
+    const results = await db.batch(pending.map(job => job.statement));
+    rounds++;
+    // A full batch means more rows may be waiting
+    pending = pending.filter((job, i) => {
+      const changes = results[i].meta?.changes || 0;
+      totals[job.kind] += changes;
+      return changes >= COMPACTION_BATCH_SIZE;
+    });
+  } while (pending.length > 0 && Date.now() < deadline);
+
+  return { ...totals, rounds, complete: pending.length === 0 };
+}
+
+/**
+ * Pick the candle resolution for a time range
+ *
+ * Returns the finest resolution that still covers the start of the range (given
+ * retention) and yields at most maxPoints candles, falling back to the coarsest.
+ *
+ * @param {Date|string|number} from - Range start
+ * @param {Date|string|number} to - Range end
+ * @param {number} maxPoints - Max candles per pair the reader wants
+ * @returns {string} '1m', '1h' or '1d'
+ */
+export function chooseResolution(from, to, maxPoints = 500, now = Date.now()) {
+  const fromMs = new Date(from).getTime();
+  const toMs = new Date(to).getTime();
+  const rangeSeconds = Math.max((toMs - fromMs) / 1000, 0);
+
+  for (const resolution of RESOLUTIONS) {
+    const retained = resolution.retentionDays === null ||
+      fromMs >= now - resolution.retentionDays * 86400 * 1000;
+    if (retained && rangeSeconds / resolution.seconds <= maxPoints) {
+      return resolution.name;
+    }
+  }
+
+  return RESOLUTIONS[RESOLUTIONS.length - 1].name;
+}
+
+/**
+ * Get OHLC candles for pairs in a time range at a chosen (or automatic) resolution
+ *
+ * @param {Object} db - D1 database instance
+ * @param {number[]} pairIds - PairIDs to load
+ * @param {string} from - Range start ('YYYY-MM-DD HH:MM:SS')
+ * @param {string} to - Range end ('YYYY-MM-DD HH:MM:SS')
+ * @param {Object} options - { resolution, maxPoints }
+ * @returns {Promise<Object>} { resolution, candles: [{ PairID, BucketStart, Open, High, Low, Close }] }
+ */
+export async function getPriceCandles(db, pairIds, from, to, options = {}) {
+  const resolution = options.resolution || chooseResolution(toUTC(from), toUTC(to), options.maxPoints);
+
+  if (!pairIds || pairIds.length === 0) {
+    return { resolution, candles: [] };
+  }
+
+  const placeholders = pairIds.map(() => '?').join(', ');
+  const result = await db.prepare(`
+    SELECT PairID, BucketStart, Open, High, Low, Close
+    FROM PriceCandles
+    WHERE Resolution = ?
+      AND PairID IN (${placeholders})
+      AND BucketStart >= ?
+      AND BucketStart <= ?
+    ORDER BY PairID, BucketStart
+  `).bind(resolution, ...pairIds, bucketFloor(from, resolution), to).all();
+
+  return { resolution, candles: result.results || [] };
+}
+
+/**
+ * SQLite datetime ('YYYY-MM-DD HH:MM:SS', UTC) -> ISO string for Date parsing
+ */
+function toUTC(datetime) {
+  return typeof datetime === 'string' && !datetime.includes('T')
+    ? `${datetime.replace(' ', 'T')}Z`
+    : datetime;
+}
+
+/**
+ * Start of the candle that contains a SQLite datetime, so the first bucket of
+ * the range is included
+ */
+function bucketFloor(datetime, resolution) {
+  if (typeof datetime !== 'string') return datetime;
+  if (resolution === '1d') return `${datetime.slice(0, 10)} 00:00:00`;
+  if (resolution === '1h') return `${datetime.slice(0, 13)}:00:00`;
+  return `${datetime.slice(0, 16)}:00`;
+}
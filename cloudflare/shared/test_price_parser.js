@@ -2,9 +2,10 @@
  * Test script for price parser with real API response samples
  *
  * Run with: node test_price_parser.js
+ * Skip the micro-benchmark: node test_price_parser.js --no-bench
  */
 
-import { parsePrice, validateSchema } from './priceParser.js';
+import { parsePrice, validateSchema, parseEndpointPrice, parseEndpointPriceStream } from './priceParser.js';
 
 // Sample API responses (from user's test data)
 const testCases = [
@@ -69,12 +70,42 @@ const testCases = [
   }
 ];
 
+/**
+ * Response body as a stream of chunkSize-byte chunks
+ */
+function toStream(response, chunkSize) {
+  const bytes = new TextEncoder().encode(typeof response === 'string' ? response : JSON.stringify(response));
+  let offset = 0;
+  return new ReadableStream({
+    pull(controller) {
+      if (offset >= bytes.length) {
+        controller.close();
+        return;
+      }
+      controller.enqueue(bytes.slice(offset, offset + chunkSize));
+      offset += chunkSize;
+    }
+  });
+}
+
+/**
+ * parseEndpointPriceStream for every chunk size from 1 byte to the whole body
+ */
+async function streamPrices(response, endpoint) {
+  const length = JSON.stringify(response).length;
+  const prices = new Set();
+  for (let chunkSize = 1; chunkSize <= length; chunkSize++) {
+    prices.add(await parseEndpointPriceStream(toStream(response, chunkSize), endpoint));
+  }
+  return [...prices];
+}
+
 console.log('=== Price Parser Test Suite ===\n');
 
 let passed = 0;
 let failed = 0;
 
-for (const testCase of testCases) {
+for (const [index, testCase] of testCases.entries()) {
   console.log(`Testing: ${testCase.name}`);
 
   // Test with schema
@@ -98,7 +129,19 @@ for (const testCase of testCases) {
     console.log(`  Error: ${validation.error}`);
   }
 
-  const testPassed = schemaMatches && providerMatches && validation.valid;
+  // Compiled (cached per endpoint) and streaming parsing
+  const endpoint = { EndpointID: index + 1, Provider: testCase.provider, ResponseSchema: JSON.stringify(testCase.schema) };
+  const priceFromEndpoint = parseEndpointPrice(testCase.response, endpoint);
+  const cachedMatches = Math.abs(parseEndpointPrice(testCase.response, endpoint) - testCase.expectedPrice) < 0.0001 &&
+    Math.abs(priceFromEndpoint - testCase.expectedPrice) < 0.0001;
+
+  const streamedPrices = await streamPrices(testCase.response, endpoint);
+  const streamMatches = streamedPrices.length === 1 && Math.abs(streamedPrices[0] - testCase.expectedPrice) < 0.0001;
+
+  console.log(`  Compiled endpoint parsing: ${priceFromEndpoint}`);
+  console.log(`  Streaming parsing (all chunk sizes): ${streamedPrices.join(', ')}`);
+
+  const testPassed = schemaMatches && providerMatches && validation.valid && cachedMatches && streamMatches;
 
   if (testPassed) {
     console.log(`  ✓ PASSED\n`);
@@ -109,9 +152,67 @@ for (const testCase of testCases) {
   }
 }
 
-console.log('=== Test Results ===');
-console.log(`Passed: ${passed}/${testCases.length}`);
-console.log(`Failed: ${failed}/${testCases.length}`);
+// Edge cases for the compiled and streaming paths
+const edgeCases = [
+  {
+    name: 'Changed ResponseSchema for the same endpoint',
+    run: () => {
+      const endpoint = { EndpointID: 100, Provider: 'custom', ResponseSchema: '{"pricePath":"a"}' };
+      const first = parseEndpointPrice({ a: '1', b: '2' }, endpoint);
+      endpoint.ResponseSchema = '{"pricePath":"b"}';
+      return first === 1 && parseEndpointPrice({ a: '1', b: '2' }, endpoint) === 2;
+    }
+  },
+  {
+    name: 'Stream: escaped strings, nested skips and late match',
+    run: async () => {
+      const body = '{"note":"a \\"quoted\\" } ] text","skip":[{"price":"9"},[1,2,{"x":null}]],"data":{"amount":"42.5"}}';
+      const endpoint = { EndpointID: 101, Provider: 'custom', ResponseSchema: '{"pricePath":"data.amount"}' };
+      const results = [];
+      for (let chunkSize = 1; chunkSize <= body.length; chunkSize++) {
+        results.push(await parseEndpointPriceStream(toStream(body, chunkSize), endpoint));
+      }
+      return results.every(price => price === 42.5);
+    }
+  },
+  {
+    name: 'Stream: numeric value, wildcard on second key is ignored',
+    run: async () => {
+      const endpoint = { EndpointID: 102, Provider: 'custom', ResponseSchema: '{"pricePath":"*.usd"}' };
+      return await parseEndpointPriceStream(toStream('{"eth":{"usd":3000.5e0},"btc":{"usd":1}}', 3), endpoint) === 3000.5;
+    }
+  },
+  {
+    name: 'Stream: missing path, object at path, out-of-range index',
+    run: async () => {
+      const missing = { EndpointID: 103, Provider: 'custom', ResponseSchema: '{"pricePath":"data.price"}' };
+      const index = { EndpointID: 104, Provider: 'custom', ResponseSchema: '{"pricePath":"pairs.1.priceUsd"}' };
+      return await parseEndpointPriceStream(toStream({ data: { amount: '1' } }, 4), missing) === null &&
+        await parseEndpointPriceStream(toStream({ data: { price: { v: 1 } } }, 4), missing) === null &&
+        await parseEndpointPriceStream(toStream({ pairs: [{ priceUsd: '1' }] }, 4), index) === null;
+    }
+  }
+];
+
+for (const edgeCase of edgeCases) {
+  const ok = await edgeCase.run();
+  console.log(`Edge case: ${edgeCase.name}: ${ok ? '✓ PASSED' : '✗ FAILED'}`);
+  if (ok) {
+    passed++;
+  } else {
+    failed++;
+  }
+}
+
+const total = testCases.length + edgeCases.length;
+
+console.log('\n=== Test Results ===');
+console.log(`Passed: ${passed}/${total}`);
+console.log(`Failed: ${failed}/${total}`);
+
+if (!process.argv.includes('--no-bench')) {
+  await runBenchmark();
+}
 
 if (failed === 0) {
   console.log('\n✓ All tests passed!');
@@ -120,3 +221,80 @@ if (failed === 0) {
   console.log('\n✗ Some tests failed');
   process.exit(1);
 }
+
+// ============================================
+// MICRO-BENCHMARK
+// ============================================
+
+/**
+ * parsePrice as it was before compiled schemas: JSON.parse of the schema and
+ * a split of the path on every call
+ */
+function parsePriceBefore(data, schemaString) {
+  const schema = JSON.parse(schemaString);
+  const parts = schema.pricePath.split('.');
+  let current = data;
+  for (const part of parts) {
+    if (current === null || current === undefined) return null;
+    if (part === '*') {
+      const keys = Object.keys(current);
+      if (keys.length === 0) return null;
+      current = current[keys[0]];
+      continue;
+    }
+    if (/^\d+$/.test(part)) {
+      const index = parseInt(part, 10);
+      if (!Array.isArray(current) || index >= current.length) return null;
+      current = current[index];
+      continue;
+    }
+    if (!current.hasOwnProperty(part)) return null;
+    current = current[part];
+  }
+  const price = parseFloat(current);
+  return isNaN(price) || price <= 0 ? null : price;
+}
+
+function timePerCall(iterations, fn) {
+  for (let i = 0; i < Math.min(iterations, 1000); i++) fn();
+  const started = process.hrtime.bigint();
+  for (let i = 0; i < iterations; i++) fn();
+  return Number(process.hrtime.bigint() - started) / iterations;
+}
+
+async function timePerCallAsync(iterations, fn) {
+  for (let i = 0; i < Math.min(iterations, 20); i++) await fn();
+  const started = process.hrtime.bigint();
+  for (let i = 0; i < iterations; i++) await fn();
+  return Number(process.hrtime.bigint() - started) / iterations;
+}
+
+async function runBenchmark() {
+  console.log('\n=== Micro-benchmark (ns per parse) ===');
+  console.log(`${'case'.padEnd(28)} ${'before'.padStart(10)} ${'compiled'.padStart(10)}`);
+
+  for (const [index, testCase] of testCases.entries()) {
+    const schemaString = JSON.stringify(testCase.schema);
+    const endpoint = { EndpointID: 1000 + index, Provider: testCase.provider, ResponseSchema: schemaString };
+    const before = timePerCall(200000, () => parsePriceBefore(testCase.response, schemaString));
+    const after = timePerCall(200000, () => parseEndpointPrice(testCase.response, endpoint));
+    console.log(`${testCase.name.padEnd(28)} ${before.toFixed(0).padStart(10)} ${after.toFixed(0).padStart(10)}`);
+  }
+
+  // Large DEXScreener-style payload: full body parse vs stream scan (price in the first pair)
+  console.log(`\n${'payload'.padEnd(28)} ${'json+path'.padStart(10)} ${'stream'.padStart(10)}  (us per response, 16 KB chunks)`);
+  const pair = testCases.find(testCase => testCase.provider === 'dexscreener');
+  const endpoint = { EndpointID: 2000, Provider: pair.provider, ResponseSchema: JSON.stringify(pair.schema) };
+  for (const pairCount of [1, 100, 1000]) {
+    const body = JSON.stringify({
+      schemaVersion: '1.0.0',
+      pairs: Array.from({ length: pairCount }, (_, i) => ({ ...pair.response.pairs[0], pairAddress: `0x${i.toString(16).padStart(40, '0')}`, txns: { h24: { buys: i, sells: i } } }))
+    });
+    const iterations = pairCount >= 1000 ? 200 : 2000;
+    const full = await timePerCallAsync(iterations, async () =>
+      parseEndpointPrice(JSON.parse(await new Response(toStream(body, 16384)).text()), endpoint));
+    const streamed = await timePerCallAsync(iterations, () => parseEndpointPriceStream(toStream(body, 16384), endpoint));
+    const label = `${pairCount} pairs (${(body.length / 1024).toFixed(0)} KB)`;
+    console.log(`${label.padEnd(28)} ${(full / 1000).toFixed(1).padStart(10)} ${(streamed / 1000).toFixed(1).padStart(10)}`);
+  }
+}
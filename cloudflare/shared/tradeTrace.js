@@ -0,0 +1,119 @@
+/**
+ * Trade Pipeline Tracing
+ *
+ * One trace per queued trade, from the producer's cron tick to the Telegram
+ * notification. The producer starts the trace at the beginning of the tick and
+ * ships it in the queue message (`trace` field); the consumer adds its stages and
+ * writes the finished trace to TradeTimings and to the log (`[TRACE] {...}` lines).
+ *
+ * Trace format (version 1):
+ * {
+ *   v: 1,
+ *   traceId: 'uuid',
+ *   startedAt: 1760000000000,          // tick start, epoch ms
+ *   enqueuedAt: 1760000000850,         // just before queue.sendBatch, epoch ms
+ *   spans: [{ name: 'prices', start: 120, duration: 640 }, ...]   // ms, start relative to startedAt
+ * }
+ *
+ * Stages: pairs, prices, configs (producer); queue, fresh_price, consecutive_count,
+ * balance, oracle_update, approve, swap, receipt, record_trade, notify (consumer).
+ *
+ * Writers: lt-trading-queue, lt-trading-execution
+ * Reader: tools/trace_report.py
+ */
+
+export const TRACE_VERSION = 1;
+
+export class TradeTrace {
+  constructor({ traceId = crypto.randomUUID(), startedAt = Date.now(), enqueuedAt = null, spans = [] } = {}) {
+    this.traceId = traceId;
+    this.startedAt = startedAt;
+    this.enqueuedAt = enqueuedAt;
+    this.spans = spans.slice();
+  }
+
+  /**
+   * Continue a trace from a queue message (or start one if the message has none)
+   */
+  static fromMessage(data) {
+    if (!data || data.v !== TRACE_VERSION) {
+      return new TradeTrace();
+    }
+    return new TradeTrace(data);
+  }
+
+  /**
+   * New trace for one trade, sharing the tick's spans so far
+   */
+  fork() {
+    return new TradeTrace({ startedAt: this.startedAt, spans: this.spans });
+  }
+
+  /**
+   * Record a stage between two epoch-ms timestamps
+   */
+  add(name, start, end = Date.now()) {
+    this.spans.push({
+      name,
+      start: start - this.startedAt,
+      duration: Math.max(end - start, 0)
+    });
+  }
+
+  /**
+   * Run fn as a stage; the span is recorded whether fn resolves or throws
+   */
+  async span(name, fn) {
+    const start = Date.now();
+    try {
+      return await fn();
+    } finally {
+      this.add(name, start);
+    }
+  }
+
+  get totalMs() {
+    return this.spans.reduce((end, s) => Math.max(end, s.start + s.duration), 0);
+  }
+
+  toJSON() {
+    return {
+      v: TRACE_VERSION,
+      traceId: this.traceId,
+      startedAt: this.startedAt,
+      enqueuedAt: this.enqueuedAt,
+      spans: this.spans
+    };
+  }
+}
+
+/**
+ * Write a finished trace to TradeTimings and the log
+ *
+ * @param {Object} fields - { userId, pairId, chainId, dexType, action, outcome, tradeId, attempt }
+ */
+export async function recordTradeTiming(db, trace, fields) {
+  const record = { ...trace.toJSON(), ...fields, totalMs: trace.totalMs };
+  console.log(`[TRACE] ${JSON.stringify(record)}`);
+
+  await db.prepare(`
+    INSERT INTO TradeTimings (
+      TraceID, UserID, PairID, ChainID, DEXType, Action, Outcome, TradeID, Attempt,
+      TickStartedAt, TotalMs, Spans, CreatedAt
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+  `).bind(
+    trace.traceId,
+    fields.userId,
+    fields.pairId,
+    fields.chainId,
+    fields.dexType || null,
+    fields.action || null,
+    fields.outcome,
+    fields.tradeId || null,
+    fields.attempt || 1,
+    new Date(trace.startedAt).toISOString().slice(0, 19).replace('T', ' '),
+    record.totalMs,
+    JSON.stringify(trace.spans)
+  ).run();
+}
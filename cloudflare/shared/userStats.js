@@ -0,0 +1,253 @@
+/**
+ * User Stats Aggregates
+ *
+ * Keeps per-user totals up to date as trades, deposits and withdrawals are written,
+ * so readers get a user's stats from a few rows instead of their whole history:
+ * - UserPairStats: trade counts, volume, average-cost position and realized PnL per pair
+ * - UserTokenStats: deposit/withdrawal counts and totals per token, and the
+ *   running ExpectedBalance ledger that lt-balance-tracker detects deposits against
+ *
+ * The *Statement(s) helpers return prepared statements meant to go into the same
+ * db.batch() as the row they account for, so aggregates and history stay in step.
+ * Migration 004_user_stats.sql creates the tables and backfills existing rows;
+ * 006_balance_ledger.sql adds and seeds ExpectedBalance.
+ *
+ * Writers: lt-trading-execution, lt-trading-queue, lt-balance-tracker, lt-tg-withdrawal
+ * Readers: lt-tg-chart, lt-tg, lt-balance-tracker
+ */
+
+import { normalizeTokenSymbol, isStablecoin } from './priceHelper.js';
+
+/**
+ * Upsert for one trade into UserPairStats
+ *
+ * BUY adds the received base and the quote spent to the position. SELL realizes
+ * (sell price - average cost) on the part of the sold base the position covers
+ * and shrinks the position proportionally. All SET expressions read the row as
+ * it was before the update.
+ *
+ * @param {Object} trade - { userId, pairId, action, quantitySent, quantityReceived }
+ */
+export function tradeStatsStatement(db, trade) {
+  const isBuy = trade.action === 'BUY';
+  const baseQty = (isBuy ? trade.quantityReceived : trade.quantitySent) || 0;
+  const quoteQty = (isBuy ? trade.quantitySent : trade.quantityReceived) || 0;
+
+  return db.prepare(`
+    INSERT INTO UserPairStats (
+      UserID, PairID, BuyCount, SellCount, BaseVolume, QuoteVolume,
+      PositionBase, PositionCost, RealizedPnL, FirstTradeAt, LastTradeAt, UpdatedAt
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, datetime('now'), datetime('now'), datetime('now'))
+    ON CONFLICT(UserID, PairID) DO UPDATE SET
+      BuyCount = BuyCount + excluded.BuyCount,
+      SellCount = SellCount + excluded.SellCount,
+      BaseVolume = BaseVolume + excluded.BaseVolume,
+      QuoteVolume = QuoteVolume + excluded.QuoteVolume,
+      RealizedPnL = RealizedPnL + CASE
+        WHEN excluded.SellCount > 0 AND PositionBase > 0 AND excluded.BaseVolume > 0
+        THEN MIN(excluded.BaseVolume, PositionBase) * (excluded.QuoteVolume / excluded.BaseVolume - PositionCost / PositionBase)
+        ELSE 0 END,
+      PositionCost = CASE
+        WHEN excluded.BuyCount > 0 THEN PositionCost + excluded.QuoteVolume
+        WHEN PositionBase > excluded.BaseVolume THEN PositionCost * (1 - excluded.BaseVolume / PositionBase)
+        ELSE 0 END,
+      PositionBase = CASE
+        WHEN excluded.BuyCount > 0 THEN PositionBase + excluded.BaseVolume
+        ELSE MAX(PositionBase - excluded.BaseVolume, 0) END,
+      LastTradeAt = excluded.LastTradeAt,
+      UpdatedAt = datetime('now')
+  `).bind(
+    trade.userId,
+    trade.pairId,
+    isBuy ? 1 : 0,
+    isBuy ? 0 : 1,
+    baseQty,
+    quoteQty,
+    isBuy ? baseQty : 0,
+    isBuy ? quoteQty : 0
+  );
+}
+
+/**
+ * Ledger updates for one trade: the sent token goes down by QuantitySent and the
+ * received token up by QuantityReceived (token units). Zero-quantity reference
+ * trades produce no statements.
+ *
+ * @param {Object} trade - { userId, tokenSent, tokenReceived, quantitySent, quantityReceived }
+ */
+export function tradeLedgerStatements(db, trade) {
+  return [
+    [trade.tokenSent, -(trade.quantitySent || 0)],
+    [trade.tokenReceived, trade.quantityReceived || 0]
+  ]
+    .filter(([tokenId, change]) => tokenId && change !== 0)
+    .map(([tokenId, change]) => ledgerChangeStatement(db, trade.userId, tokenId, change));
+}
+
+/**
+ * Move a user/token's ExpectedBalance by `change` (token units)
+ * A ledger without a baseline (NULL) stays NULL.
+ */
+export function ledgerChangeStatement(db, userId, tokenId, change) {
+  return db.prepare(`
+    INSERT INTO UserTokenStats (UserID, TokenID, UpdatedAt)
+    VALUES (?, ?, datetime('now'))
+    ON CONFLICT(UserID, TokenID) DO UPDATE SET
+      ExpectedBalance = ExpectedBalance + ?,
+      UpdatedAt = datetime('now')
+  `).bind(userId, tokenId, change);
+}
+
+/**
+ * Set a user/token's ExpectedBalance to an on-chain reading (first reading of a
+ * user/token, before any deposit can be detected for it)
+ */
+export function ledgerBaselineStatement(db, userId, tokenId, balance) {
+  return db.prepare(`
+    INSERT INTO UserTokenStats (UserID, TokenID, ExpectedBalance, UpdatedAt)
+    VALUES (?, ?, ?, datetime('now'))
+    ON CONFLICT(UserID, TokenID) DO UPDATE SET
+      ExpectedBalance = excluded.ExpectedBalance,
+      UpdatedAt = datetime('now')
+  `).bind(userId, tokenId, balance);
+}
+
+/**
+ * Upsert for one confirmed deposit into UserTokenStats (amount in token units)
+ * The deposit also raises ExpectedBalance.
+ */
+export function depositStatsStatement(db, userId, tokenId, amount) {
+  return db.prepare(`
+    INSERT INTO UserTokenStats (UserID, TokenID, DepositCount, DepositedAmount, UpdatedAt)
+    VALUES (?, ?, 1, ?, datetime('now'))
+    ON CONFLICT(UserID, TokenID) DO UPDATE SET
+      DepositCount = DepositCount + 1,
+      DepositedAmount = DepositedAmount + excluded.DepositedAmount,
+      ExpectedBalance = ExpectedBalance + excluded.DepositedAmount,
+      UpdatedAt = datetime('now')
+  `).bind(userId, tokenId, amount);
+}
+
+/**
+ * Upsert for one confirmed withdrawal into UserTokenStats (amount in token units)
+ * The withdrawal also lowers ExpectedBalance.
+ */
+export function withdrawalStatsStatement(db, userId, tokenId, amount) {
+  return db.prepare(`
+    INSERT INTO UserTokenStats (UserID, TokenID, WithdrawalCount, WithdrawnAmount, UpdatedAt)
+    VALUES (?, ?, 1, ?, datetime('now'))
+    ON CONFLICT(UserID, TokenID) DO UPDATE SET
+      WithdrawalCount = WithdrawalCount + 1,
+      WithdrawnAmount = WithdrawnAmount + excluded.WithdrawnAmount,
+      ExpectedBalance = ExpectedBalance - excluded.WithdrawnAmount,
+      UpdatedAt = datetime('now')
+  `).bind(userId, tokenId, amount);
+}
+
+/**
+ * ExpectedBalance of every user/token that has a baseline
+ * Returns Map<`${UserID}:${TokenID}`, ExpectedBalance>
+ */
+export async function getExpectedBalances(db) {
+  const result = await db.prepare(`
+    SELECT UserID, TokenID, ExpectedBalance
+    FROM UserTokenStats
+    WHERE ExpectedBalance IS NOT NULL
+  `).all();
+
+  const balances = new Map();
+  for (const row of (result.results || [])) {
+    balances.set(`${row.UserID}:${row.TokenID}`, row.ExpectedBalance);
+  }
+  return balances;
+}
+
+/**
+ * Load a user's aggregate rows (one per traded pair, one per funded token)
+ * @returns {Promise<Object>} { pairs, tokens }
+ */
+export async function getUserStats(db, userId) {
+  const [pairs, tokens] = await db.batch([
+    db.prepare(`
+      SELECT
+        s.*,
+        tp.PairName,
+        bt.Symbol AS BaseSymbol,
+        qt.Symbol AS QuoteSymbol
+      FROM UserPairStats s
+      INNER JOIN TradingPairs tp ON s.PairID = tp.PairID
+      INNER JOIN Tokens bt ON tp.BaseTokenID = bt.TokenID
+      INNER JOIN Tokens qt ON tp.QuoteTokenID = qt.TokenID
+      WHERE s.UserID = ?
+    `).bind(userId),
+    db.prepare(`
+      SELECT s.*, t.Symbol
+      FROM UserTokenStats s
+      INNER JOIN Tokens t ON s.TokenID = t.TokenID
+      WHERE s.UserID = ?
+    `).bind(userId)
+  ]);
+
+  return {
+    pairs: pairs.results || [],
+    tokens: tokens.results || []
+  };
+}
+
+/**
+ * Fold aggregate rows into user totals
+ * USDC totals only include stablecoins (deposits/withdrawals) and stablecoin-quoted
+ * pairs (volume, realized PnL); other tokens would need historical prices.
+ */
+export function summarizeUserStats({ pairs, tokens }) {
+  const summary = {
+    totalTrades: 0,
+    buyCount: 0,
+    sellCount: 0,
+    totalDeposits: 0,
+    totalWithdrawals: 0,
+    totalDepositedUSDC: 0,
+    totalWithdrawnUSDC: 0,
+    tradeVolumeUSDC: 0,
+    realizedPnlUSDC: 0,
+    firstTradeDate: null,
+    lastTradeDate: null,
+    tokensTraded: []
+  };
+
+  const tokensTraded = new Set();
+
+  pairs.forEach(p => {
+    summary.buyCount += p.BuyCount;
+    summary.sellCount += p.SellCount;
+    tokensTraded.add(normalizeTokenSymbol(p.BaseSymbol));
+
+    if (isStablecoin(p.QuoteSymbol)) {
+      summary.tradeVolumeUSDC += p.QuoteVolume;
+      summary.realizedPnlUSDC += p.RealizedPnL;
+    }
+
+    if (p.FirstTradeAt && (!summary.firstTradeDate || p.FirstTradeAt < summary.firstTradeDate)) {
+      summary.firstTradeDate = p.FirstTradeAt;
+    }
+    if (p.LastTradeAt && (!summary.lastTradeDate || p.LastTradeAt > summary.lastTradeDate)) {
+      summary.lastTradeDate = p.LastTradeAt;
+    }
+  });
+
+  tokens.forEach(t => {
+    summary.totalDeposits += t.DepositCount;
+    summary.totalWithdrawals += t.WithdrawalCount;
+
+    if (isStablecoin(t.Symbol)) {
+      summary.totalDepositedUSDC += t.DepositedAmount;
+      summary.totalWithdrawnUSDC += t.WithdrawnAmount;
+    }
+  });
+
+  summary.totalTrades = summary.buyCount + summary.sellCount;
+  summary.tokensTraded = Array.from(tokensTraded);
+
+  return summary;
+}
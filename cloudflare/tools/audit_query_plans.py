@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Query Plan Audit: EXPLAIN QUERY PLAN for every worker SQL statement
+
+Extracts the SQL of every db.prepare(...) call in the workers and shared modules,
+builds a seeded SQLite copy of database/schema.sql (synthetic users, configs,
+trades and prices from loadtest_pipeline.py, then ANALYZE) and reports:
+    - full table scans (SCAN without an index) of tables that grow with users
+    - temp B-trees for ORDER BY / GROUP BY / DISTINCT
+    - statements SQLite cannot prepare against the schema
+    - indexes no statement uses, and indexes made redundant by a longer index
+      with the same leading columns (every index costs a write per insert)
+
+Statements in the hot path (lt_trader_queue, lt_trader_execute, lt_balance_tracker
+and the shared modules they import) are marked HOT. Template interpolations
+(${...}) are replaced by a bound parameter unless listed in SUBSTITUTIONS.
+
+Usage:
+    1. No dependencies beyond the Python standard library
+    2. Run (from tools/):
+       python audit_query_plans.py                      # report
+       python audit_query_plans.py --show-plans --hot   # plans of hot statements
+       python audit_query_plans.py --check              # fail on findings not in the baseline
+       python audit_query_plans.py --update-baseline    # accept the current findings
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+from argparse import Namespace
+
+from loadtest_pipeline import create_database
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCHEMA_FILE = os.path.join(ROOT, "database", "schema.sql")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plan_baseline.json")
+
+# Sources scanned for db.prepare(...) (relative to cloudflare/)
+SOURCE_GLOBS = ["*/worker.js", "*/helper.*.js", "shared/*.js"]
+
+# Workers on the per-minute / per-trade path; shared modules they import are hot too
+HOT_WORKERS = ["lt_trader_queue", "lt_trader_execute", "lt_balance_tracker"]
+
+# Tables bounded by the number of chains, tokens or pairs (not users): scans are fine
+LOOKUP_TABLES = {"Chains", "Tokens", "TradingPairs", "PriceAPIEndpoints", "CachedPrices", "PriceRollupState"}
+
+# Interpolations with a known SQL value; everything else becomes a parameter
+SUBSTITUTIONS = {
+    "resolution.bucket": "strftime('%Y-%m-%d %H:%M:00', CreatedAt)",
+    "resolution.name": "1m",
+    "placeholders": "?, ?",
+}
+
+PREPARE_RE = re.compile(r"\.prepare\(\s*([`'\"])")
+FUNCTION_RE = re.compile(r"^\s*(?:export\s+)?(?:async\s+)?(?:function\s+(\w+)\s*\(|(\w+)\s*\([^)]*\)\s*\{)", re.M)
+NOT_FUNCTIONS = {"if", "for", "while", "switch", "catch", "return"}
+BINDINGS_RE = re.compile(r"uses (\d+), and there are")
+INDEX_RE = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+SCAN_RE = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+TEMP_BTREE_RE = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+WRITE_RE = re.compile(r"^\s*(?:INSERT(?: OR \w+)? INTO|UPDATE|DELETE FROM)\s+(\w+)", re.I)
+
+SEED_OPTIONS = {"trades_per_config": 3, "history_minutes": 1440, "new_share": 0.02, "seed": 1}
+
+
+# =============================================================================
+# EXTRACTION
+# =============================================================================
+
+def read_literal(source, start, quote):
+    """Return (text, end) of the string literal whose opening quote is at start."""
+    i = start + 1
+    text = []
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            text.append(source[i + 1])
+            i += 2
+            continue
+        if char == quote:
+            return "".join(text), i + 1
+        if quote == "`" and source.startswith("${", i):
+            depth = 0
+            j = i + 2
+            while depth or source[j] != "}":
+                depth += {"{": 1, "}": -1}.get(source[j], 0)
+                j += 1
+            expression = source[i + 2:j].strip()
+            text.append(SUBSTITUTIONS.get(expression, "?"))
+            i = j + 1
+            continue
+        text.append(char)
+        i += 1
+    raise ValueError("unterminated string literal")
+
+
+def enclosing_function(source, offset):
+    name = "(module)"
+    for match in FUNCTION_RE.finditer(source, 0, offset):
+        candidate = match.group(1) or match.group(2)
+        if candidate not in NOT_FUNCTIONS:
+            name = candidate
+    return name
+
+
+def hot_files():
+    """Hot worker sources and the shared modules they import."""
+    hot = set()
+    for worker in HOT_WORKERS:
+        for path in glob.glob(os.path.join(ROOT, worker, "*.js")):
+            hot.add(os.path.relpath(path, ROOT))
+            with open(path, "r") as f:
+                for module in re.findall(r"from '\.\./shared/(\w+\.js)'", f.read()):
+                    hot.add(os.path.join("shared", module))
+    return hot
+
+
+def extract_statements():
+    """All db.prepare(...) SQL strings: [{file, line, function, hot, sql}]."""
+    hot = hot_files()
+    statements = []
+    for pattern in SOURCE_GLOBS:
+        for path in sorted(glob.glob(os.path.join(ROOT, pattern))):
+            relative = os.path.relpath(path, ROOT)
+            with open(path, "r") as f:
+                source = f.read()
+            for match in PREPARE_RE.finditer(source):
+                sql, _ = read_literal(source, match.start(1), match.group(1))
+                statements.append({
+                    "file": relative,
+                    "line": source.count("\n", 0, match.start()) + 1,
+                    "function": enclosing_function(source, match.start()),
+                    "hot": relative in hot,
+                    "sql": " ".join(sql.split()),
+                })
+    return statements
+
+
+# =============================================================================
+# PLANS
+# =============================================================================
+
+def build_database(path, users):
+    """Seeded database with ANALYZE statistics, or the bare schema for users=0."""
+    if users:
+        conn, _ = create_database(path, users, Namespace(**SEED_OPTIONS))
+        conn.row_factory = None
+        return conn
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_FILE, "r") as f:
+        conn.executescript(f.read())
+    return conn
+
+
+def explain(conn, sql):
+    """EXPLAIN QUERY PLAN rows (detail strings), binding NULL to every parameter."""
+    query = f"EXPLAIN QUERY PLAN {sql}"
+    try:
+        rows = conn.execute(query).fetchall()
+    except sqlite3.ProgrammingError as error:
+        match = BINDINGS_RE.search(str(error))
+        if not match:
+            raise
+        rows = conn.execute(query, (None,) * int(match.group(1))).fetchall()
+    return [row[3] for row in rows]
+
+
+def plan_findings(plan, tables):
+    """Scans of user-sized tables and temp B-trees in one plan."""
+    findings = []
+    for detail in plan:
+        scan = SCAN_RE.match(detail)
+        if scan and scan.group(1) in tables and scan.group(1) not in LOOKUP_TABLES:
+            findings.append(("scan", scan.group(1)))
+        temp = TEMP_BTREE_RE.search(detail)
+        if temp:
+            findings.append(("temp-btree", temp.group(1)))
+    return findings
+
+
+def index_columns(conn, index):
+    """Key columns of an index as (name, collation) tuples."""
+    return [(row[2], row[4]) for row in conn.execute(f"PRAGMA index_xinfo('{index}')") if row[5]]
+
+
+def audit_indexes(conn, used):
+    """Unused and redundant indexes: [(kind, index, table, detail)]."""
+    findings = []
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        indexes = []
+        for _, name, unique, origin, partial in conn.execute(f"PRAGMA index_list('{table}')"):
+            indexes.append({"name": name, "unique": unique, "origin": origin, "partial": partial,
+                            "columns": index_columns(conn, name)})
+        rowid = [row[1] for row in conn.execute(f"PRAGMA table_info('{table}')") if row[5] == 1 and row[2] == "INTEGER"]
+
+        for index in indexes:
+            if index["origin"] != "c" or index["partial"]:
+                continue
+            columns = index["columns"]
+            if rowid and [name for name, _ in columns] == rowid:
+                findings.append(("redundant", index["name"], table, f"covers the rowid {rowid[0]}"))
+                continue
+            wider = [other for other in indexes
+                     if other["name"] != index["name"] and not other["partial"]
+                     and other["columns"][:len(columns)] == columns
+                     and (len(other["columns"]) > len(columns) or other["name"] < index["name"])]
+            if wider and not index["unique"]:
+                findings.append(("redundant", index["name"], table, f"prefix of {wider[0]['name']}"))
+            elif index["name"] not in used and not index["unique"]:
+                findings.append(("unused", index["name"], table, ", ".join(name for name, _ in columns)))
+    return findings
+
+
+def audit(conn, statements):
+    """Explain every statement; returns (statements with plans, findings)."""
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    used = set()
+    findings = []
+    for statement in statements:
+        try:
+            statement["plan"] = explain(conn, statement["sql"])
+        except sqlite3.Error as error:
+            statement["plan"] = []
+            statement["error"] = str(error)
+            findings.append(finding(statement, "error", str(error)))
+            continue
+        for detail in statement["plan"]:
+            used.update(INDEX_RE.findall(detail))
+        for kind, detail in plan_findings(statement["plan"], tables):
+            findings.append(finding(statement, kind, detail))
+
+    writes = {}
+    for statement in statements:
+        match = WRITE_RE.match(statement["sql"])
+        if match:
+            writes[match.group(1)] = writes.get(match.group(1), 0) + 1
+    for kind, index, table, detail in audit_indexes(conn, used):
+        findings.append({
+            "key": f"index:{kind}:{index}",
+            "kind": kind,
+            "hot": False,
+            "where": f"{table}.{index}",
+            "detail": f"{detail} ({writes.get(table, 0)} write statements on {table})",
+        })
+    return statements, findings
+
+
+def finding(statement, kind, detail):
+    """A plan finding; the key leaves out line numbers so edits nearby do not change it."""
+    return {
+        "key": f"{statement['file']}:{statement['function']}:{kind}:{detail}",
+        "kind": kind,
+        "hot": statement["hot"],
+        "where": f"{statement['file']}:{statement['line']} {statement['function']}()",
+        "detail": detail,
+    }
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+KIND_ORDER = ["error", "scan", "temp-btree", "redundant", "unused"]
+
+
+def print_findings(findings, title):
+    print(f"\n{title}")
+    if not findings:
+        print("  none")
+        return
+    for item in sorted(findings, key=lambda f: (not f["hot"], KIND_ORDER.index(f["kind"]), f["where"])):
+        hot = "HOT " if item["hot"] else "    "
+        print(f"  {hot}{item['kind']:<10} {item['where']:<60} {item['detail']}")
+
+
+def print_plans(statements, hot_only):
+    for statement in statements:
+        if hot_only and not statement["hot"]:
+            continue
+        marker = " [HOT]" if statement["hot"] else ""
+        print(f"\n{statement['file']}:{statement['line']} {statement['function']}(){marker}")
+        print(f"  {statement['sql'][:160]}{'...' if len(statement['sql']) > 160 else ''}")
+        for detail in statement["plan"] or [statement.get("error", "(no table lookups)")]:
+            print(f"    {detail}")
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r") as f:
+        return set(json.load(f)["findings"])
+
+
+def save_baseline(path, findings):
+    with open(path, "w") as f:
+        json.dump({"findings": sorted({item["key"] for item in findings})}, f, indent=2)
+        f.write("\n")
+    print(f"\nBaseline saved to {path}")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN audit of the worker SQL")
+    parser.add_argument("--users", type=int, default=2000,
+                        help="Synthetic users seeded before ANALYZE; 0 for the bare schema (default: 2000)")
+    parser.add_argument("--db", default="audit_query_plans.db", help="Scratch database file")
+    parser.add_argument("--show-plans", action="store_true", help="Print the plan of every statement")
+    parser.add_argument("--hot", action="store_true", help="Only hot-path statements in --show-plans and findings")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Accepted findings (default: query_plan_baseline.json)")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on findings that are not in the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the current findings to the baseline")
+    parser.add_argument("--json", metavar="FILE", help="Write statements, plans and findings to FILE")
+    return parser.parse_args()
+
+
+def main():
+    """Run the audit."""
+    args = parse_args()
+
+    conn = build_database(args.db, args.users)
+    statements, findings = audit(conn, extract_statements())
+    conn.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+
+    hot = sum(1 for statement in statements if statement["hot"])
+    print(f"Explained {len(statements)} statements ({hot} hot) from {len({s['file'] for s in statements})} files")
+
+    if args.show_plans:
+        print_plans(statements, args.hot)
+
+    shown = [item for item in findings if item["hot"] or not args.hot or item["key"].startswith("index:")]
+    print_findings([item for item in shown if not item["key"].startswith("index:")], "Plan findings")
+    print_findings([item for item in shown if item["key"].startswith("index:")], "Index findings")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"statements": statements, "findings": findings}, f, indent=2)
+        print(f"\nReport saved to {args.json}")
+
+    if args.update_baseline:
+        save_baseline(args.baseline, findings)
+        return
+
+    if args.check:
+        baseline = load_baseline(args.baseline)
+        current = {item["key"] for item in findings}
+        new = [item for item in findings if item["key"] not in baseline]
+        fixed = sorted(baseline - current)
+        print_findings(new, "New findings (not in baseline)")
+        if fixed:
+            print(f"\n{len(fixed)} baseline findings no longer occur; run --update-baseline to drop them")
+        if new:
+            sys.exit(1)
+        print("\nQuery plan check passed")
+
+
+if __name__ == "__main__":
+    main()
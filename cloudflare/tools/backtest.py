@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+Strategy Backtester for UserTradingConfigs
+
+Replays PriceHistory through the same trigger and sizing rules the workers use:
+    - checkTriggerCondition (lt_trader_queue) / validateTrigger (lt_trader_execute)
+    - getConsecutiveCount + calculateActualTradePercentage (Multiplier ^ ConsecutiveCount)
+    - calculateTradeAmount (Min/Max USD limits, rounded UP to 5 decimals)
+
+All parameter combinations are simulated together as NumPy arrays, so sweeping
+thousands of TradePercentage / TriggerPercentage / Multiplier / Min / Max settings
+over a pair's history takes seconds. The crosscheck command verifies recorded
+Trades / TradeMetrics rows against the same rules.
+
+Usage:
+    1. Install dependencies: pip install numpy
+    2. Export data (either works):
+       - PriceHistory only:
+         wrangler d1 execute lazaitrader --remote --json \\
+           --command "SELECT PriceID, PairID, Price, CreatedAt FROM PriceHistory WHERE PairID = 1 ORDER BY CreatedAt" > prices.json
+       - Full database: wrangler d1 export lazaitrader --remote --output lazai.sql && sqlite3 lazai.db < lazai.sql
+    3. Run:
+       Sweep: python backtest.py sweep --prices prices.json --trade-pct 0.05,0.1,0.2 \\
+                  --trigger-pct 0.01:0.1:0.01 --multiplier 1,1.5,2 --max-amount 0,50,100 --base 1 --quote 3000
+       Replay one config: python backtest.py replay --db lazai.db --config-id 7 --base 1 --quote 3000
+       Check recorded trades: python backtest.py crosscheck --db lazai.db
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+# Actions are encoded as integers inside the simulation
+BUY = 0
+SELL = 1
+ACTION_NAMES = {BUY: "BUY", SELL: "SELL"}
+
+# calculateTradeAmount rounds amounts UP to 5 decimals
+AMOUNT_SCALE = 100000
+
+# Relative tolerance for comparing recorded REAL columns with recomputed values
+CHECK_TOLERANCE = 1e-9
+
+
+# =============================================================================
+# WORKER SEMANTICS (vectorized)
+# =============================================================================
+
+def check_trigger_condition(current_price, last_trade_price, trigger_percentage):
+    """
+    checkTriggerCondition / validateTrigger over arrays.
+
+    Returns:
+        tuple (triggered, action, percent_change). Invalid last prices never trigger.
+    """
+    current_price = np.asarray(current_price, dtype=np.float64)
+    last_trade_price = np.asarray(last_trade_price, dtype=np.float64)
+    valid = last_trade_price > 0
+    safe_last = np.where(valid, last_trade_price, 1.0)
+
+    percent_change = ((current_price - safe_last) / safe_last) * 100
+    # TriggerPercentage is stored as decimal (e.g., 0.10 for 10%)
+    triggered = valid & (np.abs(percent_change) >= np.asarray(trigger_percentage) * 100)
+    # Price went UP -> SELL, DOWN -> BUY
+    action = np.where(percent_change > 0, SELL, BUY)
+    return triggered, action, percent_change
+
+
+def next_consecutive_count(last_action, last_count, action):
+    """getConsecutiveCount: +1 when the direction repeats, otherwise reset to 0."""
+    return np.where(last_action == action, last_count + 1, 0)
+
+
+def calculate_actual_trade_percentage(base_percentage, multiplier, consecutive_count):
+    """
+    TradePercentage * (Multiplier ^ ConsecutiveCount).
+
+    V8's Math.pow and NumPy's power can differ in the last bit; the 5-decimal
+    rounding in calculate_trade_amount absorbs that.
+    """
+    return base_percentage * np.power(multiplier, consecutive_count)
+
+
+def round_up_amount(amount):
+    """Math.ceil(amount * 100000) / 100000"""
+    return np.ceil(amount * AMOUNT_SCALE) / AMOUNT_SCALE
+
+
+def calculate_trade_amount(token_balance, actual_trade_percentage, price_usd, min_amount_usd, max_amount_usd):
+    """
+    calculateTradeAmount over arrays.
+
+    Returns:
+        tuple (amount, amount_usd, capped, below_minimum)
+    """
+    raw_amount = token_balance * actual_trade_percentage
+    raw_amount_usd = raw_amount * price_usd
+
+    below_minimum = (raw_amount_usd < min_amount_usd) & (min_amount_usd > 0)
+    capped = ~below_minimum & (raw_amount_usd > max_amount_usd) & (max_amount_usd > 0)
+
+    safe_price = np.where(price_usd > 0, price_usd, 1.0)
+    amount = np.where(
+        capped,
+        round_up_amount(max_amount_usd / safe_price),
+        round_up_amount(raw_amount),
+    )
+    amount = np.where(below_minimum, 0.0, amount)
+    amount_usd = np.where(
+        below_minimum,
+        raw_amount_usd,
+        np.where(capped, max_amount_usd, amount * price_usd),
+    )
+    return amount, amount_usd, capped, below_minimum
+
+
+# =============================================================================
+# DATA LOADING
+# =============================================================================
+
+def load_price_file(path, pair_id=None):
+    """
+    Load a PriceHistory export: CSV with a Price column, a JSON list of rows, or the
+    output of `wrangler d1 execute --json` ([{"results": [...]}]).
+
+    Returns:
+        tuple (prices, timestamps) ordered by CreatedAt
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r") as f:
+            rows = json.load(f)
+        if rows and isinstance(rows[0], dict) and "results" in rows[0]:
+            rows = [row for batch in rows for row in batch["results"]]
+
+    if pair_id is not None:
+        rows = [row for row in rows if int(row.get("PairID", pair_id)) == pair_id]
+    rows.sort(key=lambda row: (row.get("CreatedAt") or "", int(row.get("PriceID") or 0)))
+
+    prices = np.array([float(row["Price"]) for row in rows], dtype=np.float64)
+    timestamps = [row.get("CreatedAt") for row in rows]
+    return prices, timestamps
+
+
+def load_price_history(conn, pair_id, since=None, until=None):
+    """
+    Load the cron price ticks for one pair from a database copy.
+
+    Rows inserted together with a trade (recordTrade / createReferenceTrade) are
+    skipped - they repeat the fresh price of a tick that is already in the series.
+    """
+    query = """
+        SELECT ph.Price, ph.CreatedAt
+        FROM PriceHistory ph
+        WHERE ph.PairID = ?
+          AND ph.PriceID NOT IN (SELECT PriceID FROM Trades WHERE PairID = ?)
+    """
+    params = [pair_id, pair_id]
+    if since:
+        query += " AND ph.CreatedAt >= ?"
+        params.append(since)
+    if until:
+        query += " AND ph.CreatedAt <= ?"
+        params.append(until)
+    query += " ORDER BY ph.CreatedAt, ph.PriceID"
+
+    rows = conn.execute(query, params).fetchall()
+    prices = np.array([row[0] for row in rows], dtype=np.float64)
+    timestamps = [row[1] for row in rows]
+    return prices, timestamps
+
+
+def load_config(conn, config_id):
+    """Fetch one UserTradingConfigs row as a dict."""
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM UserTradingConfigs WHERE ConfigID = ?", (config_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"ConfigID {config_id} not found")
+    return dict(row)
+
+
+# =============================================================================
+# SIMULATION
+# =============================================================================
+
+def parse_values(spec):
+    """Parse "0.05,0.1,0.2" or an inclusive range "start:stop:step" into a list of floats."""
+    values = []
+    for part in spec.split(","):
+        if ":" in part:
+            start, stop, step = (float(x) for x in part.split(":"))
+            values.extend(np.round(np.arange(start, stop + step / 2, step), 10).tolist())
+        else:
+            values.append(float(part))
+    return values
+
+
+def build_grid(trade_pct, trigger_pct, multiplier, min_amount, max_amount):
+    """Cartesian product of parameter lists, as one array per UserTradingConfigs column."""
+    grid = [
+        combo for combo in itertools.product(trade_pct, trigger_pct, multiplier, min_amount, max_amount)
+        if combo[4] >= combo[3] or combo[4] == 0  # CHECK (MaxAmount >= MinimumAmount)
+    ]
+    columns = np.array(grid, dtype=np.float64).reshape(-1, 5).T
+    return {
+        "TradePercentage": columns[0],
+        "TriggerPercentage": columns[1],
+        "Multiplier": columns[2],
+        "MinimumAmount": columns[3],
+        "MaxAmount": columns[4],
+    }
+
+
+def simulate(prices, params, base_balance, quote_balance, record=False):
+    """
+    Run every parameter combination over the price series at once.
+
+    Mirrors one cron cycle per tick: the first tick creates the reference trade
+    (recorded as BUY without TradeMetrics), later ticks go through trigger check,
+    consecutive count, sizing and execution at the tick price. Quote tokens are
+    valued at $1, as in lt_trader_execute.
+
+    Zero-balance and below-minimum outcomes are recorded as 0-amount trades by the
+    executor, so they move the reference price too. A trade larger than the balance
+    (possible after 5-decimal rounding or Multiplier growth) reverts on-chain and
+    leaves the state unchanged.
+
+    Returns:
+        dict of result arrays (one entry per combination), plus "events" when record=True
+    """
+    trade_pct = params["TradePercentage"]
+    trigger_pct = params["TriggerPercentage"]
+    multiplier = params["Multiplier"]
+    min_amount = params["MinimumAmount"]
+    max_amount = params["MaxAmount"]
+    n = len(trade_pct)
+
+    reference_price = np.full(n, prices[0] if len(prices) else 0.0)
+    last_action = np.full(n, BUY)
+    last_count = np.zeros(n, dtype=np.int64)
+    base = np.full(n, float(base_balance))
+    quote = np.full(n, float(quote_balance))
+
+    trades = np.zeros(n, dtype=np.int64)
+    capped_trades = np.zeros(n, dtype=np.int64)
+    below_minimum = np.zeros(n, dtype=np.int64)
+    no_balance = np.zeros(n, dtype=np.int64)
+    failed = np.zeros(n, dtype=np.int64)
+    volume_usd = np.zeros(n)
+    max_consecutive = np.zeros(n, dtype=np.int64)
+    events = []
+
+    for tick in range(1, len(prices)):
+        price = prices[tick]
+        triggered, action, percent_change = check_trigger_condition(price, reference_price, trigger_pct)
+        if not triggered.any():
+            continue
+
+        idx = np.nonzero(triggered)[0]
+        action = action[idx]
+        sell = action == SELL
+        count = next_consecutive_count(last_action[idx], last_count[idx], action)
+        actual_pct = calculate_actual_trade_percentage(trade_pct[idx], multiplier[idx], count)
+
+        balance = np.where(sell, base[idx], quote[idx])
+        price_in = np.where(sell, price, 1.0)
+        empty = balance <= 0
+
+        amount, amount_usd, capped, below = calculate_trade_amount(
+            balance, actual_pct, price_in, min_amount[idx], max_amount[idx]
+        )
+        below &= ~empty
+        execute = ~empty & ~below
+        reverted = execute & (amount > balance)
+        executed = execute & ~reverted
+
+        sold = np.where(executed, amount, 0.0)
+        received = np.where(sell, sold * price, sold / price)
+        base[idx] += np.where(sell, -sold, received)
+        quote[idx] += np.where(sell, received, -sold)
+
+        # Every recorded trade (including 0-amount ones) becomes the new reference
+        recorded = ~reverted
+        reference_price[idx[recorded]] = price
+        last_action[idx[recorded]] = action[recorded]
+        last_count[idx[recorded]] = np.where(empty, 0, count)[recorded]
+
+        trades[idx] += executed
+        capped_trades[idx] += executed & capped
+        below_minimum[idx] += below
+        no_balance[idx] += empty
+        failed[idx] += reverted
+        volume_usd[idx] += np.where(executed, amount_usd, 0.0)
+        max_consecutive[idx] = np.maximum(max_consecutive[idx], np.where(executed, count, 0))
+
+        if record:
+            for i, combo in enumerate(idx):
+                if empty[i]:
+                    outcome = "NO_BALANCE"
+                elif below[i]:
+                    outcome = "BELOW_MIN"
+                elif reverted[i]:
+                    outcome = "REVERTED"
+                else:
+                    outcome = "CAPPED" if capped[i] else "EXECUTED"
+                events.append({
+                    "combo": int(combo),
+                    "tick": tick,
+                    "price": float(price),
+                    "action": ACTION_NAMES[int(action[i])],
+                    "percent_change": float(percent_change[combo]),
+                    "consecutive_count": int(count[i]) if not empty[i] else 0,
+                    "actual_trade_percentage": float(actual_pct[i]) if not empty[i] else 0.0,
+                    "amount": float(amount[i]) if executed[i] else 0.0,
+                    "amount_usd": float(amount_usd[i]),
+                    "outcome": outcome,
+                })
+
+    last_price = prices[-1] if len(prices) else 0.0
+    final_value = base * last_price + quote
+    hold_value = base_balance * last_price + quote_balance
+    results = {
+        "base": base,
+        "quote": quote,
+        "final_value": final_value,
+        "hold_value": np.full(n, hold_value),
+        "return_vs_hold": np.where(hold_value > 0, final_value / hold_value - 1, 0.0),
+        "trades": trades,
+        "capped": capped_trades,
+        "below_minimum": below_minimum,
+        "no_balance": no_balance,
+        "reverted": failed,
+        "volume_usd": volume_usd,
+        "max_consecutive": max_consecutive,
+    }
+    if record:
+        results["events"] = events
+    return results
+
+
+# =============================================================================
+# CROSS-CHECK AGAINST RECORDED TRADES
+# =============================================================================
+
+def isclose(a, b):
+    return math.isclose(a, b, rel_tol=CHECK_TOLERANCE, abs_tol=1e-12)
+
+
+def load_trades(conn, user_id, pair_id):
+    """Recorded trades for one user/pair with their TradeMetrics, oldest first."""
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("""
+        SELECT t.TradeID, t.Action, t.QuantitySent, t.QuantityReceived, t.TxHash, t.CreatedAt,
+               t.PriceID, ph.Price, tm.ConsecutiveCount, tm.ActualTradePercentage
+        FROM Trades t
+        INNER JOIN PriceHistory ph ON t.PriceID = ph.PriceID
+        LEFT JOIN TradeMetrics tm ON t.TradeID = tm.TradeID
+        WHERE t.UserID = ? AND t.PairID = ?
+        ORDER BY t.CreatedAt, t.TradeID
+    """, (user_id, pair_id)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def check_trade(config, previous, trade):
+    """
+    Recompute one recorded trade from the trade before it.
+
+    Returns:
+        list of (field, expected, recorded) mismatches
+    """
+    mismatches = []
+    tx_hash = trade["TxHash"] or ""
+    is_no_balance = tx_hash.startswith("NO_BALANCE-")
+    is_below_min = tx_hash.startswith("BELOW_MIN-")
+
+    triggered, action, _ = check_trigger_condition(trade["Price"], previous["Price"], config["TriggerPercentage"])
+    expected_action = ACTION_NAMES[int(action)]
+    if not triggered:
+        mismatches.append(("Trigger", f">= {config['TriggerPercentage'] * 100}%", "not reached"))
+    if expected_action != trade["Action"]:
+        mismatches.append(("Action", expected_action, trade["Action"]))
+
+    action_code = SELL if trade["Action"] == "SELL" else BUY
+    previous_code = SELL if previous["Action"] == "SELL" else BUY
+    count = int(next_consecutive_count(previous_code, previous["ConsecutiveCount"] or 0, action_code))
+    expected_count = 0 if is_no_balance else count
+    if trade["ConsecutiveCount"] is not None and trade["ConsecutiveCount"] != expected_count:
+        mismatches.append(("ConsecutiveCount", expected_count, trade["ConsecutiveCount"]))
+
+    actual_pct = float(calculate_actual_trade_percentage(config["TradePercentage"], config["Multiplier"], count))
+    expected_pct = 0.0 if is_no_balance else actual_pct
+    if trade["ActualTradePercentage"] is not None and not isclose(trade["ActualTradePercentage"], expected_pct):
+        mismatches.append(("ActualTradePercentage", expected_pct, trade["ActualTradePercentage"]))
+
+    sent = trade["QuantitySent"]
+    if is_no_balance or is_below_min:
+        if sent != 0:
+            mismatches.append(("QuantitySent", 0, sent))
+        return mismatches
+
+    price_in = trade["Price"] if trade["Action"] == "SELL" else 1.0
+    if config["MaxAmount"] > 0:
+        capped_amount = float(round_up_amount(config["MaxAmount"] / price_in))
+        if sent > capped_amount and not isclose(sent, capped_amount):
+            mismatches.append(("QuantitySent", f"<= {capped_amount} (MaxAmount)", sent))
+    if config["MinimumAmount"] > 0 and sent * price_in < config["MinimumAmount"] and not isclose(sent * price_in, config["MinimumAmount"]):
+        mismatches.append(("QuantitySent", f">= ${config['MinimumAmount']} (MinimumAmount)", sent))
+    if not isclose(sent * AMOUNT_SCALE, round(sent * AMOUNT_SCALE)):
+        mismatches.append(("QuantitySent", "5-decimal amount", sent))
+
+    expected_received = sent * trade["Price"] if trade["Action"] == "SELL" else sent / trade["Price"]
+    if not isclose(trade["QuantityReceived"], expected_received):
+        mismatches.append(("QuantityReceived", expected_received, trade["QuantityReceived"]))
+
+    return mismatches
+
+
+def late_triggers(conn, config, previous, trade):
+    """
+    Cron ticks between two trades that already met the trigger.
+
+    A non-zero count means trades happened later than the rules allow - e.g. the
+    executor's fresh-price re-validation failed, or a queue message was lost.
+    """
+    prices, _ = load_price_history(conn, config["PairID"], previous["CreatedAt"], trade["CreatedAt"])
+    if len(prices) < 2:
+        return 0
+    # The last tick at or before the trade is the one that queued it
+    triggered, _, _ = check_trigger_condition(prices[:-1], previous["Price"], config["TriggerPercentage"])
+    return int(triggered.sum())
+
+
+def cross_check(conn, user_id=None, pair_id=None, verbose=False):
+    """
+    Verify recorded Trades / TradeMetrics against the worker rules.
+
+    Uses each config's current settings, so trades made before a settings change
+    show up as mismatches.
+
+    Returns:
+        total number of mismatching trades
+    """
+    conn.row_factory = sqlite3.Row
+    query = "SELECT * FROM UserTradingConfigs WHERE 1 = 1"
+    params = []
+    if user_id is not None:
+        query += " AND UserID = ?"
+        params.append(user_id)
+    if pair_id is not None:
+        query += " AND PairID = ?"
+        params.append(pair_id)
+    configs = [dict(row) for row in conn.execute(query + " ORDER BY ConfigID", params).fetchall()]
+
+    total_checked = 0
+    total_bad = 0
+    for config in configs:
+        trades = load_trades(conn, config["UserID"], config["PairID"])
+        checked = 0
+        bad = 0
+        late = 0
+        for previous, trade in zip(trades, trades[1:]):
+            if (trade["TxHash"] or "").startswith("REF-"):
+                continue
+            checked += 1
+            mismatches = check_trade(config, previous, trade)
+            late += late_triggers(conn, config, previous, trade)
+            if mismatches:
+                bad += 1
+                if verbose or bad <= 5:
+                    for field, expected, recorded in mismatches:
+                        print(f"    Trade {trade['TradeID']} ({trade['CreatedAt']}): {field} expected {expected}, recorded {recorded}")
+
+        status = "OK" if bad == 0 else f"{bad} MISMATCHED"
+        print(f"Config {config['ConfigID']} (user {config['UserID']}, pair {config['PairID']}): "
+              f"{checked} trades checked, {status}, {late} late trigger ticks")
+        total_checked += checked
+        total_bad += bad
+
+    print(f"\nChecked {total_checked} trades across {len(configs)} configs: {total_bad} mismatched")
+    return total_bad
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def print_sweep(params, results, top):
+    """Print the best combinations by final value."""
+    order = np.argsort(-results["final_value"], kind="stable")[:top]
+    print(f"\n{'trade%':>7} {'trigger%':>8} {'mult':>5} {'min$':>7} {'max$':>7} "
+          f"{'trades':>6} {'capped':>6} {'<min':>5} {'revert':>6} {'volume$':>11} {'value':>12} {'vs hold':>8}")
+    for i in order:
+        print(f"{params['TradePercentage'][i] * 100:>7.2f} {params['TriggerPercentage'][i] * 100:>8.2f} "
+              f"{params['Multiplier'][i]:>5.2f} {params['MinimumAmount'][i]:>7.2f} {params['MaxAmount'][i]:>7.2f} "
+              f"{results['trades'][i]:>6} {results['capped'][i]:>6} {results['below_minimum'][i]:>5} "
+              f"{results['reverted'][i]:>6} {results['volume_usd'][i]:>11.2f} {results['final_value'][i]:>12.4f} "
+              f"{results['return_vs_hold'][i] * 100:>7.2f}%")
+
+
+def save_sweep(params, results, output_file):
+    """Write every combination and its results to CSV."""
+    columns = list(params) + [key for key in results if key != "events"]
+    with open(output_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for i in range(len(params["TradePercentage"])):
+            writer.writerow([params[c][i] if c in params else results[c][i] for c in columns])
+    print(f"\nResults saved to {output_file}")
+
+
+def load_prices(args):
+    if args.prices:
+        return load_price_file(args.prices, args.pair_id)
+    if args.db:
+        if args.pair_id is None:
+            raise SystemExit("--pair-id is required with --db")
+        return load_price_history(sqlite3.connect(args.db), args.pair_id, args.since, args.until)
+    raise SystemExit("Provide --prices FILE or --db FILE")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Backtest LazaiTrader trading configs over PriceHistory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_price_source(command):
+        command.add_argument("--prices", metavar="FILE", help="PriceHistory export (.csv or .json)")
+        command.add_argument("--db", metavar="FILE", help="SQLite copy of the D1 database")
+        command.add_argument("--pair-id", type=int, help="PairID to load")
+        command.add_argument("--since", help="First CreatedAt to include (with --db)")
+        command.add_argument("--until", help="Last CreatedAt to include (with --db)")
+        command.add_argument("--base", type=float, default=1.0, help="Starting base token balance (default: 1)")
+        command.add_argument("--quote", type=float, default=0.0, help="Starting quote token balance (default: 0)")
+
+    sweep = commands.add_parser("sweep", help="Simulate a grid of parameter combinations")
+    add_price_source(sweep)
+    sweep.add_argument("--trade-pct", default="0.1", help="TradePercentage values, e.g. 0.05,0.1 or 0.05:0.3:0.05")
+    sweep.add_argument("--trigger-pct", default="0.05", help="TriggerPercentage values")
+    sweep.add_argument("--multiplier", default="1", help="Multiplier values")
+    sweep.add_argument("--min-amount", default="0", help="MinimumAmount values (USD)")
+    sweep.add_argument("--max-amount", default="0", help="MaxAmount values (USD, 0 = no cap)")
+    sweep.add_argument("--top", type=int, default=20, help="Combinations to print (default: 20)")
+    sweep.add_argument("--csv", metavar="FILE", help="Write all combinations to FILE")
+
+    replay = commands.add_parser("replay", help="Print the simulated trade log of one config")
+    add_price_source(replay)
+    replay.add_argument("--config-id", type=int, required=True, help="UserTradingConfigs.ConfigID (requires --db)")
+
+    check = commands.add_parser("crosscheck", help="Verify recorded Trades/TradeMetrics against the worker rules")
+    check.add_argument("--db", metavar="FILE", required=True, help="SQLite copy of the D1 database")
+    check.add_argument("--user-id", type=int, help="Only this user")
+    check.add_argument("--pair-id", type=int, help="Only this pair")
+    check.add_argument("--verbose", action="store_true", help="Print every mismatch")
+
+    return parser.parse_args()
+
+
+def main():
+    """Run the backtester."""
+    args = parse_args()
+
+    if args.command == "crosscheck":
+        bad = cross_check(sqlite3.connect(args.db), args.user_id, args.pair_id, args.verbose)
+        sys.exit(1 if bad else 0)
+
+    if args.command == "replay":
+        if not args.db:
+            raise SystemExit("replay requires --db")
+        config = load_config(sqlite3.connect(args.db), args.config_id)
+        args.pair_id = config["PairID"]
+        params = {key: np.array([float(config[key])]) for key in
+                  ("TradePercentage", "TriggerPercentage", "Multiplier", "MinimumAmount", "MaxAmount")}
+    else:
+        params = build_grid(
+            parse_values(args.trade_pct),
+            parse_values(args.trigger_pct),
+            parse_values(args.multiplier),
+            parse_values(args.min_amount),
+            parse_values(args.max_amount),
+        )
+
+    prices, timestamps = load_prices(args)
+    if len(prices) < 2:
+        raise SystemExit("Need at least 2 price points")
+
+    print(f"Loaded {len(prices)} prices ({timestamps[0]} .. {timestamps[-1]}), "
+          f"{prices.min():.6g} - {prices.max():.6g}")
+
+    started = time.perf_counter()
+    results = simulate(prices, params, args.base, args.quote, record=args.command == "replay")
+    elapsed = time.perf_counter() - started
+    combos = len(params["TradePercentage"])
+    print(f"Simulated {combos} combinations x {len(prices)} ticks in {elapsed:.2f} s")
+
+    if args.command == "replay":
+        for event in results["events"]:
+            print(f"{timestamps[event['tick']]}  {event['action']:<4} {event['outcome']:<10} "
+                  f"price {event['price']:.6g} ({event['percent_change']:+.2f}%)  "
+                  f"consecutive {event['consecutive_count']}  "
+                  f"{event['actual_trade_percentage'] * 100:.2f}%  amount {event['amount']} (${event['amount_usd']:.2f})")
+        print(f"\nFinal: base {results['base'][0]:.6f}, quote {results['quote'][0]:.6f}, "
+              f"value {results['final_value'][0]:.4f} ({results['return_vs_hold'][0] * 100:+.2f}% vs hold)")
+        return
+
+    print_sweep(params, results, args.top)
+    if args.csv:
+        save_sweep(params, results, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Per-Read vs Multicall3 Balance Snapshots (lt_balance_tracker)
+
+Python reference of the balance reader in lt_balance_tracker/worker.js, run
+against a local EVM funded with thousands of test wallets:
+    - single:    one balanceOf eth_call / eth_getBalance per wallet x token, in
+                 sequence (the old processBalanceSnapshots loop)
+    - multicall: all reads of the chain grouped into Multicall3 aggregate3 calls
+                 of --page-size reads (allowFailure per read), pages sent
+                 concurrently, a failed page falling back to single reads
+
+Both readers must return the same balances. The baseline part builds a SQLite
+copy of database/schema.sql with the same wallets and compares the latest-snapshot
+query the tracker ran before migration 006 with the getExpectedBalances ledger
+read it runs now.
+
+The local EVM is contracts/deployer/devnet.py (py-evm via eth-tester behind a
+JSON-RPC HTTP endpoint) with optional artificial latency. --rpc-url uses an
+external node instead (anvil, hardhat); its first unlocked account pays for the setup.
+
+Usage:
+    1. Install dependencies: pip install web3 py-solc-x "eth-tester[py-evm]"
+    2. Run: python bench_balance_reader.py --wallets 2000 --tokens 3
+       Remote-like RPC: python bench_balance_reader.py --wallets 5000 --latency-ms 50 --page-size 250,500,1000
+       Against anvil: anvil --gas-limit 300000000 & python bench_balance_reader.py --rpc-url http://127.0.0.1:8545
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_account import Account
+from eth_utils import keccak, to_checksum_address
+from solcx import compile_standard, get_installed_solc_versions, install_solc
+from web3 import Web3
+
+from loadtest_pipeline import apply_migrations
+
+# The in-process devnet is shared with the deployer benchmark
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "contracts", "deployer"))
+from devnet import DevnetNode
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "schema.sql")
+
+SOLC_VERSION = "0.8.20"
+
+# Tokens with this address are the chain's native currency (same as the worker)
+NATIVE_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Recipients per funding / minting transaction
+FUNDING_BATCH = 200
+
+# Minimal Multicall3 (aggregate3 + getEthBalance, same ABI as the canonical
+# deployment) and test helpers to fund wallets in bulk
+BENCH_SOURCE = """
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+contract Multicall3 {
+    struct Call3 { address target; bool allowFailure; bytes callData; }
+    struct Result { bool success; bytes returnData; }
+
+    function aggregate3(Call3[] calldata calls) public payable returns (Result[] memory returnData) {
+        returnData = new Result[](calls.length);
+        for (uint256 i = 0; i < calls.length; i++) {
+            Call3 calldata calli = calls[i];
+            (bool success, bytes memory ret) = calli.target.call(calli.callData);
+            require(success || calli.allowFailure, "Multicall3: call failed");
+            returnData[i] = Result(success, ret);
+        }
+    }
+
+    function getEthBalance(address addr) public view returns (uint256 balance) {
+        balance = addr.balance;
+    }
+}
+
+contract BenchToken {
+    mapping(address => uint256) public balanceOf;
+
+    function mintBatch(address[] calldata to, uint256 amount) external {
+        for (uint256 i = 0; i < to.length; i++) {
+            balanceOf[to[i]] += amount;
+        }
+    }
+}
+
+contract BenchFunder {
+    function fund(address[] calldata to) external payable {
+        uint256 amount = msg.value / to.length;
+        for (uint256 i = 0; i < to.length; i++) {
+            payable(to[i]).transfer(amount);
+        }
+    }
+}
+"""
+
+BALANCE_OF_SELECTOR = keccak(text="balanceOf(address)")[:4]
+GET_ETH_BALANCE_SELECTOR = keccak(text="getEthBalance(address)")[:4]
+AGGREGATE3_SELECTOR = keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+
+# =============================================================================
+# JSON-RPC CLIENT
+# =============================================================================
+
+class RpcClient:
+    """Thread-safe JSON-RPC client with one keep-alive session per thread and call counters."""
+
+    def __init__(self, rpc_url):
+        self.rpc_url = rpc_url
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+
+    def call(self, method, params):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        with self.lock:
+            self.requests += 1
+        reply = session.post(
+            self.rpc_url,
+            json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
+            timeout=120,
+        ).json()
+        if "error" in reply:
+            raise RuntimeError(reply["error"].get("message", str(reply["error"])))
+        return reply["result"]
+
+    def eth_call(self, to, data):
+        result = self.call("eth_call", [{"to": to, "data": "0x" + data.hex()}, "latest"])
+        return bytes.fromhex(result[2:])
+
+
+# =============================================================================
+# BALANCE READERS (kept in sync with lt_balance_tracker/worker.js)
+# =============================================================================
+
+def is_native_token(token_address):
+    return token_address.lower() == NATIVE_TOKEN_ADDRESS
+
+
+def format_units(raw, decimals):
+    """ethers.formatUnits followed by parseFloat."""
+    return float(raw) / 10 ** decimals
+
+
+def fetch_token_balance(rpc, token, wallet):
+    """fetchTokenBalance: one read, None if it failed."""
+    try:
+        if is_native_token(token["TokenAddress"]):
+            raw = int(rpc.call("eth_getBalance", [wallet, "latest"]), 16)
+        else:
+            data = rpc.eth_call(token["TokenAddress"], BALANCE_OF_SELECTOR + abi_encode(["address"], [wallet]))
+            raw = abi_decode(["uint256"], data)[0]
+        return format_units(raw, token["Decimals"])
+    except Exception:
+        return None
+
+
+def read_single(rpc, wallets, tokens):
+    """Old loop: one read per wallet x token, awaited in sequence."""
+    return {
+        (wallet, token["TokenID"]): fetch_token_balance(rpc, token, wallet)
+        for wallet in wallets
+        for token in tokens
+    }
+
+
+def read_multicall(rpc, multicall_address, wallets, tokens, page_size, concurrency):
+    """fetchChainBalances: Multicall3 aggregate3 pages, sent concurrently."""
+    reads = []
+    for wallet in wallets:
+        encoded_wallet = abi_encode(["address"], [wallet])
+        for token in tokens:
+            if is_native_token(token["TokenAddress"]):
+                call = (multicall_address, True, GET_ETH_BALANCE_SELECTOR + encoded_wallet)
+            else:
+                call = (token["TokenAddress"], True, BALANCE_OF_SELECTOR + encoded_wallet)
+            reads.append((wallet, token, call))
+
+    pages = [reads[i:i + page_size] for i in range(0, len(reads), page_size)]
+    balances = {}
+
+    def read_page(page):
+        data = AGGREGATE3_SELECTOR + abi_encode(["(address,bool,bytes)[]"], [[call for _, _, call in page]])
+        try:
+            results = abi_decode(["(bool,bytes)[]"], rpc.eth_call(multicall_address, data))[0]
+        except Exception:
+            return {(wallet, token["TokenID"]): fetch_token_balance(rpc, token, wallet) for wallet, token, _ in page}
+
+        page_balances = {}
+        for (wallet, token, _), (success, return_data) in zip(page, results):
+            # A call to an address without code succeeds with empty return data
+            if success and len(return_data) >= 32:
+                page_balances[(wallet, token["TokenID"])] = format_units(
+                    abi_decode(["uint256"], return_data[:32])[0], token["Decimals"]
+                )
+            else:
+                page_balances[(wallet, token["TokenID"])] = None
+        return page_balances
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for page_balances in executor.map(read_page, pages):
+            balances.update(page_balances)
+    return balances
+
+
+# =============================================================================
+# LOCAL DEVNET
+# =============================================================================
+
+def compile_bench_contracts():
+    """Compile BENCH_SOURCE; returns {name: (abi, bytecode)}."""
+    if SOLC_VERSION not in [str(v) for v in get_installed_solc_versions()]:
+        install_solc(SOLC_VERSION)
+    compiled = compile_standard({
+        "language": "Solidity",
+        "sources": {"Bench.sol": {"content": BENCH_SOURCE}},
+        "settings": {
+            "optimizer": {"enabled": True, "runs": 200},
+            "evmVersion": "paris",
+            "outputSelection": {"*": {"*": ["abi", "evm.bytecode.object"]}},
+        },
+    }, solc_version=SOLC_VERSION)
+    return {
+        name: (data["abi"], data["evm"]["bytecode"]["object"])
+        for name, data in compiled["contracts"]["Bench.sol"].items()
+    }
+
+
+def setup_chain(rpc_url, wallet_count, token_count, dead_tokens, seed):
+    """Deploy Multicall3 and test tokens, fund wallet_count wallets; returns (multicall, wallets, tokens)."""
+    w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 300}))
+    funder_account = w3.eth.accounts[0]
+    contracts = compile_bench_contracts()
+    rng = random.Random(seed)
+
+    def deploy(name):
+        abi, bytecode = contracts[name]
+        tx_hash = w3.eth.contract(abi=abi, bytecode=bytecode).constructor().transact({"from": funder_account})
+        address = w3.eth.wait_for_transaction_receipt(tx_hash)["contractAddress"]
+        return w3.eth.contract(address=address, abi=abi)
+
+    multicall = deploy("Multicall3")
+    funder = deploy("BenchFunder")
+
+    # About one wallet in ten stays empty, as fresh SCWs do
+    wallets = [Account.create().address for _ in range(wallet_count)]
+    funded = [wallet for wallet in wallets if rng.random() >= 0.1]
+
+    tokens = [{"TokenID": 1, "Symbol": "NATIVE", "TokenAddress": NATIVE_TOKEN_ADDRESS, "Decimals": 18}]
+    for i in range(token_count):
+        token = deploy("BenchToken")
+        tokens.append({"TokenID": len(tokens) + 1, "Symbol": f"TKN{i}", "TokenAddress": token.address,
+                       "Decimals": 6 if i % 2 else 18})
+        for start in range(0, len(funded), FUNDING_BATCH):
+            batch = funded[start:start + FUNDING_BATCH]
+            amount = rng.randint(1, 10**6) * 10 ** tokens[-1]["Decimals"] // 1000
+            w3.eth.wait_for_transaction_receipt(
+                token.functions.mintBatch(batch, amount).transact({"from": funder_account})
+            )
+
+    # Active Tokens rows whose address has no code (misconfigured or wrong chain)
+    for i in range(dead_tokens):
+        tokens.append({"TokenID": len(tokens) + 1, "Symbol": f"DEAD{i}",
+                       "TokenAddress": Account.create().address, "Decimals": 18})
+
+    for start in range(0, len(funded), FUNDING_BATCH):
+        batch = funded[start:start + FUNDING_BATCH]
+        value = Web3.to_wei(rng.randint(1, 1000), "gwei") * len(batch)
+        w3.eth.wait_for_transaction_receipt(
+            funder.functions.fund(batch).transact({"from": funder_account, "value": value})
+        )
+
+    return to_checksum_address(multicall.address), wallets, tokens
+
+
+# =============================================================================
+# BASELINE BALANCES (kept in sync with shared/userStats.js)
+# =============================================================================
+
+# Latest snapshot per user x token: the baseline lt_balance_tracker read before
+# migration 006_balance_ledger.sql
+PREVIOUS_SNAPSHOTS_SQL = """
+    SELECT ub.UserID, ub.TokenID, ub.Balance
+    FROM Users u
+    CROSS JOIN Tokens t
+    INNER JOIN UserBalances ub ON ub.BalanceID = (
+      SELECT b.BalanceID
+      FROM UserBalances b
+      WHERE b.UserID = u.UserID AND b.TokenID = t.TokenID
+      ORDER BY b.CreatedAt DESC
+      LIMIT 1
+    )
+    WHERE u.IsActive = 1 AND u.SCWAddress IS NOT NULL
+      AND t.IsActive = 1
+"""
+
+# getExpectedBalances: the running ledger it reads since
+EXPECTED_BALANCES_SQL = """
+    SELECT UserID, TokenID, ExpectedBalance
+    FROM UserTokenStats
+    WHERE ExpectedBalance IS NOT NULL
+"""
+
+
+def create_snapshot_database(path, wallets, tokens, history, seed):
+    """
+    Create schema.sql in a fresh SQLite file with one user per wallet and history
+    snapshots each, then replay the migrations so 006's backfill seeds
+    UserTokenStats.ExpectedBalance from the latest snapshots.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_FILE, "r") as f:
+        conn.executescript(f.read())
+
+    rng = random.Random(seed)
+    conn.execute(
+        "INSERT INTO Chains (ChainID, ChainName, RPCEndpoint, ExplorerURL, NativeCurrency) VALUES (1, 'Devnet', 'http://127.0.0.1', 'http://127.0.0.1', 'ETH')"
+    )
+    conn.executemany(
+        "INSERT INTO Tokens (TokenID, ChainID, Symbol, TokenAddress, Decimals) VALUES (?, 1, ?, ?, ?)",
+        [(t["TokenID"], t["Symbol"], t["TokenAddress"], t["Decimals"]) for t in tokens],
+    )
+    conn.executemany(
+        "INSERT INTO Users (UserID, UserWallet, SCWAddress, TelegramChatID, RegisteredAt) VALUES (?, ?, ?, ?, '2025-01-01 00:00:00')",
+        [(i + 1, f"0xowner{i:034x}", wallet, str(1000000 + i)) for i, wallet in enumerate(wallets)],
+    )
+    conn.executemany(
+        "INSERT INTO UserBalances (UserID, TokenID, Balance, CreatedAt) VALUES (?, ?, ?, ?)",
+        [(user_id, token["TokenID"], rng.uniform(0, 1000), f"2025-01-{1 + n:02d} 00:00:00")
+         for n in range(history)
+         for user_id in range(1, len(wallets) + 1)
+         for token in tokens],
+    )
+    conn.commit()
+    apply_migrations(conn)
+    conn.execute("ANALYZE")
+    return conn
+
+
+def measure_baselines(conn, rtt):
+    """Time the snapshot query against the ledger read; both must return the same balances."""
+    started = time.perf_counter()
+    snapshots = {(row[0], row[1]): row[2] for row in conn.execute(PREVIOUS_SNAPSHOTS_SQL)}
+    snapshot_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ledger = {(row[0], row[1]): row[2] for row in conn.execute(EXPECTED_BALANCES_SQL)}
+    ledger_seconds = time.perf_counter() - started
+
+    return [
+        ("snapshots", len(snapshots), snapshot_seconds, snapshot_seconds * 1000 + rtt),
+        ("ledger", len(ledger), ledger_seconds, ledger_seconds * 1000 + rtt),
+    ], snapshots == ledger
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def time_reader(rpc, reader):
+    rpc.reset()
+    started = time.perf_counter()
+    balances = reader()
+    return balances, time.perf_counter() - started, rpc.requests
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Compare per-read and Multicall3 balance snapshot reads on a local EVM")
+    parser.add_argument("--wallets", type=int, default=2000, help="Funded test wallets (default: 2000)")
+    parser.add_argument("--tokens", type=int, default=3, help="ERC20 tokens besides the native currency (default: 3)")
+    parser.add_argument("--dead-tokens", type=int, default=1, help="Token rows without contract code (default: 1)")
+    parser.add_argument("--page-size", default="100,500,1000", help="Comma-separated Multicall3 page sizes")
+    parser.add_argument("--concurrency", type=int, default=6, help="Multicall pages in flight (default: 6)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Artificial RPC latency of the local devnet (default: 0)")
+    parser.add_argument("--rpc-url", help="Use this node instead of an in-process devnet")
+    parser.add_argument("--skip-single", action="store_true", help="Do not run the per-read baseline")
+    parser.add_argument("--history", type=int, default=5, help="Snapshots per wallet x token in the SQLite part (default: 5)")
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Assumed D1 round trip per query (default: 5)")
+    parser.add_argument("--db", default="bench_balance_reader.db", help="Scratch database file")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    return parser.parse_args()
+
+
+def main():
+    """Set up the chain, then time both readers and both baseline reads."""
+    args = parse_args()
+
+    node = None if args.rpc_url else DevnetNode().start()
+    rpc_url = args.rpc_url or node.rpc_url
+    try:
+        print(f"Funding {args.wallets} wallets with {args.tokens} tokens on {rpc_url}...")
+        started = time.perf_counter()
+        multicall, wallets, tokens = setup_chain(rpc_url, args.wallets, args.tokens, args.dead_tokens, args.seed)
+        print(f"Setup done in {time.perf_counter() - started:.1f} s, Multicall3 at {multicall}")
+
+        # Latency only applies to the measured reads
+        if node:
+            node.latency = args.latency_ms / 1000
+        rpc = RpcClient(rpc_url)
+        reads = len(wallets) * len(tokens)
+
+        print(f"\n{'reader':>16} {'reads':>7} {'requests':>9} {'seconds':>9} {'reads/s':>9}")
+        reference = None
+        if not args.skip_single:
+            reference, seconds, requests_sent = time_reader(rpc, lambda: read_single(rpc, wallets, tokens))
+            print(f"{'single':>16} {reads:>7} {requests_sent:>9} {seconds:>9.2f} {reads / seconds:>9.0f}")
+
+        for page_size in (int(x) for x in args.page_size.split(",")):
+            balances, seconds, requests_sent = time_reader(
+                rpc, lambda: read_multicall(rpc, multicall, wallets, tokens, page_size, args.concurrency)
+            )
+            name = f"multicall/{page_size}"
+            print(f"{name:>16} {reads:>7} {requests_sent:>9} {seconds:>9.2f} {reads / seconds:>9.0f}")
+            if reference is None:
+                reference = balances
+            elif balances != reference:
+                print(f"{name:>16} MISMATCH: balances differ from the previous reader")
+    finally:
+        if node:
+            node.stop()
+
+    print(f"\n{'baseline':>16} {'rows':>9} {'sqlite ms':>10} {'est. ms':>10}")
+    conn = create_snapshot_database(args.db, wallets, tokens, args.history, args.seed)
+    results, same = measure_baselines(conn, args.rtt_ms)
+    conn.close()
+    os.remove(args.db)
+    for name, rows, seconds, estimated in results:
+        print(f"{name:>16} {rows:>9} {seconds * 1000:>10.1f} {estimated:>10.1f}")
+    if not same:
+        print(f"{'':>16} MISMATCH: snapshot query and ledger returned different balances")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Per-Config Loop vs Set-Based Trigger Evaluation (lt_trader_queue)
+
+Builds a SQLite database from database/schema.sql, seeds it with N active configs
+(with trade history and price ticks), and runs both versions of processConfigs'
+database access:
+    - loop: configs query, then getCachedPrice + getLastTrade per config and
+      getFullConfigDetails (2 queries) per triggered config
+    - set:  getActiveConfigs (one joined query) + getCachedPriceMap, triggers in memory
+
+Reports query counts, local SQLite time and an estimate including a D1 round trip
+per query (--rtt-ms), and checks both paths trigger the same configs.
+
+Usage:
+    python bench_trigger_queries.py --configs 10000,50000,100000 --rtt-ms 5
+"""
+
+import argparse
+import os
+import random
+import re
+import sqlite3
+import time
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "schema.sql")
+
+PAIRS = [
+    ("ETH-USDC", "ETH", "USDC", 3000.0),
+    ("BTC-USDC", "BTC", "USDC", 90000.0),
+    ("METIS-USDC", "METIS", "USDC", 20.0),
+    ("tgETH-tgUSDC", "tgETH", "tgUSDC", 3000.0),
+]
+CHAINS = [(1088, "Metis"), (48900, "Zircuit"), (133718, "Hyperion Testnet")]
+
+
+# =============================================================================
+# QUERIES (kept in sync with lt_trader_queue/worker.js)
+# =============================================================================
+
+LOOP_CONFIGS_SQL = """
+    SELECT
+      utc.ConfigID, utc.UserID, utc.PairID, utc.TradePercentage, utc.TriggerPercentage,
+      utc.MaxAmount, utc.MinimumAmount, utc.Multiplier,
+      u.TelegramChatID, u.SCWAddress, u.UserWallet,
+      tp.PairName, tp.ChainID, tp.DEXAddress, tp.DEXType
+    FROM UserTradingConfigs utc
+    INNER JOIN Users u ON utc.UserID = u.UserID
+    INNER JOIN TradingPairs tp ON utc.PairID = tp.PairID
+    WHERE utc.IsActive = 1 AND u.IsActive = 1 AND tp.IsActive = 1
+"""
+
+CACHED_PRICE_SQL = """
+    SELECT Price, Provider, FetchedAt FROM CachedPrices
+    WHERE BasePairSymbol = ?
+"""
+
+LAST_TRADE_SQL = """
+    SELECT t.TradeID, t.Action, ph.Price, t.CreatedAt
+    FROM Trades t
+    INNER JOIN PriceHistory ph ON t.PriceID = ph.PriceID
+    WHERE t.UserID = ? AND t.PairID = ?
+    ORDER BY t.CreatedAt DESC
+    LIMIT 1
+"""
+
+CHAIN_SQL = "SELECT * FROM Chains WHERE ChainID = ?"
+
+PAIR_DETAILS_SQL = """
+    SELECT
+      tp.*,
+      bt.TokenID AS BaseTokenID, bt.Symbol AS BaseSymbol, bt.TokenAddress AS BaseTokenAddress, bt.Decimals AS BaseDecimals,
+      qt.TokenID AS QuoteTokenID, qt.Symbol AS QuoteSymbol, qt.TokenAddress AS QuoteTokenAddress, qt.Decimals AS QuoteDecimals
+    FROM TradingPairs tp
+    INNER JOIN Tokens bt ON tp.BaseTokenID = bt.TokenID
+    INNER JOIN Tokens qt ON tp.QuoteTokenID = qt.TokenID
+    WHERE tp.PairID = ?
+"""
+
+CACHED_PRICE_MAP_SQL = "SELECT BasePairSymbol, Price, Provider, FetchedAt FROM CachedPrices"
+
+ACTIVE_CONFIGS_SQL = """
+    SELECT
+      utc.ConfigID, utc.UserID, utc.PairID, utc.TradePercentage, utc.TriggerPercentage,
+      utc.MaxAmount, utc.MinimumAmount, utc.Multiplier,
+      u.TelegramChatID, u.SCWAddress, u.UserWallet,
+      tp.PairName, tp.ChainID, tp.DEXAddress, tp.DEXType,
+      c.ChainName, c.RPCEndpoint, c.ExplorerURL, c.NativeCurrency,
+      bt.TokenID AS BaseTokenID, bt.Symbol AS BaseSymbol, bt.TokenAddress AS BaseTokenAddress, bt.Decimals AS BaseDecimals,
+      qt.TokenID AS QuoteTokenID, qt.Symbol AS QuoteSymbol, qt.TokenAddress AS QuoteTokenAddress, qt.Decimals AS QuoteDecimals,
+      lt.TradeID AS LastTradeID, lt.Action AS LastTradeAction, lph.Price AS LastTradePrice
+    FROM UserTradingConfigs utc
+    INNER JOIN Users u ON utc.UserID = u.UserID
+    INNER JOIN TradingPairs tp ON utc.PairID = tp.PairID
+    INNER JOIN Chains c ON tp.ChainID = c.ChainID
+    INNER JOIN Tokens bt ON tp.BaseTokenID = bt.TokenID
+    INNER JOIN Tokens qt ON tp.QuoteTokenID = qt.TokenID
+    LEFT JOIN Trades lt ON lt.TradeID = (
+      SELECT t.TradeID
+      FROM Trades t
+      INNER JOIN PriceHistory ph ON t.PriceID = ph.PriceID
+      WHERE t.UserID = utc.UserID AND t.PairID = utc.PairID
+      ORDER BY t.CreatedAt DESC
+      LIMIT 1
+    )
+    LEFT JOIN PriceHistory lph ON lt.PriceID = lph.PriceID
+    WHERE utc.IsActive = 1 AND u.IsActive = 1 AND tp.IsActive = 1
+"""
+
+
+def normalize_base_pair_symbol(pair_name):
+    """normalizeBasePairSymbol without the tokenMappings lookup."""
+    normalized = re.sub(r"^tg", "", pair_name, flags=re.I)
+    normalized = re.sub(r"-tg", "-", normalized, flags=re.I)
+    normalized = re.sub(r"^t", "", normalized, flags=re.I)
+    normalized = re.sub(r"-t", "-", normalized, flags=re.I)
+    return normalized.upper()
+
+
+def check_trigger_condition(current_price, last_trade_price, trigger_percentage):
+    """checkTriggerCondition: (triggered, action), or None for an invalid last price."""
+    if not last_trade_price or last_trade_price <= 0:
+        return None
+    percent_change = ((current_price - last_trade_price) / last_trade_price) * 100
+    if abs(percent_change) >= trigger_percentage * 100:
+        return True, "SELL" if percent_change > 0 else "BUY"
+    return False, None
+
+
+# =============================================================================
+# SEEDING
+# =============================================================================
+
+def create_database(path, configs, trades_per_config, seed):
+    """Create schema.sql in a fresh SQLite file and seed configs, trades and prices."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_FILE, "r") as f:
+        conn.executescript(f.read())
+
+    rng = random.Random(seed)
+    conn.executemany(
+        "INSERT INTO Chains (ChainID, ChainName, RPCEndpoint, ExplorerURL, NativeCurrency) VALUES (?, ?, ?, ?, ?)",
+        [(chain_id, name, f"https://rpc.{chain_id}.example", f"https://explorer.{chain_id}.example", "ETH")
+         for chain_id, name in CHAINS],
+    )
+
+    pair_ids = []
+    for chain_id, _ in CHAINS:
+        for pair_name, base, quote, _ in PAIRS:
+            token_ids = []
+            for symbol in (base, quote):
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO Tokens (ChainID, Symbol, TokenAddress, Decimals) VALUES (?, ?, ?, 18)",
+                    (chain_id, symbol, f"0x{chain_id:08x}{symbol.encode().hex():0>32}"),
+                )
+                token_ids.append(cur.lastrowid if cur.rowcount else conn.execute(
+                    "SELECT TokenID FROM Tokens WHERE ChainID = ? AND Symbol = ?", (chain_id, symbol)).fetchone()[0])
+            cur = conn.execute(
+                "INSERT INTO TradingPairs (ChainID, PairName, BaseTokenID, QuoteTokenID, DEXAddress, DEXType) VALUES (?, ?, ?, ?, ?, 'LazaiSwap')",
+                (chain_id, pair_name, token_ids[0], token_ids[1], f"0xdex{chain_id}"),
+            )
+            pair_ids.append((cur.lastrowid, pair_name))
+
+    reference_prices = {name: price for name, _, _, price in PAIRS}
+    current_prices = {}
+    for name, price in reference_prices.items():
+        current_prices[normalize_base_pair_symbol(name)] = price * rng.uniform(0.97, 1.03)
+    conn.executemany(
+        "INSERT OR REPLACE INTO CachedPrices (BasePairSymbol, Price, Provider) VALUES (?, ?, 'bench')",
+        list(current_prices.items()),
+    )
+
+    # Users hold one to three configs on different pairs
+    users = []
+    config_rows = []
+    user_id = 0
+    while len(config_rows) < configs:
+        user_id += 1
+        users.append((user_id, f"0xuser{user_id:036x}", f"0xscw{user_id:037x}", str(1000000 + user_id), "2025-01-01 00:00:00"))
+        for pair_id, pair_name in rng.sample(pair_ids, rng.randint(1, 3)):
+            if len(config_rows) >= configs:
+                break
+            config_rows.append((user_id, pair_id, pair_name, rng.choice([0.05, 0.1, 0.2]),
+                                rng.choice([0.01, 0.02, 0.05, 0.1]), 500.0, 5.0, rng.choice([1.0, 1.5])))
+    conn.executemany(
+        "INSERT INTO Users (UserID, UserWallet, SCWAddress, TelegramChatID, RegisteredAt) VALUES (?, ?, ?, ?, ?)",
+        users,
+    )
+    conn.executemany(
+        "INSERT INTO UserTradingConfigs (UserID, PairID, TradePercentage, TriggerPercentage, MaxAmount, MinimumAmount, Multiplier) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(u, p, tp, trig, mx, mn, m) for u, p, _, tp, trig, mx, mn, m in config_rows],
+    )
+
+    # Trade history: every config gets trades_per_config trades (some none -> new user path)
+    price_rows = []
+    trade_rows = []
+    price_id = 0
+    trade_id = 0
+    for index, (user, pair_id, pair_name, *_rest) in enumerate(config_rows):
+        if rng.random() < 0.02:
+            continue
+        base_price = reference_prices[pair_name]
+        for n in range(trades_per_config):
+            price_id += 1
+            trade_id += 1
+            created = f"2025-{1 + n % 12:02d}-{1 + index % 28:02d} {index % 24:02d}:{n % 60:02d}:{index % 60:02d}"
+            price_rows.append((price_id, pair_id, base_price * rng.uniform(0.9, 1.1), created))
+            trade_rows.append((trade_id, pair_id, user, price_id, rng.choice(["BUY", "SELL"]), 1.0, 1.0, f"0x{trade_id:064x}", created))
+    conn.executemany("INSERT INTO PriceHistory (PriceID, PairID, Price, CreatedAt) VALUES (?, ?, ?, ?)", price_rows)
+    conn.executemany(
+        "INSERT INTO Trades (TradeID, PairID, UserID, PriceID, Action, QuantitySent, QuantityReceived, TxHash, CreatedAt) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        trade_rows,
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+
+# =============================================================================
+# EVALUATION PATHS
+# =============================================================================
+
+class CountingConnection:
+    """Counts statements sent to the database (each one is a D1 round trip)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queries = 0
+
+    def all(self, sql, params=()):
+        self.queries += 1
+        return self.conn.execute(sql, params).fetchall()
+
+    def first(self, sql, params=()):
+        self.queries += 1
+        return self.conn.execute(sql, params).fetchone()
+
+
+def run_loop(db):
+    """Current processConfigs: per-config lookups."""
+    triggered = {}
+    for config in db.all(LOOP_CONFIGS_SQL):
+        cached = db.first(CACHED_PRICE_SQL, (normalize_base_pair_symbol(config["PairName"]),))
+        if not cached:
+            continue
+        last_trade = db.first(LAST_TRADE_SQL, (config["UserID"], config["PairID"]))
+        if not last_trade:
+            continue
+        result = check_trigger_condition(cached["Price"], last_trade["Price"], config["TriggerPercentage"])
+        if not result or not result[0]:
+            continue
+        db.first(CHAIN_SQL, (config["ChainID"],))
+        db.first(PAIR_DETAILS_SQL, (config["PairID"],))
+        triggered[config["ConfigID"]] = (result[1], last_trade["TradeID"])
+    return triggered
+
+
+def run_set(db):
+    """Set-based processConfigs: two queries, triggers evaluated in memory."""
+    prices = {row["BasePairSymbol"]: row for row in db.all(CACHED_PRICE_MAP_SQL)}
+    triggered = {}
+    for config in db.all(ACTIVE_CONFIGS_SQL):
+        cached = prices.get(normalize_base_pair_symbol(config["PairName"]))
+        if not cached or not config["LastTradeID"]:
+            continue
+        result = check_trigger_condition(cached["Price"], config["LastTradePrice"], config["TriggerPercentage"])
+        if not result or not result[0]:
+            continue
+        triggered[config["ConfigID"]] = (result[1], config["LastTradeID"])
+    return triggered
+
+
+def measure(conn, func, rtt):
+    db = CountingConnection(conn)
+    started = time.perf_counter()
+    triggered = func(db)
+    elapsed = time.perf_counter() - started
+    return {
+        "queries": db.queries,
+        "local_ms": elapsed * 1000,
+        "estimated_ms": elapsed * 1000 + db.queries * rtt,
+        "triggered": triggered,
+    }
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Compare per-config and set-based trigger evaluation on SQLite")
+    parser.add_argument("--configs", default="10000,50000,100000", help="Comma-separated config counts")
+    parser.add_argument("--trades-per-config", type=int, default=5, help="Trade history per config (default: 5)")
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Assumed D1 round trip per query (default: 5)")
+    parser.add_argument("--db", default="bench_trigger_queries.db", help="Scratch database file")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark for every requested size."""
+    args = parse_args()
+
+    print(f"{'configs':>8} {'path':>5} {'queries':>8} {'sqlite ms':>10} {'est. ms':>10} {'triggered':>9}")
+    for size in (int(x) for x in args.configs.split(",")):
+        conn = create_database(args.db, size, args.trades_per_config, args.seed)
+        conn.row_factory = sqlite3.Row
+        loop = measure(conn, run_loop, args.rtt_ms)
+        set_based = measure(conn, run_set, args.rtt_ms)
+        conn.close()
+
+        for name, result in (("loop", loop), ("set", set_based)):
+            print(f"{size:>8} {name:>5} {result['queries']:>8} {result['local_ms']:>10.1f} "
+                  f"{result['estimated_ms']:>10.1f} {len(result['triggered']):>9}")
+        if loop["triggered"] != set_based["triggered"]:
+            print(f"{size:>8} MISMATCH: loop and set-based paths triggered different configs")
+
+    os.remove(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,820 @@
+#!/usr/bin/env python3
+"""
+Load Test: Trading Pipeline on Synthetic Users (lt_trader_queue -> lt_trader_execute)
+
+Builds a scratch SQLite database from database/schema.sql and database/migrations,
+seeds N synthetic users with trading configs, trade history and PriceHistory, and
+runs the producer's cron tick against it, one simulated minute per tick:
+    - pairs:   getActivePairs
+    - prices:  stand-in price feed (random walk per base pair) -> CachedPrices upsert,
+               one PriceHistory insert per pair, endpoint stats batch
+    - configs: getActiveConfigs + getCachedPriceMap, reference trades for new configs,
+               trigger evaluation, sendBatch (100 messages) into an in-memory queue
+    - rollup:  rollupPriceHistory (state query + candle batch)
+A stand-in consumer drains the queue at --consumer-rate messages per minute,
+re-validates each trigger like lt_trader_execute and records the trade, so last
+trade prices move as they do in production. No swaps or RPC calls are made.
+
+Reports harness ticks/s, statements and D1 round trips per tick, messages per tick,
+queue depth, and an estimated tick duration: SQLite time + --rtt-ms per round trip
++ --price-latency-ms for the (concurrent) price fetches + --queue-rtt-ms per sendBatch.
+--find-limit searches for the user count where the estimated tick exceeds the
+cron interval (--budget-s, default 60).
+
+Usage:
+    python loadtest_pipeline.py --users 1000,10000,50000 --ticks 30
+    python loadtest_pipeline.py --users 20000 --ticks 60 --volatility 0.005 --consumer-rate 10
+    python loadtest_pipeline.py --find-limit --rtt-ms 5 --new-share 0.02 --ticks 3
+"""
+
+import argparse
+import csv
+import glob
+import math
+import os
+import random
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from bench_trigger_queries import (
+    ACTIVE_CONFIGS_SQL,
+    CACHED_PRICE_MAP_SQL,
+    CHAINS,
+    PAIRS,
+    SCHEMA_FILE,
+    check_trigger_condition,
+    normalize_base_pair_symbol,
+)
+from trace_report import percentile
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "migrations")
+
+# Simulated clock: tick n runs at SIM_START + n minutes, seeded history ends at SIM_START
+SIM_START = datetime(2026, 1, 1)
+
+# Cloudflare Queue sendBatch limit (processConfigs batch size)
+QUEUE_BATCH_SIZE = 100
+
+# rollupPriceHistory
+ROLLUP_NAME = "PriceCandles"
+ROLLUP_BATCH_SIZE = 10000
+ROLLUP_RESOLUTIONS = [
+    ("1m", "strftime('%Y-%m-%d %H:%M:00', CreatedAt)"),
+    ("1h", "strftime('%Y-%m-%d %H:00:00', CreatedAt)"),
+    ("1d", "strftime('%Y-%m-%d 00:00:00', CreatedAt)"),
+]
+
+# Errors of migration statements already reflected in schema.sql
+ALREADY_APPLIED = ("duplicate column name", "already exists")
+
+
+# =============================================================================
+# QUERIES (kept in sync with lt_trader_queue/worker.js and shared/*.js)
+# =============================================================================
+# CreatedAt / FetchedAt are bound to the simulated clock instead of datetime('now'),
+# so "latest trade" ordering stays correct when many ticks run within a second.
+
+ACTIVE_PAIRS_SQL = """
+    SELECT DISTINCT
+      tp.PairID, tp.PairName, tp.ChainID,
+      bt.Symbol AS BaseSymbol, qt.Symbol AS QuoteSymbol
+    FROM TradingPairs tp
+    INNER JOIN UserTradingConfigs utc ON tp.PairID = utc.PairID
+    INNER JOIN Users u ON utc.UserID = u.UserID
+    INNER JOIN Tokens bt ON tp.BaseTokenID = bt.TokenID
+    INNER JOIN Tokens qt ON tp.QuoteTokenID = qt.TokenID
+    WHERE tp.IsActive = 1 AND utc.IsActive = 1 AND u.IsActive = 1
+"""
+
+ENDPOINTS_SQL = """
+    SELECT * FROM PriceAPIEndpoints
+    WHERE IsActive = 1
+    ORDER BY BasePairSymbol, Priority ASC
+"""
+
+ENDPOINT_SUCCESS_SQL = """
+    UPDATE PriceAPIEndpoints
+    SET LastSuccessAt = ?, ConsecutiveFailures = 0, UpdatedAt = ?
+    WHERE EndpointID = ?
+"""
+
+CACHE_PRICE_SQL = """
+    INSERT INTO CachedPrices (BasePairSymbol, Price, Provider, FetchedAt)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(BasePairSymbol) DO UPDATE SET
+      Price = excluded.Price,
+      Provider = excluded.Provider,
+      FetchedAt = excluded.FetchedAt
+"""
+
+INSERT_PRICE_SQL = "INSERT INTO PriceHistory (PairID, Price, CreatedAt) VALUES (?, ?, ?)"
+
+PAIR_TOKENS_SQL = "SELECT BaseTokenID, QuoteTokenID FROM TradingPairs WHERE PairID = ?"
+
+INSERT_TRADE_SQL = """
+    INSERT INTO Trades (PairID, UserID, PriceID, Action, TokenSent, TokenReceived, QuantitySent, QuantityReceived, TxHash, CreatedAt)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# shared/userStats.js tradeStatsStatement
+TRADE_STATS_SQL = """
+    INSERT INTO UserPairStats (
+      UserID, PairID, BuyCount, SellCount, BaseVolume, QuoteVolume,
+      PositionBase, PositionCost, RealizedPnL, FirstTradeAt, LastTradeAt, UpdatedAt
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+    ON CONFLICT(UserID, PairID) DO UPDATE SET
+      BuyCount = BuyCount + excluded.BuyCount,
+      SellCount = SellCount + excluded.SellCount,
+      BaseVolume = BaseVolume + excluded.BaseVolume,
+      QuoteVolume = QuoteVolume + excluded.QuoteVolume,
+      RealizedPnL = RealizedPnL + CASE
+        WHEN excluded.SellCount > 0 AND PositionBase > 0 AND excluded.BaseVolume > 0
+        THEN MIN(excluded.BaseVolume, PositionBase) * (excluded.QuoteVolume / excluded.BaseVolume - PositionCost / PositionBase)
+        ELSE 0 END,
+      PositionCost = CASE
+        WHEN excluded.BuyCount > 0 THEN PositionCost + excluded.QuoteVolume
+        WHEN PositionBase > excluded.BaseVolume THEN PositionCost * (1 - excluded.BaseVolume / PositionBase)
+        ELSE 0 END,
+      PositionBase = CASE
+        WHEN excluded.BuyCount > 0 THEN PositionBase + excluded.BaseVolume
+        ELSE MAX(PositionBase - excluded.BaseVolume, 0) END,
+      LastTradeAt = excluded.LastTradeAt,
+      UpdatedAt = excluded.UpdatedAt
+"""
+
+# shared/userStats.js ledgerChangeStatement
+LEDGER_CHANGE_SQL = """
+    INSERT INTO UserTokenStats (UserID, TokenID, UpdatedAt)
+    VALUES (?, ?, ?)
+    ON CONFLICT(UserID, TokenID) DO UPDATE SET
+      ExpectedBalance = ExpectedBalance + ?,
+      UpdatedAt = excluded.UpdatedAt
+"""
+
+ROLLUP_STATE_SQL = """
+    SELECT
+      (SELECT LastPriceID FROM PriceRollupState WHERE Name = ?) AS LastPriceID,
+      (SELECT MAX(PriceID) FROM PriceHistory) AS MaxPriceID
+"""
+
+ROLLUP_SQL = """
+    WITH batch AS (
+      SELECT PairID, PriceID, Price, {bucket} AS BucketStart
+      FROM PriceHistory
+      WHERE PriceID > ? AND PriceID <= ?
+    ),
+    agg AS (
+      SELECT PairID, BucketStart, MAX(Price) AS High, MIN(Price) AS Low, COUNT(*) AS SampleCount,
+             MIN(PriceID) AS FirstPriceID, MAX(PriceID) AS LastPriceID
+      FROM batch
+      GROUP BY PairID, BucketStart
+    )
+    INSERT INTO PriceCandles (PairID, Resolution, BucketStart, Open, High, Low, Close, SampleCount, FirstPriceID, LastPriceID)
+    SELECT
+      a.PairID, '{name}', a.BucketStart,
+      (SELECT Price FROM PriceHistory WHERE PriceID = a.FirstPriceID),
+      a.High, a.Low,
+      (SELECT Price FROM PriceHistory WHERE PriceID = a.LastPriceID),
+      a.SampleCount, a.FirstPriceID, a.LastPriceID
+    FROM agg a
+    WHERE true
+    ON CONFLICT(PairID, Resolution, BucketStart) DO UPDATE SET
+      Open = CASE WHEN excluded.FirstPriceID < FirstPriceID THEN excluded.Open ELSE Open END,
+      Close = CASE WHEN excluded.LastPriceID > LastPriceID THEN excluded.Close ELSE Close END,
+      High = MAX(High, excluded.High),
+      Low = MIN(Low, excluded.Low),
+      SampleCount = SampleCount + excluded.SampleCount,
+      FirstPriceID = MIN(FirstPriceID, excluded.FirstPriceID),
+      LastPriceID = MAX(LastPriceID, excluded.LastPriceID)
+"""
+
+ROLLUP_STATE_UPSERT_SQL = """
+    INSERT INTO PriceRollupState (Name, LastPriceID, UpdatedAt)
+    VALUES (?, ?, ?)
+    ON CONFLICT(Name) DO UPDATE SET
+      LastPriceID = excluded.LastPriceID,
+      UpdatedAt = excluded.UpdatedAt
+"""
+
+
+def sql_time(moment):
+    """SQLite datetime('now') format."""
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def trade_stats_params(user_id, pair_id, action, quantity_sent, quantity_received, at):
+    """Bind values of tradeStatsStatement."""
+    is_buy = action == "BUY"
+    base_qty = (quantity_received if is_buy else quantity_sent) or 0
+    quote_qty = (quantity_sent if is_buy else quantity_received) or 0
+    return (user_id, pair_id, int(is_buy), int(not is_buy), base_qty, quote_qty,
+            base_qty if is_buy else 0, quote_qty if is_buy else 0, at, at, at)
+
+
+# =============================================================================
+# DATABASE
+# =============================================================================
+
+def split_statements(script):
+    """Split a SQL script into complete statements (comments stay attached)."""
+    statements = []
+    current = ""
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current)
+            current = ""
+    if current.strip():
+        statements.append(current)
+    return statements
+
+
+def apply_migrations(conn):
+    """
+    Replay database/migrations/*.sql in order over the seeded database.
+
+    schema.sql already contains every migration, so statements that fail because
+    their column/table/index exists are skipped; the rest (backfills, rebuilds) run
+    as they would on an existing database. Returns the applied migration names.
+    """
+    # Table rebuilds (002) rename under views that schema.sql already created
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    applied = []
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+        with open(path, "r") as f:
+            for statement in split_statements(f.read()):
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError as error:
+                    if not any(marker in str(error) for marker in ALREADY_APPLIED):
+                        raise
+        conn.commit()
+        applied.append(os.path.basename(path))
+    conn.execute("PRAGMA legacy_alter_table = OFF")
+    return applied
+
+
+def create_database(path, users, args):
+    """
+    Create schema.sql in a fresh SQLite file, seed `users` users, then replay the
+    migrations so their backfills (e.g. UserPairStats) cover the seeded rows.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    with open(SCHEMA_FILE, "r") as f:
+        conn.executescript(f.read())
+
+    rng = random.Random(args.seed)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO Chains (ChainID, ChainName, RPCEndpoint, ExplorerURL, NativeCurrency) VALUES (?, ?, ?, ?, ?)",
+        [(chain_id, name, f"https://rpc.{chain_id}.example", f"https://explorer.{chain_id}.example", "ETH")
+         for chain_id, name in CHAINS],
+    )
+
+    pairs = []
+    for chain_id, _ in CHAINS:
+        for pair_name, base, quote, price in PAIRS:
+            token_ids = []
+            for symbol in (base, quote):
+                conn.execute(
+                    "INSERT OR IGNORE INTO Tokens (ChainID, Symbol, TokenAddress, Decimals) VALUES (?, ?, ?, 18)",
+                    (chain_id, symbol, f"0x{chain_id:08x}{symbol.encode().hex():0>32}"),
+                )
+                token_ids.append(conn.execute(
+                    "SELECT TokenID FROM Tokens WHERE ChainID = ? AND Symbol = ?", (chain_id, symbol)).fetchone()[0])
+            cur = conn.execute(
+                "INSERT INTO TradingPairs (ChainID, PairName, BaseTokenID, QuoteTokenID, DEXAddress, DEXType) "
+                "VALUES (?, ?, ?, ?, ?, 'LazaiSwap')",
+                (chain_id, pair_name, token_ids[0], token_ids[1], f"0xdex{chain_id}"),
+            )
+            pairs.append((cur.lastrowid, pair_name, price, token_ids[0], token_ids[1]))
+
+    symbols = sorted({normalize_base_pair_symbol(name) for name, *_ in PAIRS})
+    conn.executemany(
+        "INSERT INTO PriceAPIEndpoints (BasePairSymbol, Provider, EndpointURL, Priority) VALUES (?, 'loadtest', ?, 1)",
+        [(symbol, f"https://prices.example/{symbol}") for symbol in symbols],
+    )
+
+    # PriceHistory: one tick per pair per minute before SIM_START
+    price_rows = []
+    for pair_id, _, price, *_ in pairs:
+        for minute in range(args.history_minutes, 0, -1):
+            created = sql_time(SIM_START - timedelta(minutes=minute))
+            price_rows.append((pair_id, price * rng.uniform(0.98, 1.02), created))
+    conn.executemany(INSERT_PRICE_SQL, price_rows)
+    history_max = conn.execute("SELECT MAX(PriceID) FROM PriceHistory").fetchone()[0] or 0
+    conn.execute(ROLLUP_STATE_UPSERT_SQL, (ROLLUP_NAME, history_max, sql_time(SIM_START)))
+
+    # Users hold one to three configs on different pairs; --new-share of the configs
+    # have no trades yet and get a reference trade on the first tick
+    user_rows = []
+    config_rows = []
+    for user_id in range(1, users + 1):
+        user_rows.append((user_id, f"0xuser{user_id:036x}", f"0xscw{user_id:037x}", str(1000000 + user_id),
+                          "2025-01-01 00:00:00"))
+        for pair in rng.sample(pairs, rng.randint(1, 3)):
+            config_rows.append((user_id, pair, rng.choice([0.05, 0.1, 0.2]), rng.choice([0.01, 0.02, 0.05, 0.1]),
+                                rng.choice([1.0, 1.5])))
+    conn.executemany(
+        "INSERT INTO Users (UserID, UserWallet, SCWAddress, TelegramChatID, RegisteredAt) VALUES (?, ?, ?, ?, ?)",
+        user_rows,
+    )
+    conn.executemany(
+        "INSERT INTO UserTradingConfigs (UserID, PairID, TradePercentage, TriggerPercentage, MaxAmount, MinimumAmount, Multiplier) "
+        "VALUES (?, ?, ?, ?, 500.0, 5.0, ?)",
+        [(user_id, pair[0], trade_pct, trigger, multiplier)
+         for user_id, pair, trade_pct, trigger, multiplier in config_rows],
+    )
+
+    # Trade history; the last trade lands within +-1.2x the trigger of the current
+    # price, so some configs trigger right away and the rest drift into it
+    price_id = history_max
+    trade_rows = []
+    trade_price_rows = []
+    for index, (user_id, (pair_id, _, price, base_id, quote_id), _, trigger, _) in enumerate(config_rows):
+        if rng.random() < args.new_share:
+            continue
+        for n in range(args.trades_per_config, 0, -1):
+            price_id += 1
+            created = sql_time(SIM_START - timedelta(hours=n, minutes=index % 60))
+            trade_price = price * (1 + rng.uniform(-1.2, 1.2) * trigger) if n == 1 else price * rng.uniform(0.9, 1.1)
+            action = rng.choice(["BUY", "SELL"])
+            tokens = (quote_id, base_id) if action == "BUY" else (base_id, quote_id)
+            trade_price_rows.append((price_id, pair_id, trade_price, created))
+            trade_rows.append((pair_id, user_id, price_id, action, *tokens, 1.0, 1.0, f"0x{price_id:064x}", created))
+    conn.executemany("INSERT INTO PriceHistory (PriceID, PairID, Price, CreatedAt) VALUES (?, ?, ?, ?)", trade_price_rows)
+    conn.executemany(INSERT_TRADE_SQL, trade_rows)
+    conn.execute("COMMIT")
+
+    conn.isolation_level = ""
+    apply_migrations(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.row_factory = sqlite3.Row
+    return conn, len(config_rows)
+
+
+class CountingConnection:
+    """
+    D1 stand-in: counts statements and round trips (a db.batch() is one round trip).
+    Each call commits, as every D1 call is its own transaction.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = 0
+        self.round_trips = 0
+
+    def all(self, sql, params=()):
+        return self._call(lambda: self.conn.execute(sql, params).fetchall(), 1)
+
+    def first(self, sql, params=()):
+        return self._call(lambda: self.conn.execute(sql, params).fetchone(), 1)
+
+    def run(self, sql, params=()):
+        return self._call(lambda: self.conn.execute(sql, params), 1)
+
+    def batch(self, statements):
+        return self._call(lambda: [self.conn.execute(sql, params) for sql, params in statements], len(statements))
+
+    def _call(self, func, statements):
+        self.statements += statements
+        self.round_trips += 1
+        result = func()
+        self.conn.commit()
+        return result
+
+
+# =============================================================================
+# PIPELINE
+# =============================================================================
+
+class PriceFeed:
+    """Stand-in for fetchPriceHedged: a geometric random walk per base pair symbol."""
+
+    def __init__(self, rng, volatility):
+        self.rng = rng
+        self.volatility = volatility
+        self.prices = {normalize_base_pair_symbol(name): price for name, _, _, price in PAIRS}
+
+    def advance(self):
+        for symbol in self.prices:
+            self.prices[symbol] *= math.exp(self.rng.gauss(0, self.volatility))
+
+    def price(self, base_pair_symbol):
+        return self.prices.get(base_pair_symbol)
+
+
+class Producer:
+    """lt_trader_queue scheduled(): one cron tick per call."""
+
+    def __init__(self, db, feed, queue):
+        self.db = db
+        self.feed = feed
+        self.queue = queue
+
+    def tick(self, now):
+        """Run one tick; returns per-stage SQLite ms, round trips and message counts."""
+        db = self.db
+        at = sql_time(now)
+        stages = {}
+        stats = {"round_trips": 0, "sends": 0, "messages": 0, "references": 0, "duplicates": 0}
+
+        started = time.perf_counter()
+        pairs = db.all(ACTIVE_PAIRS_SQL)
+        stages["pairs"] = time.perf_counter() - started
+        stats["round_trips"] += 1
+
+        # fetchAndCachePrices: one concurrent chain per base pair (cache upsert, then
+        # one PriceHistory insert per related pair), plus endpoints and their stats
+        started = time.perf_counter()
+        by_symbol = {}
+        for pair in pairs:
+            by_symbol.setdefault(normalize_base_pair_symbol(pair["PairName"]), []).append(pair)
+        endpoints = db.all(ENDPOINTS_SQL)
+        longest_chain = 0
+        for symbol, related in by_symbol.items():
+            price = self.feed.price(symbol)
+            if price is None:
+                continue
+            db.run(CACHE_PRICE_SQL, (symbol, price, "loadtest", at))
+            for pair in related:
+                db.run(INSERT_PRICE_SQL, (pair["PairID"], price, at))
+            longest_chain = max(longest_chain, 1 + len(related))
+        db.batch([(ENDPOINT_SUCCESS_SQL, (at, at, endpoint["EndpointID"])) for endpoint in endpoints])
+        stages["prices"] = time.perf_counter() - started
+        stats["round_trips"] += 2 + longest_chain
+
+        # processConfigs: configs and prices in parallel, then one round trip chain
+        # per reference trade and one sendBatch per 100 messages
+        started = time.perf_counter()
+        configs = db.all(ACTIVE_CONFIGS_SQL)
+        cached_prices = {row["BasePairSymbol"]: row for row in db.all(CACHED_PRICE_MAP_SQL)}
+        stats["round_trips"] += 1
+        messages = []
+        for config in configs:
+            cached = cached_prices.get(normalize_base_pair_symbol(config["PairName"]))
+            if not cached:
+                continue
+            if not config["LastTradeID"]:
+                self.create_reference_trade(config["UserID"], config["PairID"], cached["Price"], at)
+                stats["references"] += 1
+                stats["round_trips"] += 3
+                continue
+            result = check_trigger_condition(cached["Price"], config["LastTradePrice"], config["TriggerPercentage"])
+            if not result or not result[0]:
+                continue
+            messages.append({
+                "configId": config["ConfigID"],
+                "userId": config["UserID"],
+                "pairId": config["PairID"],
+                "pairName": config["PairName"],
+                "action": result[1],
+                "lastTradeId": config["LastTradeID"],
+                "lastTradePrice": config["LastTradePrice"],
+                "triggerPercentage": config["TriggerPercentage"],
+                "baseTokenId": config["BaseTokenID"],
+                "quoteTokenId": config["QuoteTokenID"],
+                "queuedAt": now,
+            })
+        for i in range(0, len(messages), QUEUE_BATCH_SIZE):
+            stats["duplicates"] += self.queue.send_batch(messages[i:i + QUEUE_BATCH_SIZE])
+            stats["sends"] += 1
+        stages["configs"] = time.perf_counter() - started
+        stats["messages"] = len(messages)
+        stats["configs"] = len(configs)
+
+        started = time.perf_counter()
+        stats["round_trips"] += self.rollup(at)
+        stages["rollup"] = time.perf_counter() - started
+
+        stats["stages"] = stages
+        return stats
+
+    def create_reference_trade(self, user_id, pair_id, price, at):
+        db = self.db
+        pair = db.first(PAIR_TOKENS_SQL, (pair_id,))
+        price_id = db.run(INSERT_PRICE_SQL, (pair_id, price, at)).lastrowid
+        db.batch([
+            (INSERT_TRADE_SQL, (pair_id, user_id, price_id, "BUY", pair["QuoteTokenID"], pair["BaseTokenID"], 0, 0,
+                                f"REF-{user_id}-{pair_id}-{at}", at)),
+            (TRADE_STATS_SQL, trade_stats_params(user_id, pair_id, "BUY", 0, 0, at)),
+        ])
+
+    def rollup(self, at):
+        """rollupPriceHistory; returns round trips."""
+        state = self.db.first(ROLLUP_STATE_SQL, (ROLLUP_NAME,))
+        from_price_id = state["LastPriceID"] or 0
+        max_price_id = state["MaxPriceID"] or 0
+        if max_price_id <= from_price_id:
+            return 1
+        to_price_id = min(max_price_id, from_price_id + ROLLUP_BATCH_SIZE)
+        self.db.batch(
+            [(ROLLUP_SQL.format(name=name, bucket=bucket), (from_price_id, to_price_id))
+             for name, bucket in ROLLUP_RESOLUTIONS]
+            + [(ROLLUP_STATE_UPSERT_SQL, (ROLLUP_NAME, to_price_id, at))]
+        )
+        return 2
+
+
+class InMemoryQueue:
+    """TRADING_QUEUE stand-in. Like the real queue it does not deduplicate messages."""
+
+    def __init__(self):
+        self.messages = deque()
+        self.pending = {}
+
+    def send_batch(self, batch):
+        """Enqueue messages; returns how many are for a config that already has one queued."""
+        duplicates = 0
+        for message in batch:
+            if self.pending.get(message["configId"]):
+                duplicates += 1
+            self.pending[message["configId"]] = self.pending.get(message["configId"], 0) + 1
+            self.messages.append(message)
+        return duplicates
+
+    def receive(self):
+        message = self.messages.popleft()
+        self.pending[message["configId"]] -= 1
+        return message
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class Consumer:
+    """
+    lt_trader_execute stand-in: re-validates the trigger against the fresh price and
+    the message's lastTradePrice (validateTrigger), then records the trade.
+    A message whose lastTradeId was already traded from is counted as 'repeat'.
+    """
+
+    def __init__(self, db, feed, queue):
+        self.db = db
+        self.feed = feed
+        self.queue = queue
+        self.outcomes = {}
+        self.traded_from = set()
+
+    def drain(self, count, now):
+        """Process up to `count` messages; returns their queue wait in seconds."""
+        waits = []
+        for _ in range(min(count, len(self.queue))):
+            message = self.queue.receive()
+            waits.append((now - message["queuedAt"]).total_seconds())
+            outcome = self.execute(message, sql_time(now))
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        return waits
+
+    def execute(self, message, at):
+        price = self.feed.price(normalize_base_pair_symbol(message["pairName"]))
+        result = check_trigger_condition(price, message["lastTradePrice"], message["triggerPercentage"])
+        if not result or not result[0]:
+            return "trigger_invalid"
+
+        action = result[1]
+        if action == "BUY":
+            tokens, quantity_sent, quantity_received = (message["quoteTokenId"], message["baseTokenId"]), 10.0, 10.0 / price
+        else:
+            tokens, quantity_sent, quantity_received = (message["baseTokenId"], message["quoteTokenId"]), 0.01, 0.01 * price
+
+        price_id = self.db.run(INSERT_PRICE_SQL, (message["pairId"], price, at)).lastrowid
+        self.db.batch([
+            (INSERT_TRADE_SQL, (message["pairId"], message["userId"], price_id, action, *tokens, quantity_sent,
+                                quantity_received, f"0xload{price_id:060x}", at)),
+            (TRADE_STATS_SQL, trade_stats_params(message["userId"], message["pairId"], action, quantity_sent,
+                                                 quantity_received, at)),
+            (LEDGER_CHANGE_SQL, (message["userId"], tokens[0], at, -quantity_sent)),
+            (LEDGER_CHANGE_SQL, (message["userId"], tokens[1], at, quantity_received)),
+        ])
+
+        if message["lastTradeId"] in self.traded_from:
+            return "repeat"
+        self.traded_from.add(message["lastTradeId"])
+        return "executed"
+
+
+# =============================================================================
+# LOAD TEST
+# =============================================================================
+
+def run_load(users, args):
+    """Seed `users` users, run --ticks ticks and summarize them."""
+    seed_started = time.perf_counter()
+    conn, configs = create_database(args.db, users, args)
+    seed_s = time.perf_counter() - seed_started
+
+    feed = PriceFeed(random.Random(args.seed + 1), args.volatility)
+    queue = InMemoryQueue()
+    producer_db = CountingConnection(conn)
+    consumer_db = CountingConnection(conn)
+    producer = Producer(producer_db, feed, queue)
+    consumer = Consumer(consumer_db, feed, queue)
+
+    ticks = []
+    waits = []
+    started = time.perf_counter()
+    for n in range(args.ticks):
+        now = SIM_START + timedelta(minutes=n)
+        feed.advance()
+        statements = producer_db.statements
+        stats = producer.tick(now)
+        sqlite_ms = sum(stats["stages"].values()) * 1000
+        stats["statements"] = producer_db.statements - statements
+        stats["sqlite_ms"] = sqlite_ms
+        stats["estimated_ms"] = (sqlite_ms + stats["round_trips"] * args.rtt_ms + args.price_latency_ms
+                                 + stats["sends"] * args.queue_rtt_ms)
+        waits.extend(consumer.drain(args.consumer_rate, now + timedelta(minutes=1)))
+        stats["depth"] = len(queue)
+        ticks.append(stats)
+        if args.verbose:
+            print_tick(users, n + 1, stats)
+    elapsed = time.perf_counter() - started
+    conn.close()
+
+    def column(name):
+        return sorted(tick[name] for tick in ticks)
+
+    return {
+        "users": users,
+        "configs": configs,
+        "ticks": len(ticks),
+        "seed_s": seed_s,
+        "ticks_per_s": len(ticks) / elapsed if elapsed else float("inf"),
+        "statements": sum(column("statements")) / len(ticks),
+        "round_trips": sum(column("round_trips")) / len(ticks),
+        "max_round_trips": max(column("round_trips")),
+        "references": sum(column("references")),
+        "messages": sum(column("messages")) / len(ticks),
+        "max_messages": max(column("messages")),
+        "duplicates": sum(column("duplicates")),
+        "max_depth": max(column("depth")),
+        "final_depth": ticks[-1]["depth"],
+        "wait_p50_s": percentile(sorted(waits), 50) if waits else 0.0,
+        "wait_max_s": max(waits) if waits else 0.0,
+        "sqlite_p50_ms": percentile(column("sqlite_ms"), 50),
+        "sqlite_max_ms": max(column("sqlite_ms")),
+        "estimated_p50_ms": percentile(column("estimated_ms"), 50),
+        "estimated_max_ms": max(column("estimated_ms")),
+        "stage_ms": {stage: sum(tick["stages"][stage] for tick in ticks) * 1000 / len(ticks)
+                     for stage in ticks[0]["stages"]},
+        "consumer_statements": consumer_db.statements,
+        "outcomes": dict(consumer.outcomes),
+    }
+
+
+def find_limit(args):
+    """
+    Double the user count until the slowest estimated tick exceeds the budget,
+    then bisect down to --resolution. Returns (last within budget, first over).
+    """
+    budget_ms = args.budget_s * 1000
+    low, high = 0, None
+    users = args.start_users
+    while users <= args.max_users:
+        result = run_load(users, args)
+        print_result(result, budget_ms)
+        if result["estimated_max_ms"] > budget_ms:
+            high = users
+            break
+        low = users
+        users *= 2
+    if high is None:
+        return low, None
+
+    while high - low > max(high * args.resolution, 1):
+        users = (low + high) // 2
+        result = run_load(users, args)
+        print_result(result, budget_ms)
+        if result["estimated_max_ms"] > budget_ms:
+            high = users
+        else:
+            low = users
+    return low, high
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+HEADER = (f"{'users':>8} {'configs':>8} {'ticks/s':>8} {'stmts':>7} {'trips':>6} {'msgs':>7} {'max msgs':>8} "
+          f"{'dups':>6} {'max q':>7} {'end q':>7} {'sqlite p50':>10} {'sqlite max':>10} {'est. p50':>10} {'est. max':>10}")
+
+
+def print_tick(users, n, stats):
+    stages = " ".join(f"{stage} {seconds * 1000:.1f}" for stage, seconds in stats["stages"].items())
+    print(f"  [{users} users] tick {n}: {stats['statements']} stmts, {stats['round_trips']} trips, "
+          f"{stats['references']} refs, {stats['messages']} msgs ({stats['duplicates']} dup), queue {stats['depth']}, "
+          f"est. {stats['estimated_ms']:.0f} ms ({stages})")
+
+
+def print_result(result, budget_ms):
+    flag = "  OVER BUDGET" if result["estimated_max_ms"] > budget_ms else ""
+    print(f"{result['users']:>8} {result['configs']:>8} {result['ticks_per_s']:>8.2f} {result['statements']:>7.0f} "
+          f"{result['round_trips']:>6.0f} {result['messages']:>7.1f} {result['max_messages']:>8} "
+          f"{result['duplicates']:>6} {result['max_depth']:>7} {result['final_depth']:>7} "
+          f"{result['sqlite_p50_ms']:>10.1f} {result['sqlite_max_ms']:>10.1f} "
+          f"{result['estimated_p50_ms']:>10.0f} {result['estimated_max_ms']:>10.0f}{flag}")
+
+
+def print_details(result):
+    stages = ", ".join(f"{stage} {ms:.1f} ms" for stage, ms in result["stage_ms"].items())
+    outcomes = ", ".join(f"{outcome} {count}" for outcome, count in sorted(result["outcomes"].items())) or "none"
+    print(f"\n{result['users']} users: seeded in {result['seed_s']:.1f} s")
+    print(f"  SQLite per tick (mean): {stages}")
+    print(f"  Reference trades: {result['references']}, slowest tick round trips: {result['max_round_trips']}")
+    print(f"  Queue wait: p50 {result['wait_p50_s']:.0f} s, max {result['wait_max_s']:.0f} s")
+    print(f"  Consumer: {outcomes} ({result['consumer_statements']} statements)")
+
+
+def save_csv(results, output_file):
+    columns = [key for key in results[0] if key not in ("stage_ms", "outcomes")]
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"\nResults saved to {output_file}")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Load test the trading pipeline on synthetic users")
+    parser.add_argument("--users", default="1000,10000,50000", help="Comma-separated user counts")
+    parser.add_argument("--ticks", type=int, default=30, help="Cron ticks per run (default: 30)")
+    parser.add_argument("--trades-per-config", type=int, default=3, help="Seeded trade history per config (default: 3)")
+    parser.add_argument("--history-minutes", type=int, default=1440,
+                        help="Seeded PriceHistory per pair, one row per minute (default: 1440)")
+    parser.add_argument("--new-share", type=float, default=0.02,
+                        help="Share of configs without trades, reference-traded on the first tick (default: 0.02)")
+    parser.add_argument("--volatility", type=float, default=0.002,
+                        help="Price feed standard deviation per tick, as a fraction (default: 0.002)")
+    parser.add_argument("--consumer-rate", type=int, default=20,
+                        help="Messages the consumer executes per minute (default: 20)")
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Assumed D1 round trip (default: 5)")
+    parser.add_argument("--price-latency-ms", type=float, default=300.0,
+                        help="Assumed price API latency, fetched concurrently (default: 300)")
+    parser.add_argument("--queue-rtt-ms", type=float, default=20.0, help="Assumed sendBatch latency (default: 20)")
+    parser.add_argument("--budget-s", type=float, default=60.0, help="Tick budget, the cron interval (default: 60)")
+    parser.add_argument("--find-limit", action="store_true",
+                        help="Search for the user count whose slowest tick exceeds --budget-s")
+    parser.add_argument("--start-users", type=int, default=1000, help="First user count of --find-limit (default: 1000)")
+    parser.add_argument("--max-users", type=int, default=2000000, help="Give up --find-limit above this (default: 2000000)")
+    parser.add_argument("--resolution", type=float, default=0.05,
+                        help="Stop bisecting when the bracket is within this fraction (default: 0.05)")
+    parser.add_argument("--db", default="loadtest_pipeline.db", help="Scratch database file")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--csv", metavar="FILE", help="Write one row per run to FILE")
+    parser.add_argument("--verbose", action="store_true", help="Print every tick")
+    return parser.parse_args()
+
+
+def main():
+    """Run the load test for every requested size, or search for the limit."""
+    args = parse_args()
+    budget_ms = args.budget_s * 1000
+
+    print(f"D1 round trip {args.rtt_ms} ms, price API {args.price_latency_ms} ms, sendBatch {args.queue_rtt_ms} ms, "
+          f"consumer {args.consumer_rate} msgs/min, volatility {args.volatility}, {args.ticks} ticks per run")
+    print(HEADER)
+
+    results = []
+    if args.find_limit:
+        low, high = find_limit(args)
+        if high is None:
+            print(f"\nEvery tick stayed within {args.budget_s:.0f} s up to {low} users")
+        else:
+            print(f"\nSlowest tick exceeds {args.budget_s:.0f} s between {low} and {high} users")
+    else:
+        for users in (int(x) for x in args.users.split(",")):
+            result = run_load(users, args)
+            results.append(result)
+            print_result(result, budget_ms)
+        for result in results:
+            print_details(result)
+        over = [result["users"] for result in results if result["estimated_max_ms"] > budget_ms]
+        if over:
+            print(f"\nSlowest tick exceeds {args.budget_s:.0f} s from {over[0]} users (use --find-limit to narrow it down)")
+
+    if args.csv and results:
+        save_csv(results, args.csv)
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Trade Pipeline Latency Report
+
+Aggregates the stage spans of trade traces (shared/tradeTrace.js) into
+p50 / p95 / p99 latencies per stage, per chain and per DEX handler:
+    - producer (lt_trader_queue): pairs, prices, configs
+    - queue: sendBatch until the consumer picks the message up
+    - consumer (lt_trader_execute): fresh_price, consecutive_count, balance,
+      oracle_update, approve, swap, receipt, record_trade, notify
+    - total: tick start until the last stage finished
+
+Traces are read from the TradeTimings table or from `[TRACE] {...}` log lines.
+
+Usage:
+    1. No dependencies beyond the Python standard library
+    2. Export traces (any of these works):
+       - TradeTimings only:
+         wrangler d1 execute lazaitrader --remote --json \\
+           --command "SELECT * FROM TradeTimings WHERE CreatedAt >= '2026-10-01'" > timings.json
+       - Full database: wrangler d1 export lazaitrader --remote --output lazai.sql && sqlite3 lazai.db < lazai.sql
+       - Worker logs: wrangler tail lt-trading-execution --format json > tail.jsonl
+    3. Run:
+       python trace_report.py --db lazai.db --since "2026-10-01"
+       python trace_report.py --timings timings.json --outcome executed
+       python trace_report.py --log tail.jsonl --csv latency.csv
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+
+# Stage names in pipeline order (unknown stages are listed after these)
+STAGES = [
+    "pairs", "prices", "configs",
+    "queue",
+    "fresh_price", "consecutive_count", "balance", "oracle_update",
+    "approve", "swap", "receipt", "record_trade", "notify",
+]
+
+# Pseudo-stage for the end-to-end latency of a trace
+TOTAL = "total"
+
+PERCENTILES = (50, 95, 99)
+
+LOG_MARKER = "[TRACE] "
+
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+def trace_from_row(row):
+    """Normalize a TradeTimings row (database or JSON export) to a trace dict."""
+    spans = row["Spans"]
+    if isinstance(spans, str):
+        spans = json.loads(spans)
+    return {
+        "traceId": row["TraceID"],
+        "chainId": row["ChainID"],
+        "chainName": row.get("ChainName"),
+        "dexType": row.get("DEXType"),
+        "outcome": row["Outcome"],
+        "attempt": int(row.get("Attempt") or 1),
+        "createdAt": row.get("CreatedAt"),
+        "totalMs": float(row["TotalMs"]),
+        "spans": spans,
+    }
+
+
+def load_db(path, since=None, until=None):
+    """Load traces from the TradeTimings table of a database copy."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("""
+        SELECT tt.*, c.ChainName
+        FROM TradeTimings tt
+        LEFT JOIN Chains c ON tt.ChainID = c.ChainID
+        WHERE (? IS NULL OR tt.CreatedAt >= ?)
+          AND (? IS NULL OR tt.CreatedAt <= ?)
+        ORDER BY tt.TimingID
+    """, (since, since, until, until)).fetchall()
+    return [trace_from_row(dict(row)) for row in rows]
+
+
+def load_timings_file(path):
+    """
+    Load a TradeTimings export: CSV, a JSON list of rows, or the output of
+    `wrangler d1 execute --json` ([{"results": [...]}]).
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r") as f:
+            rows = json.load(f)
+        if rows and isinstance(rows[0], dict) and "results" in rows[0]:
+            rows = [row for batch in rows for row in batch["results"]]
+    return [trace_from_row(row) for row in rows]
+
+
+def iter_log_messages(line):
+    """Yield the log messages of one line: a `wrangler tail --format json` event or plain text."""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        yield line
+        return
+
+    if not isinstance(event, dict):
+        return
+    for log in event.get("logs") or []:
+        for part in log.get("message") or []:
+            if isinstance(part, str):
+                yield part
+
+
+def load_log(path):
+    """Load traces from `[TRACE] {...}` lines of a worker log."""
+    traces = []
+    with open(path, "r") as f:
+        for line in f:
+            for message in iter_log_messages(line):
+                marker = message.find(LOG_MARKER)
+                if marker < 0:
+                    continue
+                try:
+                    record = json.loads(message[marker + len(LOG_MARKER):])
+                except ValueError:
+                    continue
+                traces.append({
+                    "traceId": record.get("traceId"),
+                    "chainId": record.get("chainId"),
+                    "chainName": None,
+                    "dexType": record.get("dexType"),
+                    "outcome": record.get("outcome"),
+                    "attempt": int(record.get("attempt") or 1),
+                    "createdAt": None,
+                    "totalMs": float(record.get("totalMs") or 0),
+                    "spans": record.get("spans") or [],
+                })
+    return traces
+
+
+# =============================================================================
+# AGGREGATION
+# =============================================================================
+
+def percentile(sorted_values, p):
+    """Percentile with linear interpolation between closest ranks (numpy's default)."""
+    if not sorted_values:
+        return float("nan")
+    rank = (len(sorted_values) - 1) * p / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def stage_order(stage):
+    if stage == TOTAL:
+        return (2, 0, stage)
+    if stage in STAGES:
+        return (0, STAGES.index(stage), stage)
+    return (1, 0, stage)
+
+
+def collect(traces, key):
+    """
+    Durations per (group, stage).
+
+    A stage that appears more than once in a trace (not expected) is summed.
+    """
+    samples = {}
+    for trace in traces:
+        group = key(trace)
+        per_stage = {}
+        for span in trace["spans"]:
+            per_stage[span["name"]] = per_stage.get(span["name"], 0.0) + float(span["duration"])
+        per_stage[TOTAL] = trace["totalMs"]
+        for stage, duration in per_stage.items():
+            samples.setdefault((group, stage), []).append(duration)
+    return samples
+
+
+def summarize(samples):
+    """Rows of count / mean / percentiles / max per (group, stage)."""
+    rows = []
+    for (group, stage), values in sorted(samples.items(), key=lambda item: (str(item[0][0]), stage_order(item[0][1]))):
+        values.sort()
+        row = {
+            "group": group,
+            "stage": stage,
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "max": values[-1],
+        }
+        for p in PERCENTILES:
+            row[f"p{p}"] = percentile(values, p)
+        rows.append(row)
+    return rows
+
+
+def chain_label(trace):
+    if trace["chainName"]:
+        return f"{trace['chainName']} ({trace['chainId']})"
+    return f"chain {trace['chainId']}"
+
+
+GROUPINGS = {
+    "stage": ("All trades", lambda trace: "all"),
+    "chain": ("Per chain", chain_label),
+    "dex": ("Per DEX handler", lambda trace: trace["dexType"] or "unknown"),
+}
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"{'group':<24} {'stage':<18} {'count':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    previous = None
+    for row in rows:
+        group = row["group"] if row["group"] != previous else ""
+        previous = row["group"]
+        print(f"{str(group):<24} {row['stage']:<18} {row['count']:>6} {row['mean']:>9.0f} "
+              f"{row['p50']:>9.0f} {row['p95']:>9.0f} {row['p99']:>9.0f} {row['max']:>9.0f}")
+
+
+def print_outcomes(traces):
+    counts = {}
+    for trace in traces:
+        counts[trace["outcome"]] = counts.get(trace["outcome"], 0) + 1
+    retries = sum(1 for trace in traces if trace["attempt"] > 1)
+    print("\nOutcomes: " + ", ".join(f"{outcome} {count}" for outcome, count in
+                                     sorted(counts.items(), key=lambda item: -item[1])))
+    print(f"Retried attempts: {retries}")
+
+
+def save_csv(tables, output_file):
+    columns = ["grouping", "group", "stage", "count", "mean"] + [f"p{p}" for p in PERCENTILES] + ["max"]
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for grouping, rows in tables.items():
+            for row in rows:
+                writer.writerow({"grouping": grouping, **row})
+    print(f"\nResults saved to {output_file}")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Latency percentiles of LazaiTrader trade traces")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", metavar="FILE", help="SQLite copy of the D1 database")
+    source.add_argument("--timings", metavar="FILE", help="TradeTimings export (.csv or .json)")
+    source.add_argument("--log", metavar="FILE", help="Worker log with [TRACE] lines (wrangler tail --format json)")
+    parser.add_argument("--since", help="First CreatedAt to include (with --db)")
+    parser.add_argument("--until", help="Last CreatedAt to include (with --db)")
+    parser.add_argument("--outcome", help="Only traces with this outcome, e.g. executed")
+    parser.add_argument("--by", default="stage,chain,dex",
+                        help="Comma-separated groupings: stage, chain, dex (default: all)")
+    parser.add_argument("--csv", metavar="FILE", help="Write all tables to FILE")
+    return parser.parse_args()
+
+
+def main():
+    """Run the report."""
+    args = parse_args()
+
+    if args.db:
+        traces = load_db(args.db, args.since, args.until)
+    elif args.timings:
+        traces = load_timings_file(args.timings)
+    else:
+        traces = load_log(args.log)
+
+    if args.outcome:
+        traces = [trace for trace in traces if trace["outcome"] == args.outcome]
+
+    if not traces:
+        print("No traces found")
+        sys.exit(1)
+
+    print(f"Loaded {len(traces)} traces")
+    print_outcomes(traces)
+
+    tables = {}
+    for grouping in args.by.split(","):
+        grouping = grouping.strip()
+        if grouping not in GROUPINGS:
+            raise SystemExit(f"Unknown grouping: {grouping} (use {', '.join(GROUPINGS)})")
+        title, key = GROUPINGS[grouping]
+        tables[grouping] = summarize(collect(traces, key))
+        print_table(f"{title} (ms)", tables[grouping])
+
+    if args.csv:
+        save_csv(tables, args.csv)
+
+
+if __name__ == "__main__":
+    main()